@@ -0,0 +1,171 @@
+"""
+Startup benchmark for todo-client.
+
+Runs each subcommand in a fresh interpreter with `python -X importtime` against a
+throwaway config and database, and reports how long the imports took and which
+heavy modules were pulled in.
+
+Usage (from the repository root):
+
+    uv run python benchmarks/client_startup.py [--runs 5] [--json]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+# Modules that should only be imported by the commands that actually need them
+HEAVY_MODULES = ("requests",)
+
+# Subcommands with arguments that work against an empty database. "init" and
+# "sync" are left out because they touch the home directory and the network.
+# "shell" reads an empty stdin and exits; "watch" and "daemon" run until
+# interrupted and need the server, so only their argument parsing is timed.
+COMMANDS = {
+    "create": ["create", "Benchmark task"],
+    "complete": ["complete", "1"],
+    "uncomplete": ["uncomplete", "1"],
+    "update": ["update", "1", "Updated benchmark task"],
+    "due": ["due", "1", "2025-12-01"],
+    "undue": ["undue", "1"],
+    "delete": ["delete", "1"],
+    "list": ["list"],
+    "search": ["search", "benchmark"],
+    "shell": ["shell"],
+    "watch": ["watch", "--help"],
+    "daemon": ["daemon", "--help"],
+}
+
+
+def parse_importtime(stderr: str) -> tuple[int, int, set[str]]:
+    """
+    Parse `-X importtime` output.
+
+    Interpreter startup (site, encodings and any .pth hooks of the environment)
+    happens before runpy is imported, so everything imported at the top level
+    after runpy is attributed to todo-client itself.
+
+    Returns:
+        A (total_us, app_us, modules) tuple: the sum of every module's self time
+        in microseconds, the cumulative time of todo-client's own imports, and
+        the set of imported top-level module names.
+    """
+    total_us = 0
+    app_us = 0
+    seen_runpy = False
+    modules = set()
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        total_us += int(self_us)
+        modules.add(name.strip().split(".")[0])
+
+        is_top_level = not name[1:].startswith(" ")
+        if is_top_level and seen_runpy:
+            app_us += int(cumulative_us)
+        if name.strip() == "runpy":
+            seen_runpy = True
+    return total_us, app_us, modules
+
+
+def run_command(args: list[str], config_path: str) -> tuple[float, int, set[str]]:
+    """
+    Run one todo-client command with -X importtime.
+
+    Returns:
+        A (wall_ms, app_import_us, modules) tuple.
+    """
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        [
+            str(REPO_ROOT / "packages/todo-common/src"),
+            str(REPO_ROOT / "todo-client/src"),
+            env.get("PYTHONPATH", ""),
+        ]
+    )
+    start = time.perf_counter()
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-X",
+            "importtime",
+            "-m",
+            "todo_client.main",
+            "--config",
+            config_path,
+            *args,
+        ],
+        input="",
+        capture_output=True,
+        text=True,
+        env=env,
+        check=True,
+    )
+    wall_ms = (time.perf_counter() - start) * 1000
+    _, app_us, modules = parse_importtime(result.stderr)
+    return wall_ms, app_us, modules
+
+
+def make_config(directory: str) -> str:
+    """
+    Write a client config pointing at a database inside the given directory.
+    """
+    config_path = os.path.join(directory, "config.ini")
+    with open(config_path, "w") as f:
+        f.write("username=bench_user\n")
+        f.write("server_url=http://localhost:8030\n")
+        f.write(f"database_file={os.path.join(directory, 'bench.db')}\n")
+    return config_path
+
+
+def benchmark(runs: int = 5, commands: list[str] | None = None) -> dict:
+    """
+    Benchmark each command `runs` times and return per-command medians.
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        config_path = make_config(tmp)
+        for name in commands or COMMANDS:
+            walls, imports = [], []
+            modules = set()
+            for _ in range(runs):
+                wall_ms, import_us, modules = run_command(COMMANDS[name], config_path)
+                walls.append(wall_ms)
+                imports.append(import_us)
+            results[name] = {
+                "wall_ms": round(statistics.median(walls), 2),
+                "import_ms": round(statistics.median(imports) / 1000, 2),
+                "heavy_modules": sorted(m for m in HEAVY_MODULES if m in modules),
+            }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="todo-client startup benchmark")
+    parser.add_argument("--runs", type=int, default=5, help="Runs per command")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    results = benchmark(runs=args.runs)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'command':<12} {'wall ms':>9} {'import ms':>10}  heavy modules")
+    for name, r in results.items():
+        heavy = ", ".join(r["heavy_modules"]) or "-"
+        print(f"{name:<12} {r['wall_ms']:>9} {r['import_ms']:>10}  {heavy}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""
+Synthetic task data for the benchmarks.
+
+Everything is driven by a seeded random.Random, so the same arguments always
+produce the same tasks and benchmark runs are comparable with each other.
+
+Usage as a script (from the repository root) writes the tasks as NDJSON, e.g. to
+feed `todo-server-admin import`:
+
+    uv run python benchmarks/datagen.py [--users 10] [--tasks-per-user 1000] [--seed 42] > tasks.ndjson
+"""
+
+import argparse
+import json
+import random
+import sys
+from dataclasses import asdict, replace
+from datetime import datetime, timedelta
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT / "packages/todo-common/src"))
+
+from todo_common import db  # noqa: E402
+from todo_common.hlc import from_timestamp  # noqa: E402
+from todo_common.task import Task  # noqa: E402
+
+WORDS = [
+    "report", "budget", "invoice", "meeting", "review", "draft", "email", "call",
+    "plan", "design", "deploy", "release", "fix", "bug", "test", "refactor", "garden",
+    "groceries", "milk", "bread", "dentist", "doctor", "school", "homework", "laundry",
+    "car", "insurance", "taxes", "rent", "flight", "hotel", "passport", "birthday",
+    "gift", "party", "clean", "kitchen", "paint", "fence", "book", "library", "read",
+    "write",
+]
+
+# Timestamps are spread over the year before this point
+EPOCH = datetime(2025, 6, 1, 9, 0, 0)
+
+
+def generate_tasks(
+    users: int,
+    tasks_per_user: int,
+    seed: int = 42,
+    completed_ratio: float = 0.3,
+    deleted_ratio: float = 0.02,
+    due_ratio: float = 0.4,
+    start_id: int = 1,
+) -> list[Task]:
+    """
+    Build tasks for users named user0, user1, ... with consecutive IDs.
+
+    Args:
+        users: Number of users.
+        tasks_per_user: Tasks generated for each user.
+        seed: Seed for the random generator.
+        completed_ratio: Fraction of tasks that are completed.
+        deleted_ratio: Fraction of tasks that are soft-deleted.
+        due_ratio: Fraction of tasks with a due date, from a month ago to a month ahead.
+        start_id: ID of the first task.
+    """
+    rng = random.Random(seed)
+    # Due dates are relative to today, so the today/overdue/week filters always match some
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    tasks = []
+    for i in range(users * tasks_per_user):
+        created = EPOCH - timedelta(seconds=rng.randint(0, 365 * 86400))
+        updated = created + timedelta(seconds=rng.randint(0, 30 * 86400))
+        due_date = None
+        if rng.random() < due_ratio:
+            due_date = (today + timedelta(days=rng.randint(-30, 30))).strftime("%Y-%m-%d")
+        tasks.append(
+            Task(
+                id=start_id + i,
+                username=f"user{i % users}",
+                content=" ".join(rng.choices(WORDS, k=rng.randint(3, 9))),
+                is_completed=rng.random() < completed_ratio,
+                is_deleted=rng.random() < deleted_ratio,
+                due_date=due_date,
+                created_at=created.isoformat(timespec="seconds"),
+                updated_at=updated.isoformat(timespec="seconds"),
+                created_hlc=from_timestamp(created.isoformat()),
+                updated_hlc=from_timestamp(updated.isoformat()),
+            )
+        )
+    return tasks
+
+
+def change_tasks(
+    tasks: list[Task],
+    change_ratio: float = 0.1,
+    new_ratio: float = 0.0,
+    seed: int = 43,
+) -> list[Task]:
+    """
+    Return a copy of tasks as another device might send them after some edits:
+    change_ratio of them are edited (newer updated_at), and new tasks amounting
+    to new_ratio of the list are appended with fresh IDs.
+
+    Args:
+        tasks: The tasks as last synced.
+        change_ratio: Fraction of tasks to edit.
+        new_ratio: Number of new tasks, as a fraction of len(tasks).
+        seed: Seed for the random generator.
+    """
+    rng = random.Random(seed)
+    changed = []
+    for task in tasks:
+        if rng.random() < change_ratio:
+            updated = datetime.fromisoformat(task.updated_at) + timedelta(days=1)
+            task = replace(
+                task,
+                content=task.content + " " + rng.choice(WORDS),
+                is_completed=not task.is_completed,
+                updated_at=updated.isoformat(timespec="seconds"),
+                updated_hlc=from_timestamp(updated.isoformat()),
+            )
+        changed.append(task)
+
+    new_count = int(len(tasks) * new_ratio)
+    if new_count:
+        users = len({task.username for task in tasks}) or 1
+        next_id = max((task.id for task in tasks), default=0) + 1
+        extra = generate_tasks(
+            users,
+            -(-new_count // users),
+            seed=seed + 1,
+            start_id=next_id,
+        )
+        changed.extend(extra[:new_count])
+    return changed
+
+
+def insert_tasks(db_path: str, tasks: list[Task]) -> None:
+    """
+    Load tasks into a database in one transaction, keeping their IDs.
+    Much faster than syncing them, for setting up a benchmark.
+    """
+    db.init_db(db_path)
+    conn = db.get_conn(db_path)
+    conn.executemany(
+        """
+        INSERT INTO tasks (
+            id, username, content, is_completed, is_deleted, due_date,
+            created_at, updated_at, created_hlc, updated_hlc
+        )
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+        (
+            (
+                task.id,
+                task.username,
+                task.content,
+                int(task.is_completed),
+                int(task.is_deleted),
+                task.due_date,
+                task.created_at,
+                task.updated_at,
+                task.created_hlc,
+                task.updated_hlc,
+            )
+            for task in tasks
+        ),
+    )
+    conn.commit()
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write synthetic tasks as NDJSON")
+    parser.add_argument("--users", type=int, default=10, help="Number of users")
+    parser.add_argument(
+        "--tasks-per-user", type=int, default=1000, help="Tasks for each user"
+    )
+    parser.add_argument("--seed", type=int, default=42, help="Random seed")
+    args = parser.parse_args()
+
+    for task in generate_tasks(args.users, args.tasks_per_user, seed=args.seed):
+        sys.stdout.write(json.dumps(asdict(task)) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,382 @@
+"""
+Load generator for the server's /sync endpoint.
+
+Simulates virtual users that each behave like a todo-client: they keep their
+own list of tasks, edit some and create a few between syncs, and POST the same
+payload as handle_sync ({"tasks": [...], "username": ...}), replacing their list
+with the server's response. Requests are sent with asyncio and httpx, so one
+process can drive hundreds of users.
+
+The number of users follows a ramp profile of comma-separated USERS:SECONDS
+stages. Each stage ramps linearly from the previous stage's user count (0 at
+the start) to its own over its duration, so "10:30,10:60,50:30,50:60" ramps to
+10 users, holds for a minute, ramps to 50 and holds again. Without --profile,
+--users, --ramp-up and --duration describe a single ramp and hold.
+
+Reports throughput, latency percentiles and errors for the whole run and for
+each stage, which shows the user count where p99 latency starts to degrade.
+Errors are counted by kind: "database is locked" when the response says so,
+otherwise the HTTP status or the exception name. With admission control on
+(sync_max_concurrent in the server config), rejected syncs show up as HTTP 503
+or 429 instead of slow requests and lock errors; virtual users don't retry them.
+
+Either point it at a running server with --url, or pass --start-server to
+start one with uvicorn (--workers N) on a fresh database in a temporary
+directory. With --storage-backend memory, that server keeps tasks in memory
+instead, and with log, in todo_server.logstore's log-structured store (both
+are one store per process, so use them with a single worker).
+
+Usage (from the repository root):
+
+    uv run python benchmarks/load.py --start-server [--users 20] [--duration 60]
+    uv run python benchmarks/load.py --url http://localhost:8030 --profile 10:30,10:60,50:30,50:60 [--json]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import asdict, replace
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import httpx
+from datagen import WORDS, generate_tasks
+from suite import percentile
+from todo_common import hlc
+from todo_common.task import Task
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+
+def parse_profile(profile: str) -> list[tuple[int, float]]:
+    """
+    Parse "USERS:SECONDS,..." into a list of (users, seconds) stages.
+    """
+    stages = []
+    for stage in profile.split(","):
+        users, _, seconds = stage.partition(":")
+        if float(seconds) <= 0:
+            raise ValueError(f"Stage {stage!r} must last more than 0 seconds")
+        stages.append((int(users), float(seconds)))
+    return stages
+
+
+def users_at(stages: list[tuple[int, float]], elapsed: float) -> tuple[int, int]:
+    """
+    Return (stage index, target user count) at elapsed seconds into the run.
+    """
+    previous = 0
+    for i, (users, seconds) in enumerate(stages):
+        if elapsed < seconds:
+            return i, round(previous + (users - previous) * elapsed / seconds)
+        elapsed -= seconds
+        previous = users
+    return len(stages) - 1, previous
+
+
+class LoadStats:
+    def __init__(self, stages: list[tuple[int, float]]):
+        self.stages = stages
+        self.latencies = [[] for _ in stages]
+        self.errors = [Counter() for _ in stages]
+        self.tasks = [0 for _ in stages]
+
+    def record(self, stage: int, seconds: float, tasks: int, error: str | None) -> None:
+        if error is None:
+            self.latencies[stage].append(seconds * 1000)
+            self.tasks[stage] += tasks
+        else:
+            self.errors[stage][error] += 1
+
+    def summary(self, stage: int | None = None) -> dict:
+        """
+        Throughput, latencies (of successful requests) and errors for one stage,
+        or for the whole run if stage is None.
+        """
+        indexes = range(len(self.stages)) if stage is None else [stage]
+        latencies = [ms for i in indexes for ms in self.latencies[i]]
+        errors = sum((self.errors[i] for i in indexes), Counter())
+        tasks = sum(self.tasks[i] for i in indexes)
+        seconds = sum(self.stages[i][1] for i in indexes)
+
+        summary = {
+            "requests": len(latencies) + sum(errors.values()),
+            "ok": len(latencies),
+            "errors": dict(errors),
+            "requests_per_s": round(len(latencies) / seconds, 2),
+            "tasks_per_s": round(tasks / seconds, 1),
+        }
+        if stage is not None:
+            summary["users"] = self.stages[stage][0]
+        if latencies:
+            for p in (50, 90, 95, 99):
+                summary[f"p{p}_ms"] = round(percentile(latencies, p), 1)
+            summary["max_ms"] = round(max(latencies), 1)
+        return summary
+
+
+def edit_tasks(tasks: list[Task], rng: random.Random, edit_ratio: float, new_tasks: float) -> list[Task]:
+    """
+    Make the local changes a user might make between two syncs: edit about
+    edit_ratio of the tasks, and create new_tasks tasks on average.
+    """
+    now = datetime.now()
+    # Like a client edit, the new version ticks past every version the user has seen
+    version = hlc.tick(max((task.updated_hlc for task in tasks), default=0))
+    stamp = hlc.to_timestamp(version)
+    edited = []
+    for task in tasks:
+        if rng.random() < edit_ratio:
+            if rng.random() < 0.5:
+                task = replace(task, is_completed=not task.is_completed)
+            else:
+                task = replace(task, content=task.content + " " + rng.choice(WORDS))
+            task = replace(task, updated_at=stamp, updated_hlc=version)
+        edited.append(task)
+
+    next_id = max((task.id for task in tasks), default=0) + 1
+    count = int(new_tasks) + (rng.random() < new_tasks % 1)
+    for i in range(count):
+        due = now + timedelta(days=rng.randint(0, 14)) if rng.random() < 0.4 else None
+        edited.append(
+            Task(
+                id=next_id + i,
+                username=tasks[0].username if tasks else "",
+                content=" ".join(rng.choices(WORDS, k=rng.randint(3, 9))),
+                is_completed=False,
+                is_deleted=False,
+                due_date=due.strftime("%Y-%m-%d") if due else None,
+                created_at=stamp,
+                updated_at=stamp,
+                created_hlc=version,
+                updated_hlc=version,
+            )
+        )
+    return edited
+
+
+def classify_error(response: httpx.Response) -> str:
+    if "database is locked" in response.text:
+        return "database is locked"
+    return f"HTTP {response.status_code}"
+
+
+async def virtual_user(
+    client: httpx.AsyncClient,
+    url: str,
+    index: int,
+    args,
+    stats: LoadStats,
+    run_start: float,
+    stop: asyncio.Event,
+) -> None:
+    rng = random.Random(args.seed + index)
+    username = f"load{index}"
+    count = rng.randint(max(args.tasks // 2, 1), args.tasks * 3 // 2 + 1)
+    tasks = [
+        replace(task, username=username)
+        for task in generate_tasks(1, count, seed=args.seed + index)
+    ]
+
+    while not stop.is_set():
+        tasks = edit_tasks(tasks, rng, args.edit_ratio, args.new_tasks)
+        payload = {"tasks": [asdict(task) for task in tasks], "username": username}
+
+        start = time.perf_counter()
+        stage, _ = users_at(stats.stages, start - run_start)
+        error = None
+        try:
+            response = await client.post(
+                f"{url}/sync", json=payload, headers={"X-Todo-Username": username}
+            )
+            if response.status_code != 200:
+                error = classify_error(response)
+            else:
+                tasks = [Task(**t) for t in response.json().get("tasks", [])]
+        except httpx.HTTPError as e:
+            error = type(e).__name__
+        stats.record(stage, time.perf_counter() - start, len(payload["tasks"]), error)
+
+        # Think time between syncs, cut short when the user is stopped
+        try:
+            await asyncio.wait_for(stop.wait(), rng.expovariate(1 / args.think))
+        except TimeoutError:
+            pass
+
+
+async def run_load(url: str, stages: list[tuple[int, float]], args) -> LoadStats:
+    stats = LoadStats(stages)
+    total_seconds = sum(seconds for _, seconds in stages)
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+
+    async with httpx.AsyncClient(timeout=args.timeout, limits=limits) as client:
+        running = []  # (asyncio task, stop event), oldest first
+        started = 0
+        run_start = time.perf_counter()
+
+        while (elapsed := time.perf_counter() - run_start) < total_seconds:
+            _, target = users_at(stages, elapsed)
+            while len(running) < target:
+                stop = asyncio.Event()
+                task = asyncio.create_task(
+                    virtual_user(client, url, started, args, stats, run_start, stop)
+                )
+                running.append((task, stop))
+                started += 1
+            while len(running) > target:
+                # The newest users leave first; they finish their current request
+                task, stop = running.pop()
+                stop.set()
+            await asyncio.sleep(0.1)
+
+        for _, stop in running:
+            stop.set()
+        await asyncio.gather(*(task for task, _ in running))
+
+    return stats
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@contextmanager
+def local_server(workers: int, storage_backend: str = "sqlite"):
+    """
+    Run todo-server under uvicorn on a fresh database, yielding its URL.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        config_path = os.path.join(tmp, "server.ini")
+        with open(config_path, "w") as f:
+            f.write(
+                f"database_file={os.path.join(tmp, 'load.db')}\n"
+                f"log_store_dir={os.path.join(tmp, 'load_log')}\n"
+                f"storage_backend={storage_backend}\nlog_level=WARNING\n"
+            )
+
+        port = free_port()
+        env = {
+            **os.environ,
+            "TODO_SERVER_CONFIG_PATH": config_path,
+            "PYTHONPATH": os.pathsep.join(
+                [
+                    str(REPO_ROOT / "packages/todo-common/src"),
+                    str(REPO_ROOT / "todo-server/src"),
+                    os.environ.get("PYTHONPATH", ""),
+                ]
+            ),
+        }
+        server = subprocess.Popen(
+            [
+                sys.executable, "-m", "uvicorn", "todo_server.main:app",
+                "--port", str(port), "--workers", str(workers), "--log-level", "warning",
+            ],
+            env=env,
+            cwd=tmp,
+        )
+        url = f"http://127.0.0.1:{port}"
+        try:
+            deadline = time.monotonic() + 30
+            while True:
+                try:
+                    httpx.get(url, timeout=1)
+                    break
+                except httpx.HTTPError:
+                    if server.poll() is not None or time.monotonic() > deadline:
+                        raise RuntimeError("todo-server did not start") from None
+                    time.sleep(0.2)
+            yield url
+        finally:
+            server.terminate()
+            server.wait(10)
+
+
+def print_report(stats: LoadStats) -> None:
+    print(
+        f"{'stage':>5} {'users':>6} {'requests':>9} {'req/s':>8} {'p50 ms':>8} "
+        f"{'p95 ms':>8} {'p99 ms':>8} {'errors':>7}"
+    )
+    rows = [(str(i + 1), stats.summary(i)) for i in range(len(stats.stages))]
+    rows.append(("all", {**stats.summary(), "users": ""}))
+    for name, s in rows:
+        print(
+            f"{name:>5} {s['users']:>6} {s['requests']:>9} {s['requests_per_s']:>8} "
+            f"{s.get('p50_ms', '-'):>8} {s.get('p95_ms', '-'):>8} {s.get('p99_ms', '-'):>8} "
+            f"{sum(s['errors'].values()):>7}"
+        )
+
+    overall = stats.summary()
+    print(f"\nThroughput: {overall['requests_per_s']} syncs/s, {overall['tasks_per_s']} tasks/s")
+    if "max_ms" in overall:
+        print(f"Latency: p90 {overall['p90_ms']} ms, max {overall['max_ms']} ms")
+    for kind, count in sorted(overall["errors"].items()):
+        print(f"Errors: {count} x {kind}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the /sync endpoint")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--url", help="URL of a running todo-server")
+    target.add_argument(
+        "--start-server", action="store_true", help="Start a local server on a fresh database"
+    )
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers for --start-server")
+    parser.add_argument(
+        "--storage-backend",
+        choices=("sqlite", "memory", "log"),
+        default="sqlite",
+        help="Storage engine for --start-server",
+    )
+    parser.add_argument("--profile", help="Ramp stages as USERS:SECONDS,...")
+    parser.add_argument("--users", type=int, default=20, help="Users, without --profile")
+    parser.add_argument("--ramp-up", type=float, default=10, help="Ramp-up seconds, without --profile")
+    parser.add_argument("--duration", type=float, default=60, help="Seconds at full load, without --profile")
+    parser.add_argument("--tasks", type=int, default=50, help="Average tasks per user")
+    parser.add_argument(
+        "--edit-ratio", type=float, default=0.05, help="Fraction of a user's tasks edited per sync"
+    )
+    parser.add_argument("--new-tasks", type=float, default=0.5, help="Average tasks created per sync")
+    parser.add_argument("--think", type=float, default=1.0, help="Average seconds between a user's syncs")
+    parser.add_argument("--timeout", type=float, default=30, help="Request timeout in seconds")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    if args.profile:
+        try:
+            stages = parse_profile(args.profile)
+        except ValueError as e:
+            parser.error(f"Invalid --profile: {e}")
+    else:
+        stages = [(args.users, args.ramp_up)] if args.ramp_up > 0 else []
+        stages.append((args.users, args.duration))
+
+    if args.start_server:
+        with local_server(args.workers, args.storage_backend) as url:
+            stats = asyncio.run(run_load(url, stages, args))
+    else:
+        stats = asyncio.run(run_load(args.url.rstrip("/"), stages, args))
+
+    if args.json:
+        results = {
+            "overall": stats.summary(),
+            "stages": [stats.summary(i) for i in range(len(stages))],
+        }
+        print(json.dumps(results, indent=2))
+    else:
+        print_report(stats)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+"""
+Log-structured store benchmark: the server's SQLite engine against LogBackend.
+
+Both engines are set up as the server runs them: SQLite through the connection
+pool (WAL, one writer) and the log engine in its own directory, both fsyncing
+every /sync. Each starts from the same --users x --tasks-per-user tasks, then
+replays the server's workload for --rounds: a random user sends back their whole
+task list with --change-ratio of it edited, which is merged in one write group
+(as POST /sync does), and the user's full list is read back as JSON.
+
+Reported per engine: merge and read latency (median and p95), merged tasks per
+second, the time to open the store again (for the log, replaying it), and its
+size on disk. For the log, the same after snapshot(), which compacts it. Both
+engines are checked to hold the same tasks at the end.
+
+Usage (from the repository root):
+
+    uv run python benchmarks/log_store.py [--users 20] [--tasks-per-user 1000] [--rounds 200] [--json]
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT / "packages/todo-common/src"))
+sys.path.insert(0, str(REPO_ROOT / "todo-server/src"))
+
+from datagen import change_tasks, generate_tasks, insert_tasks  # noqa: E402
+from suite import percentile  # noqa: E402
+from todo_common.storage import StorageBackend  # noqa: E402
+from todo_server.logstore import LogBackend  # noqa: E402
+from todo_server.pool import ConnectionPool, PooledSQLiteBackend  # noqa: E402
+
+ENGINES = ("sqlite", "log")
+
+
+def open_engine(engine: str, path: str) -> StorageBackend:
+    if engine == "sqlite":
+        return PooledSQLiteBackend(ConnectionPool(path))
+    return LogBackend(path)
+
+
+def disk_bytes(path: str) -> int:
+    # Space allocated to the database and its WAL, or to every file of the log
+    # directory (the log's current segment is preallocated, but sparse)
+    if os.path.isdir(path):
+        files = list(Path(path).iterdir())
+    else:
+        files = [Path(path + suffix) for suffix in ("", "-wal", "-shm")]
+    return sum(f.stat().st_blocks * 512 for f in files if f.exists())
+
+
+def load(engine: str, path: str, tasks: list) -> None:
+    # Untimed setup, in bulk
+    if engine == "sqlite":
+        insert_tasks(path, tasks)
+        return
+    storage = LogBackend(path)
+    with storage.writing():
+        for task in tasks:
+            storage.add_full_task(task)
+    storage.close()
+
+
+def timed_open(engine: str, path: str) -> tuple[StorageBackend, float]:
+    start = time.perf_counter()
+    storage = open_engine(engine, path)
+    return storage, time.perf_counter() - start
+
+
+def run_rounds(storage: StorageBackend, lists: dict, rounds: int, change_ratio: float, seed: int):
+    rng = random.Random(seed)
+    merges, reads = [], []
+    merged = 0
+    for i in range(rounds):
+        username = rng.choice(sorted(lists))
+        incoming = change_tasks(lists[username], change_ratio, seed=seed + i)
+        lists[username] = incoming
+
+        start = time.perf_counter()
+        with storage.writing():
+            for task in incoming:
+                storage.sync_task(task)
+        merges.append(time.perf_counter() - start)
+        merged += len(incoming)
+
+        start = time.perf_counter()
+        with storage.reading():
+            storage.get_tasks_json_for_user(username)
+        reads.append(time.perf_counter() - start)
+    return merges, reads, merged
+
+
+def summary(seconds: list[float]) -> dict:
+    return {
+        "p50_ms": round(statistics.median(seconds) * 1000, 2),
+        "p95_ms": round(percentile(seconds, 95) * 1000, 2),
+    }
+
+
+def bench_engine(engine: str, tmp: str, args) -> tuple[dict, dict]:
+    path = os.path.join(tmp, "todo_server.db" if engine == "sqlite" else "todo_server_log")
+    tasks = generate_tasks(args.users, args.tasks_per_user, seed=args.seed)
+    lists = {}
+    for task in tasks:
+        lists.setdefault(task.username, []).append(task)
+    load(engine, path, tasks)
+
+    storage, _ = timed_open(engine, path)
+    merges, reads, merged = run_rounds(
+        storage, lists, args.rounds, args.change_ratio, args.seed
+    )
+    total = sum(merges)
+    storage.close()
+
+    storage, reopen = timed_open(engine, path)
+    result = {
+        "merge": summary(merges),
+        "read_json": summary(reads),
+        "merged_tasks_per_s": round(merged / total),
+        "reopen_s": round(reopen, 3),
+        "disk_mb": round(disk_bytes(path) / 2**20, 1),
+    }
+
+    if engine == "log":
+        start = time.perf_counter()
+        storage.snapshot()
+        result["snapshot_s"] = round(time.perf_counter() - start, 3)
+        storage.close()
+        storage, reopen = timed_open(engine, path)
+        result["reopen_after_snapshot_s"] = round(reopen, 3)
+        result["disk_after_snapshot_mb"] = round(disk_bytes(path) / 2**20, 1)
+
+    contents = {
+        username: storage.get_tasks_for_user(username) for username in sorted(lists)
+    }
+    storage.close()
+    return result, contents
+
+
+def benchmark(args) -> dict:
+    results = {
+        "users": args.users,
+        "tasks_per_user": args.tasks_per_user,
+        "rounds": args.rounds,
+        "change_ratio": args.change_ratio,
+    }
+    contents = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for engine in ENGINES:
+            results[engine], contents[engine] = bench_engine(engine, tmp, args)
+
+    if contents["sqlite"] != contents["log"]:
+        raise SystemExit("The two engines ended up with different tasks")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SQLite against the log-structured store")
+    parser.add_argument("--users", type=int, default=20, help="Number of users")
+    parser.add_argument(
+        "--tasks-per-user", type=int, default=1000, help="Tasks for each user"
+    )
+    parser.add_argument("--rounds", type=int, default=200, help="Syncs to replay")
+    parser.add_argument(
+        "--change-ratio", type=float, default=0.05, help="Fraction of a list edited per sync"
+    )
+    parser.add_argument("--seed", type=int, default=42, help="Random seed")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    results = benchmark(args)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(
+        f"{results['rounds']} syncs of whole lists ({results['change_ratio']:.0%} edited), "
+        f"{results['users']} users x {results['tasks_per_user']} tasks"
+    )
+    print(
+        f"{'engine':<8} {'merge p50':>10} {'p95':>8} {'read p50':>10} {'p95':>8} "
+        f"{'tasks/s':>9} {'reopen s':>9} {'disk MB':>8}"
+    )
+    for engine in ENGINES:
+        r = results[engine]
+        print(
+            f"{engine:<8} {r['merge']['p50_ms']:>10} {r['merge']['p95_ms']:>8} "
+            f"{r['read_json']['p50_ms']:>10} {r['read_json']['p95_ms']:>8} "
+            f"{r['merged_tasks_per_s']:>9} {r['reopen_s']:>9} {r['disk_mb']:>8}"
+        )
+    log = results["log"]
+    print(
+        f"log snapshot: {log['snapshot_s']}s, then reopen {log['reopen_after_snapshot_s']}s "
+        f"and {log['disk_after_snapshot_mb']} MB on disk"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""
+Search benchmark: FTS5 (todo_common.db.search_tasks) against a LIKE '%...%' scan.
+
+Builds a synthetic server database (1M tasks by default) in a temporary
+directory, then times the same queries through both paths.
+
+Two LIKE numbers are reported. "like first" is the unranked query with a LIMIT,
+which can stop as soon as it finds enough rows, so it is fast for common words.
+"like full" scans every one of the user's rows, which is what any LIKE search
+has to do to rank results, count them, or find a rare word.
+
+Usage (from the repository root):
+
+    uv run python benchmarks/search.py [--tasks 1000000] [--users 10] [--runs 5] [--json]
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT / "packages/todo-common/src"))
+
+from todo_common import db  # noqa: E402
+
+WORDS = [
+    "report", "budget", "invoice", "meeting", "review", "draft", "email", "call",
+    "plan", "design", "deploy", "release", "fix", "bug", "test", "refactor", "garden",
+    "groceries", "milk", "bread", "dentist", "doctor", "school", "homework", "laundry",
+    "car", "insurance", "taxes", "rent", "flight", "hotel", "passport", "birthday",
+    "gift", "party", "clean", "kitchen", "paint", "fence", "book", "library", "read",
+    "write",
+]
+
+QUERIES = ["invoice", "passport", "quarterly", "fix bug", "birthday gift"]
+
+
+def build_database(db_path: str, tasks: int, users: int, seed: int = 42) -> None:
+    """
+    Fill a fresh database with synthetic tasks spread evenly across users.
+    """
+    rng = random.Random(seed)
+    db.init_db(db_path)
+    conn = db.get_conn(db_path)
+
+    def rows():
+        for i in range(tasks):
+            words = rng.choices(WORDS, k=rng.randint(3, 9))
+            if rng.random() < 0.001:
+                words.append("quarterly")
+            created_at = f"2025-{1 + i % 12:02d}-{1 + i % 28:02d}T09:00:00"
+            yield (
+                f"user{i % users}",
+                " ".join(words),
+                int(rng.random() < 0.3),
+                created_at,
+                created_at,
+            )
+
+    conn.executemany(
+        """
+        INSERT INTO tasks (username, content, is_completed, is_deleted, created_at, updated_at)
+        VALUES (?, ?, ?, 0, ?, ?)
+        """,
+        rows(),
+    )
+    conn.commit()
+    conn.close()
+
+
+def like_search(db_path: str, username: str, query: str, limit: int = -1) -> list:
+    """
+    The pre-FTS way of finding tasks: one LIKE '%term%' per word.
+    A limit of -1 returns every match.
+    """
+    terms = [f"%{term}%" for term in query.split()]
+    like_sql = " AND ".join("content LIKE ?" for _ in terms)
+    conn = db.get_conn(db_path)
+    rows = conn.execute(
+        f"""
+        SELECT id, username, content, is_completed, is_deleted, due_date, created_at, updated_at
+        FROM tasks
+        WHERE username = ? AND is_deleted = 0 AND {like_sql}
+        ORDER BY created_at ASC
+        LIMIT ?
+        """,
+        (username, *terms, limit),
+    ).fetchall()
+    conn.close()
+    return rows
+
+
+def time_ms(fn, runs: int) -> float:
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def benchmark(tasks: int, users: int, runs: int, limit: int = 20) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "search_bench.db")
+
+        start = time.perf_counter()
+        build_database(db_path, tasks, users)
+        build_s = time.perf_counter() - start
+
+        results = {"tasks": tasks, "users": users, "build_s": round(build_s, 2)}
+        for query in QUERIES:
+            fts_ms = time_ms(
+                lambda query=query: db.search_tasks("user0", query, db_path, limit), runs
+            )
+            first_ms = time_ms(
+                lambda query=query: like_search(db_path, "user0", query, limit), runs
+            )
+            full_ms = time_ms(
+                lambda query=query: like_search(db_path, "user0", query), runs
+            )
+            results[query] = {
+                "fts_ms": round(fts_ms, 3),
+                "like_first_ms": round(first_ms, 3),
+                "like_full_ms": round(full_ms, 3),
+                "speedup_vs_full": round(full_ms / fts_ms, 1) if fts_ms else None,
+            }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="FTS5 vs LIKE search benchmark")
+    parser.add_argument("--tasks", type=int, default=1_000_000, help="Total tasks")
+    parser.add_argument(
+        "--users", type=int, default=10, help="Users to spread them over"
+    )
+    parser.add_argument("--runs", type=int, default=5, help="Runs per query")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    results = benchmark(args.tasks, args.users, args.runs)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(
+        f"{results['tasks']} tasks over {results['users']} users "
+        f"(built in {results['build_s']} s)"
+    )
+    print(
+        f"{'query':<16} {'fts ms':>10} {'like first':>11} {'like full':>10} "
+        f"{'vs full':>8}"
+    )
+    for query in QUERIES:
+        r = results[query]
+        print(
+            f"{query:<16} {r['fts_ms']:>10} {r['like_first_ms']:>11} "
+            f"{r['like_full_ms']:>10} {r['speedup_vs_full']:>7}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
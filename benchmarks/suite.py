@@ -0,0 +1,345 @@
+"""
+Benchmark suite for the db layer and the server's /sync endpoint.
+
+Runs these groups against fresh databases built from benchmarks/datagen.py:
+
+* create: create_task throughput, one call (and transaction) per task.
+* list: get_tasks_for_user_filtered latency for each filter, on users x
+  tasks-per-user tasks.
+* sync: sync_tasks of a changed copy of 1k, 10k and 100k tasks into a database
+  that already holds them (--change-ratio of them edited, --new-ratio new).
+* http: POST /sync end to end through an in-process server (FastAPI's
+  TestClient), for the same kind of payload. Skipped if the server's
+  dependencies aren't installed.
+
+The create, list, sync and http groups run on the storage engine chosen with
+--storage-backend (sqlite by default, or memory; see todo_common.storage).
+
+Results are printed, or written as JSON with --json / --output. Passing a
+previous JSON file as --baseline compares every metric against it and exits
+with status 1 if any got worse by more than --threshold (20% by default). Keep a
+baseline from your own machine; numbers from different machines don't compare.
+
+Usage (from the repository root):
+
+    uv run python benchmarks/suite.py [--only create,list,sync,http] [--sync-sizes 1000,10000,100000]
+        [--storage-backend sqlite|memory] [--output results.json] [--baseline baseline.json] [--threshold 0.2]
+"""
+
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from dataclasses import asdict
+from datetime import datetime
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT / "packages/todo-common/src"))
+sys.path.insert(0, str(REPO_ROOT / "todo-server/src"))
+
+from datagen import change_tasks, generate_tasks, insert_tasks  # noqa: E402
+from todo_common import db  # noqa: E402
+from todo_common.storage import BACKENDS, SQLiteBackend, StorageBackend, open_storage  # noqa: E402
+
+GROUPS = ("create", "list", "sync", "http")
+
+# Filters timed by the list group, as get_tasks_for_user_filtered arguments
+LIST_FILTERS = {
+    "all": {},
+    "completed": {"only_completed": True},
+    "today": {"only_today": True},
+    "overdue": {"due": "overdue"},
+    "week": {"due": "week"},
+    "with_deleted": {"include_deleted": True},
+}
+
+
+def percentile(values: list[float], p: float) -> float:
+    """
+    The p-th percentile (0 to 100) of values, interpolating between samples.
+    """
+    values = sorted(values)
+    k = (len(values) - 1) * p / 100
+    lower = int(k)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (k - lower)
+
+
+def metric(value: float, unit: str, better: str) -> dict:
+    return {"value": round(value, 3), "unit": unit, "better": better}
+
+
+def open_bench_storage(tmp: str, name: str, backend: str) -> StorageBackend:
+    """
+    A fresh, empty store of the given engine, named after the benchmark.
+    """
+    path = os.path.join(tmp, name)
+    storage = open_storage({"storage_backend": backend, "database_file": path}, path)
+    if isinstance(storage, SQLiteBackend):
+        db.init_db(path)
+    else:
+        storage.clear()
+    return storage
+
+
+def load_tasks(storage: StorageBackend, tasks: list) -> None:
+    # Bulk insert into SQLite; other engines take the tasks one by one
+    if isinstance(storage, SQLiteBackend):
+        insert_tasks(storage.DB_PATH, tasks)
+    else:
+        for task in tasks:
+            storage.add_full_task(task)
+
+
+def bench_create(tmp: str, count: int, backend: str = "sqlite") -> dict:
+    storage = open_bench_storage(tmp, "create.db", backend)
+
+    start = time.perf_counter()
+    for i in range(count):
+        storage.create_task(f"Benchmark task {i}", "user0")
+    elapsed = time.perf_counter() - start
+
+    return {
+        "create_task.ops_per_s": metric(count / elapsed, "ops/s", "higher"),
+    }
+
+
+def bench_list(
+    tmp: str, users: int, tasks_per_user: int, runs: int, seed: int, backend: str = "sqlite"
+) -> dict:
+    storage = open_bench_storage(tmp, "list.db", backend)
+    load_tasks(storage, generate_tasks(users, tasks_per_user, seed=seed))
+
+    results = {}
+    for name, kwargs in LIST_FILTERS.items():
+        timings = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            storage.get_tasks_for_user_filtered("user0", **kwargs)
+            timings.append((time.perf_counter() - start) * 1000)
+        results[f"list.{name}.p50_ms"] = metric(statistics.median(timings), "ms", "lower")
+        results[f"list.{name}.p95_ms"] = metric(percentile(timings, 95), "ms", "lower")
+    return results
+
+
+def sync_workload(size: int, seed: int, change_ratio: float, new_ratio: float):
+    """
+    The stored tasks for one user, and the changed copy a client sends back.
+    """
+    stored = generate_tasks(1, size, seed=seed)
+    return stored, change_tasks(stored, change_ratio, new_ratio, seed=seed + 1)
+
+
+def bench_sync(
+    tmp: str,
+    sizes: list[int],
+    seed: int,
+    change_ratio: float,
+    new_ratio: float,
+    backend: str = "sqlite",
+) -> dict:
+    results = {}
+    for size in sizes:
+        storage = open_bench_storage(tmp, f"sync_{size}.db", backend)
+        stored, incoming = sync_workload(size, seed, change_ratio, new_ratio)
+        load_tasks(storage, stored)
+
+        start = time.perf_counter()
+        storage.sync_tasks(incoming)
+        elapsed = time.perf_counter() - start
+
+        results[f"sync_tasks.{size}.s"] = metric(elapsed, "s", "lower")
+        results[f"sync_tasks.{size}.tasks_per_s"] = metric(
+            len(incoming) / elapsed, "tasks/s", "higher"
+        )
+    return results
+
+
+def bench_http(
+    tmp: str,
+    sizes: list[int],
+    seed: int,
+    change_ratio: float,
+    new_ratio: float,
+    backend: str = "sqlite",
+) -> dict:
+    server_db = os.path.join(tmp, "http_server.db")
+    config_path = os.path.join(tmp, "server.ini")
+    with open(config_path, "w") as f:
+        f.write(
+            f"database_file={server_db}\nstorage_backend={backend}\nlog_level=WARNING\n"
+        )
+
+    # The server reads its config when todo_server.main is imported
+    os.environ["TODO_SERVER_CONFIG_PATH"] = config_path
+    try:
+        from fastapi.testclient import TestClient
+        from todo_server.main import app, storage
+    except ImportError as e:
+        print(f"Skipping http benchmarks: {e}", file=sys.stderr)
+        return {}
+
+    results = {}
+    with TestClient(app) as client:
+        for size in sizes:
+            stored, incoming = sync_workload(size, seed, change_ratio, new_ratio)
+            # The server keeps its connections open, so empty the tasks rather than the file
+            storage.clear()
+            load_tasks(storage, stored)
+            body = json.dumps(
+                {"username": "user0", "tasks": [asdict(task) for task in incoming]}
+            )
+
+            start = time.perf_counter()
+            response = client.post(
+                "/sync", content=body, headers={"Content-Type": "application/json"}
+            )
+            elapsed = time.perf_counter() - start
+            response.raise_for_status()
+
+            results[f"http_sync.{size}.s"] = metric(elapsed, "s", "lower")
+    return results
+
+
+def run_suite(args) -> dict:
+    groups = args.only.split(",") if args.only else GROUPS
+    sync_sizes = [int(n) for n in args.sync_sizes.split(",") if n]
+    http_sizes = [int(n) for n in args.http_sizes.split(",") if n]
+    backend = args.storage_backend
+
+    metrics = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        if "create" in groups:
+            metrics.update(bench_create(tmp, args.creates, backend))
+        if "list" in groups:
+            metrics.update(
+                bench_list(
+                    tmp, args.users, args.tasks_per_user, args.runs, args.seed, backend
+                )
+            )
+        if "sync" in groups:
+            metrics.update(
+                bench_sync(
+                    tmp, sync_sizes, args.seed, args.change_ratio, args.new_ratio, backend
+                )
+            )
+        if "http" in groups:
+            metrics.update(
+                bench_http(
+                    tmp, http_sizes, args.seed, args.change_ratio, args.new_ratio, backend
+                )
+            )
+
+    return {
+        "meta": {
+            "date": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "args": vars(args),
+        },
+        "metrics": metrics,
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[dict]:
+    """
+    Compare every metric present in both results and baseline.
+
+    Returns:
+        One row per metric with the baseline and current values, the relative
+        change (positive is worse) and whether it exceeds the threshold.
+    """
+    rows = []
+    for name, current in results["metrics"].items():
+        base = baseline.get("metrics", {}).get(name)
+        if base is None or not base["value"]:
+            continue
+        change = (current["value"] - base["value"]) / base["value"]
+        if current["better"] == "higher":
+            change = -change
+        rows.append(
+            {
+                "name": name,
+                "baseline": base["value"],
+                "current": current["value"],
+                "unit": current["unit"],
+                "worse_by": round(change, 3),
+                "regressed": change > threshold,
+            }
+        )
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="todo db and server benchmarks")
+    parser.add_argument(
+        "--only", default="", help=f"Comma-separated groups to run ({','.join(GROUPS)})"
+    )
+    parser.add_argument("--users", type=int, default=10, help="Users for the list group")
+    parser.add_argument(
+        "--tasks-per-user", type=int, default=10_000, help="Tasks per user for the list group"
+    )
+    parser.add_argument("--creates", type=int, default=1000, help="create_task calls")
+    parser.add_argument("--runs", type=int, default=20, help="Runs per list query")
+    parser.add_argument(
+        "--sync-sizes", default="1000,10000,100000", help="Task counts for sync_tasks"
+    )
+    parser.add_argument("--http-sizes", default="1000,10000", help="Task counts for /sync")
+    parser.add_argument(
+        "--change-ratio", type=float, default=0.1, help="Fraction of synced tasks edited"
+    )
+    parser.add_argument(
+        "--new-ratio", type=float, default=0.05, help="New tasks per synced task"
+    )
+    parser.add_argument(
+        "--storage-backend", choices=BACKENDS, default="sqlite", help="Storage engine to time"
+    )
+    parser.add_argument("--seed", type=int, default=42, help="Random seed")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--baseline", help="JSON results to compare against")
+    parser.add_argument(
+        "--threshold", type=float, default=0.2, help="Allowed slowdown vs the baseline"
+    )
+    args = parser.parse_args()
+
+    results = run_suite(args)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+            f.write("\n")
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for name, m in results["metrics"].items():
+            print(f"{name:<32} {m['value']:>14} {m['unit']}")
+
+    if not args.baseline:
+        return
+
+    with open(args.baseline) as f:
+        rows = compare(results, json.load(f), args.threshold)
+
+    print(f"\n{'metric':<32} {'baseline':>14} {'current':>14} {'worse by':>9}")
+    for row in rows:
+        flag = "  REGRESSED" if row["regressed"] else ""
+        print(
+            f"{row['name']:<32} {row['baseline']:>14} {row['current']:>14} "
+            f"{row['worse_by']:>8.0%}{flag}"
+        )
+
+    if any(row["regressed"] for row in rows):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+/sync response benchmark: Task objects and a JSON encoder against JSON built by SQLite.
+
+The old path loads the user's tasks as Task objects, turns each into a dict with
+asdict and has Starlette's JSONResponse encode the list. The new one
+(todo_common.db.get_tasks_json_for_user) has SQLite write each row's JSON, and
+the server sends the joined text as is.
+
+Both paths run on the same synthetic database (100k tasks for one user by
+default), each in a fresh Python process so that neither inherits the other's
+memory. For each, the report shows CPU time per task (process time, median of
+--runs) and the peak resident memory the path added on top of the process's
+baseline (which also counts SQLite's own allocations). Both paths are checked to
+produce the same JSON first.
+
+Usage (from the repository root):
+
+    uv run python benchmarks/sync_response.py [--tasks 100000] [--runs 5] [--json]
+"""
+
+import argparse
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import asdict
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT / "packages/todo-common/src"))
+
+from datagen import generate_tasks, insert_tasks  # noqa: E402
+from fastapi.responses import JSONResponse, Response  # noqa: E402
+from todo_common import db  # noqa: E402
+
+USERNAME = "user0"
+
+
+def objects_response(db_path: str) -> bytes:
+    # /sync before: rows -> Task -> dict -> JSON encoder
+    tasks = db.get_tasks_for_user(USERNAME, db_path)
+    cursor = db.get_last_change_seq(db_path)
+    return JSONResponse(
+        {
+            "status": "success",
+            "tasks": [asdict(task) for task in tasks],
+            "cursor": cursor,
+        }
+    ).body
+
+
+def sql_response(db_path: str) -> bytes:
+    # /sync now: JSON text straight from SQLite
+    tasks_json, cursor = db.get_tasks_json_for_user(USERNAME, db_path)
+    body = b'{"status":"success","tasks":%s,"cursor":%d}' % (tasks_json, cursor)
+    return Response(body, media_type="application/json").body
+
+
+PATHS = {"objects": objects_response, "sql": sql_response}
+
+
+def peak_rss() -> int:
+    """
+    Return this process's peak resident memory in bytes.
+    """
+    # On Linux, ru_maxrss starts at the parent's peak, so use VmHWM where there is one
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    # ru_maxrss is in bytes on macOS
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def run_child(path: str, db_path: str, runs: int) -> None:
+    """
+    Time one path in this (fresh) process and print the result as JSON.
+    """
+    build = PATHS[path]
+    db.init_db(db_path)
+    baseline = peak_rss()
+
+    cpu = []
+    size = 0
+    for _ in range(runs):
+        start = time.process_time()
+        size = len(build(db_path))
+        cpu.append(time.process_time() - start)
+
+    print(json.dumps({"cpu_s": cpu, "peak_bytes": peak_rss() - baseline, "bytes": size}))
+
+
+def measure(path: str, db_path: str, runs: int) -> dict:
+    result = subprocess.run(
+        [sys.executable, __file__, "--child", path, "--db", db_path, "--runs", str(runs)],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def benchmark(tasks: int, runs: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "sync_response.db")
+        insert_tasks(db_path, generate_tasks(1, tasks))
+
+        # Same tasks, same values
+        if json.loads(objects_response(db_path)) != json.loads(sql_response(db_path)):
+            raise SystemExit("The two paths produced different JSON")
+
+        results = {"tasks": tasks, "runs": runs}
+        for path in PATHS:
+            child = measure(path, db_path, runs)
+            cpu_s = statistics.median(child["cpu_s"])
+            results[path] = {
+                "cpu_ms": round(cpu_s * 1000, 1),
+                "cpu_us_per_task": round(cpu_s * 1e6 / tasks, 2),
+                "peak_mb": round(child["peak_bytes"] / 2**20, 1),
+                "response_mb": round(child["bytes"] / 2**20, 1),
+            }
+        results["cpu_speedup"] = round(
+            results["objects"]["cpu_ms"] / results["sql"]["cpu_ms"], 1
+        )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="/sync response serialisation benchmark")
+    parser.add_argument("--tasks", type=int, default=100_000, help="Tasks for the user")
+    parser.add_argument("--runs", type=int, default=5, help="Runs per path")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    parser.add_argument("--child", choices=PATHS, help=argparse.SUPPRESS)
+    parser.add_argument("--db", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.db, args.runs)
+        return
+
+    results = benchmark(args.tasks, args.runs)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"/sync response for one user with {results['tasks']} tasks")
+    print(f"{'path':<10} {'cpu ms':>10} {'us/task':>9} {'peak MB':>9} {'body MB':>9}")
+    for path in PATHS:
+        r = results[path]
+        print(
+            f"{path:<10} {r['cpu_ms']:>10} {r['cpu_us_per_task']:>9} "
+            f"{r['peak_mb']:>9} {r['response_mb']:>9}"
+        )
+    print(f"CPU time: {results['cpu_speedup']}x faster with SQL-built JSON")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,61 @@
 # common/db.py
+import functools
+import logging
+import re
 import sqlite3
-from datetime import datetime
-
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import replace
+from datetime import date
+
+from todo_common import hlc
+from todo_common.migrations import has_fts5, migrate
 from todo_common.task import Task
 
+logger = logging.getLogger(__name__)
+
+# Callables run as hook(operation_name, seconds) after every timed operation
+_operation_hooks: list[Callable[[str, float], None]] = []
+
+
+def add_operation_hook(hook: Callable[[str, float], None]) -> None:
+    """
+    Register a hook that is called with (operation name, seconds taken) after each
+    database operation in this module, e.g. to feed a metrics histogram.
+    Registering the same hook again (e.g. when the server module is reloaded)
+    does nothing, so it is still called once per operation.
+    """
+    if hook not in _operation_hooks:
+        _operation_hooks.append(hook)
+
+
+def remove_operation_hook(hook: Callable[[str, float], None]) -> None:
+    _operation_hooks.remove(hook)
+
+
+def timed(fn):
+    """
+    Report fn's duration to the operation hooks. With no hooks registered (the
+    client's case) this adds nothing but a list check.
+    """
+    operation = fn.__name__
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        if not _operation_hooks:
+            return fn(*args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            for hook in _operation_hooks:
+                hook(operation, elapsed)
+
+    return wrapper
+
 
 def get_conn(DB_PATH):
     """
@@ -15,9 +67,11 @@ def get_conn(DB_PATH):
     return conn
 
 
+@timed
 def init_db(DB_PATH):
     """
-    Ensure the tasks table exists.
+    Ensure the database schema is up to date by applying any pending migrations.
+    See todo_common.migrations for the full history.
     Task schema:
         id            INTEGER PRIMARY KEY AUTOINCREMENT
         username      TEXT NOT NULL
@@ -27,133 +81,220 @@ def init_db(DB_PATH):
         due_date      TEXT
         created_at    TEXT NOT NULL
         updated_at    TEXT NOT NULL
+        due_day       INTEGER, generated from due_date (days since 1970-01-01)
+        updated_day   INTEGER, generated from updated_at (days since 1970-01-01)
+        dirty         INTEGER NOT NULL DEFAULT 0 (local edits not yet pushed)
+        created_hlc   INTEGER NOT NULL DEFAULT 0 (see todo_common.hlc)
+        updated_hlc   INTEGER NOT NULL DEFAULT 0
+        change_seq    INTEGER NOT NULL DEFAULT 0 (order this database stored versions in)
+    Task content is also indexed for full-text search in tasks_fts (when FTS5 is available).
     """
     conn = get_conn(DB_PATH)
-    cur = conn.cursor()
+    migrate(conn)
+    conn.close()
 
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS tasks (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT NOT NULL,
-            content TEXT NOT NULL,
-            is_completed INTEGER NOT NULL DEFAULT 0,
-            is_deleted INTEGER NOT NULL DEFAULT 0,
-            due_date TEXT,
-            created_at TEXT NOT NULL,
-            updated_at TEXT NOT NULL
-        );
-        """
-    )
 
-    conn.commit()
-    conn.close()
+# The connection bound by use_connection, as (DB_PATH, conn), if there is one
+_active_connection: ContextVar[tuple[str, sqlite3.Connection] | None] = ContextVar(
+    "todo_active_connection", default=None
+)
 
 
-def add_full_task(task: Task, DB_PATH: str, use_existing_id: bool = True) -> Task:
+@contextmanager
+def use_connection(
+    conn: sqlite3.Connection, DB_PATH: str
+) -> Iterator[sqlite3.Connection]:
     """
-    Insert a full Task object into the tasks table.
-    Used for syncing tasks from server to client or vice versa.
+    Make the functions in this module reuse conn for DB_PATH inside the with block,
+    instead of opening, migrating, committing and closing a connection per call.
+
+    The caller owns conn and its transaction: nothing run inside the block commits,
+    rolls back or closes it. This lets a long-running process (e.g. the client shell)
+    run many operations on one connection and group them into one transaction.
+    The schema must already be up to date (call init_db first).
     """
-    init_db(DB_PATH)
+    token = _active_connection.set((DB_PATH, conn))
+    try:
+        yield conn
+    finally:
+        _active_connection.reset(token)
+
+
+@contextmanager
+def connect(DB_PATH: str) -> Iterator[sqlite3.Connection]:
+    """
+    Yield a connection to DB_PATH for one operation.
+
+    Inside use_connection this is the bound connection, left as it is. Otherwise
+    a new connection is opened (after applying pending migrations), committed if
+    the block succeeds, and closed.
+    """
+    active = _active_connection.get()
+    if active is not None and active[0] == DB_PATH:
+        yield active[1]
+        return
 
+    init_db(DB_PATH)
     conn = get_conn(DB_PATH)
-    cur = conn.cursor()
+    try:
+        yield conn
+        conn.commit()
+    finally:
+        conn.close()
 
-    if use_existing_id:
-        cur.execute(
-            """
-            INSERT INTO tasks (
-                id,
-                username,
-                content,
-                is_completed,
-                is_deleted,
-                due_date,
-                created_at,
-                updated_at
-            )
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            """,
-            (
-                task.id,
-                task.username,
-                task.content,
-                int(task.is_completed),
-                int(task.is_deleted),
-                task.due_date,
-                task.created_at,
-                task.updated_at,
-            ),
-        )
+
+def with_hlc(task: Task) -> Task:
+    """
+    Return the task with its HLC timestamps filled in from created_at and
+    updated_at if it has none, e.g. because it came from an older client.
+    """
+    if task.created_hlc and task.updated_hlc:
+        return task
+    return replace(
+        task,
+        created_hlc=task.created_hlc or hlc.from_timestamp(task.created_at),
+        updated_hlc=task.updated_hlc or hlc.from_timestamp(task.updated_at),
+    )
+
+
+def next_timestamp(
+    cur: sqlite3.Cursor, username: str | None = None, task_id: int | None = None
+) -> tuple[str, int]:
+    """
+    Return the (updated_at, updated_hlc) pair for a local edit of a user's task.
+
+    The HLC ticks past the newest updated_hlc stored for the user, so the edit
+    orders after every version this database has seen, whatever the wall clock
+    says (see todo_common.hlc). It is a single lookup in idx_tasks_updated_hlc.
+    It also ticks past the server's purge horizon saved by the last sync (see
+    save_sync_state), which the server would otherwise skip the edit under.
+
+    Args:
+        cur: Cursor of the connection making the edit.
+        username: The task's owner, or None to look it up by task_id.
+        task_id: The task being edited, when username isn't known.
+    """
+    if username is None:
+        user_sql, user = "(SELECT username FROM tasks WHERE id = ?)", task_id
     else:
-        cur.execute(
-            """
-            INSERT INTO tasks (
-                username,
-                content,
-                is_completed,
-                is_deleted,
-                due_date,
-                created_at,
-                updated_at
-            )
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-            """,
-            (
-                task.username,
-                task.content,
-                int(task.is_completed),
-                int(task.is_deleted),
-                task.due_date,
-                task.created_at,
-                task.updated_at,
-            ),
+        user_sql, user = "?", username
+    cur.execute(
+        f"""
+        SELECT MAX(
+            IFNULL((SELECT MAX(updated_hlc) FROM tasks WHERE username = {user_sql}), 0),
+            IFNULL((SELECT horizon FROM sync_state WHERE username = {user_sql}), 0)
         )
+        """,
+        (user, user),
+    )
+    stamp = hlc.tick(cur.fetchone()[0])
+    return hlc.to_timestamp(stamp), stamp
 
-    task_id = cur.lastrowid
-    conn.commit()
-    conn.close()
 
-    return Task(
-        id=task_id,
-        username=task.username,
-        content=task.content,
-        is_completed=task.is_completed,
-        is_deleted=task.is_deleted,
-        due_date=task.due_date,
-        created_at=task.created_at,
-        updated_at=task.updated_at,
-    )
+@timed
+def add_full_task(task: Task, DB_PATH: str, use_existing_id: bool = True) -> Task:
+    """
+    Insert a full Task object into the tasks table.
+    Used for syncing tasks from server to client or vice versa, so the task is
+    not marked as a local change (its dirty counter stays 0).
+    """
+    task = with_hlc(task)
+
+    with connect(DB_PATH) as conn:
+        cur = conn.cursor()
+
+        if use_existing_id:
+            cur.execute(
+                """
+                INSERT INTO tasks (
+                    id,
+                    username,
+                    content,
+                    is_completed,
+                    is_deleted,
+                    due_date,
+                    created_at,
+                    updated_at,
+                    created_hlc,
+                    updated_hlc
+                )
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    task.id,
+                    task.username,
+                    task.content,
+                    int(task.is_completed),
+                    int(task.is_deleted),
+                    task.due_date,
+                    task.created_at,
+                    task.updated_at,
+                    task.created_hlc,
+                    task.updated_hlc,
+                ),
+            )
+        else:
+            cur.execute(
+                """
+                INSERT INTO tasks (
+                    username,
+                    content,
+                    is_completed,
+                    is_deleted,
+                    due_date,
+                    created_at,
+                    updated_at,
+                    created_hlc,
+                    updated_hlc
+                )
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    task.username,
+                    task.content,
+                    int(task.is_completed),
+                    int(task.is_deleted),
+                    task.due_date,
+                    task.created_at,
+                    task.updated_at,
+                    task.created_hlc,
+                    task.updated_hlc,
+                ),
+            )
+
+        task_id = cur.lastrowid
 
+    return replace(task, id=task_id)
 
+
+@timed
 def complete_task(task_id: int, DB_PATH: str) -> None:
     """
     Mark the given task as completed in the database.
 
     NOTE: the original plan was to delete completed tasks after a
-    certain number were reached, but that was a performance optimization
-    that may be premature. Leaving that feature out for now.
+    certain number were reached. That now lives in todo_common.retention,
+    which archives old completed tasks in batches instead of on every completion.
     """
-    init_db(DB_PATH)
-    conn = get_conn(DB_PATH)
-    cur = conn.cursor()
+    with connect(DB_PATH) as conn:
+        cur = conn.cursor()
 
-    now = datetime.now().isoformat(timespec="seconds")
+        now, stamp = next_timestamp(cur, task_id=task_id)
 
-    cur.execute(
-        """
-        UPDATE tasks
-        SET is_completed = 1,
-            updated_at = ?
-        WHERE id = ?
-        """,
-        (now, task_id),
-    )
-    conn.commit()
-    conn.close()
+        cur.execute(
+            """
+            UPDATE tasks
+            SET is_completed = 1,
+                updated_at = ?,
+                updated_hlc = ?,
+                dirty = dirty + 1
+            WHERE id = ?
+            """,
+            (now, stamp, task_id),
+        )
 
 
+@timed
 def create_task(content: str, username: str, DB_PATH: str) -> Task:
     """
     Insert a new task into the tasks table.
@@ -165,33 +306,31 @@ def create_task(content: str, username: str, DB_PATH: str) -> Task:
     Returns:
         The new task's integer id.
     """
-    # make sure table exists before insert
-    init_db(DB_PATH)
-
-    now = datetime.now().isoformat(timespec="seconds")
+    with connect(DB_PATH) as conn:
+        cur = conn.cursor()
 
-    conn = get_conn(DB_PATH)
-    cur = conn.cursor()
+        now, stamp = next_timestamp(cur, username=username)
 
-    cur.execute(
-        """
-        INSERT INTO tasks (
-            username,
-            content,
-            is_completed,
-            is_deleted,
-            due_date,
-            created_at,
-            updated_at
+        cur.execute(
+            """
+            INSERT INTO tasks (
+                username,
+                content,
+                is_completed,
+                is_deleted,
+                due_date,
+                created_at,
+                updated_at,
+                created_hlc,
+                updated_hlc,
+                dirty
+            )
+            VALUES (?, ?, 0, 0, ?, ?, ?, ?, ?, 1)
+            """,
+            (username, content, None, now, now, stamp, stamp),
         )
-        VALUES (?, ?, 0, 0, ?, ?, ?)
-        """,
-        (username, content, None, now, now),
-    )
 
-    task_id = cur.lastrowid
-    conn.commit()
-    conn.close()
+        task_id = cur.lastrowid
 
     return Task(
         id=task_id,
@@ -202,6 +341,8 @@ def create_task(content: str, username: str, DB_PATH: str) -> Task:
         due_date=None,
         created_at=now,
         updated_at=now,
+        created_hlc=stamp,
+        updated_hlc=stamp,
     )
 
 
@@ -209,7 +350,8 @@ def create_tasks_from_rows(rows: list[tuple]) -> list[Task]:
     """
     Convert a list of database rows into a list of Task objects.
     Each row is expected to be a tuple in the order:
-    (id, username, content, is_completed, due_date, created_at, updated_at)
+    (id, username, content, is_completed, is_deleted, due_date, created_at, updated_at,
+    created_hlc, updated_hlc)
     """
     tasks = []
     for (
@@ -221,6 +363,8 @@ def create_tasks_from_rows(rows: list[tuple]) -> list[Task]:
         due_date,
         created_at,
         updated_at,
+        created_hlc,
+        updated_hlc,
     ) in rows:
         tasks.append(
             Task(
@@ -232,96 +376,281 @@ def create_tasks_from_rows(rows: list[tuple]) -> list[Task]:
                 due_date=due_date,
                 created_at=created_at,
                 updated_at=updated_at,
+                created_hlc=created_hlc,
+                updated_hlc=updated_hlc,
             )
         )
     return tasks
 
 
+@timed
 def get_task(task_id: int, DB_PATH: str) -> Task | None:
     """
     Return a Task object for the given task_id, or None if not found.
     """
-    init_db(DB_PATH)
-    conn = get_conn(DB_PATH)
-    cur = conn.cursor()
+    with connect(DB_PATH) as conn:
+        cur = conn.cursor()
 
-    cur.execute(
-        """
-        SELECT id, username, content, is_completed, is_deleted, due_date, created_at, updated_at
-        FROM tasks
-        WHERE id = ?
-        """,
-        (task_id,),
-    )
-    row = cur.fetchone()
-    conn.close()
+        cur.execute(
+            """
+            SELECT id, username, content, is_completed, is_deleted, due_date, created_at, updated_at, created_hlc, updated_hlc
+            FROM tasks
+            WHERE id = ?
+            """,
+            (task_id,),
+        )
+        row = cur.fetchone()
 
     if row is None:
         return None
 
-    (
-        task_id,
-        username,
-        content,
-        is_completed,
-        is_deleted,
-        due_date,
-        created_at,
-        updated_at,
-    ) = row
-    return Task(
-        id=task_id,
-        username=username,
-        content=content,
-        is_completed=bool(is_completed),
-        is_deleted=bool(is_deleted),
-        due_date=due_date,
-        created_at=created_at,
-        updated_at=updated_at,
-    )
+    return create_tasks_from_rows([row])[0]
+
+
+@timed
+def get_archived_updated_hlc(task_id: int, DB_PATH: str) -> int | None:
+    """
+    Return the updated_hlc of an archived task, or None if the task is not in tasks_archive.
+    """
+    with connect(DB_PATH) as conn:
+        cur = conn.cursor()
+
+        cur.execute("SELECT updated_hlc FROM tasks_archive WHERE id = ?", (task_id,))
+        row = cur.fetchone()
+
+    return row[0] if row else None
+
+
+def get_purge_horizon(username: str, DB_PATH: str) -> int:
+    """
+    Return the newest updated_hlc of any tombstone purged for a user, or 0 if
+    none has been (see todo_server.devices).
+    """
+    with connect(DB_PATH) as conn:
+        cur = conn.cursor()
+
+        cur.execute(
+            "SELECT purged_hlc FROM purge_horizons WHERE username = ?", (username,)
+        )
+        row = cur.fetchone()
+
+    return row[0] if row else 0
+
+
+def get_sync_state(username: str, DB_PATH: str) -> tuple[str | None, int | None]:
+    """
+    Return this client database's device ID and the cursor of the last /sync
+    response it applied for a user, each None if it has none yet.
+    """
+    with connect(DB_PATH) as conn:
+        cur = conn.cursor()
+
+        cur.execute(
+            "SELECT device_id, cursor FROM sync_state WHERE username = ?", (username,)
+        )
+        row = cur.fetchone()
+
+    return (row[0], row[1]) if row else (None, None)
+
+
+def save_sync_state(
+    username: str, device_id: str, cursor: int | None, DB_PATH: str, horizon: int = 0
+) -> None:
+    """
+    Record this client database's device ID and the cursor of the /sync
+    response it just applied for a user, and the server's purge horizon from
+    it, which local edits tick past (see next_timestamp). The horizon kept is
+    the highest seen, since the server's only goes up.
+    """
+    with connect(DB_PATH) as conn:
+        conn.execute(
+            """
+            INSERT INTO sync_state (username, device_id, cursor, horizon)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT (username) DO UPDATE
+            SET device_id = excluded.device_id, cursor = excluded.cursor,
+                horizon = MAX(horizon, excluded.horizon)
+            """,
+            (username, device_id, cursor, horizon),
+        )
 
 
+@timed
 def get_tasks_for_user(username: str, DB_PATH: str) -> list[Task]:
     """
     Return all tasks for a given username as a list of Task objects.
     """
-    init_db(DB_PATH)
-    conn = get_conn(DB_PATH)
-    cur = conn.cursor()
+    with connect(DB_PATH) as conn:
+        cur = conn.cursor()
 
-    cur.execute(
-        """
-        SELECT id, username, content, is_completed, is_deleted, due_date, created_at, updated_at
-        FROM tasks
-        WHERE username = ?
-        ORDER BY created_at ASC
-        """,
-        (username,),
-    )
-    rows = cur.fetchall()
-    conn.close()
+        cur.execute(
+            """
+            SELECT id, username, content, is_completed, is_deleted, due_date, created_at, updated_at, created_hlc, updated_hlc
+            FROM tasks
+            WHERE username = ?
+            ORDER BY created_at ASC
+            """,
+            (username,),
+        )
+        rows = cur.fetchall()
 
     return create_tasks_from_rows(rows)
 
 
-def get_tasks_for_user_filtered(
-    username: str, DB_PATH: str, only_completed: bool = False, only_today: bool = False
-) -> list[Task]:
+def get_last_change_seq(DB_PATH: str) -> int:
     """
-    Return tasks for a given username as a list of Task objects, filtered by completion status and/or due date.
+    Return the change_seq of the newest version stored in the database, or 0.
+    It never goes down, even when tasks are deleted.
+    """
+    with connect(DB_PATH) as conn:
+        return conn.execute("SELECT seq FROM change_counter").fetchone()[0]
+
+
+@timed
+def get_tasks_changed_since(username: str, since: int, DB_PATH: str) -> list[Task]:
+    """
+    Return a user's tasks stored after change since, in the order they were
+    stored, including completed and deleted ones.
+
+    A caller that keeps the change_seq it read last (the cursor of
+    get_tasks_json_for_user) can pass it back as since to fetch only what was
+    stored after it, as an index range scan on idx_tasks_change_seq. This is
+    the order of arrival, not of updated_hlc: an edit made offline long ago is
+    still new to every device when it arrives. Tasks removed by retention are
+    not reported.
+    """
+    with connect(DB_PATH) as conn:
+        cur = conn.cursor()
+
+        cur.execute(
+            """
+            SELECT id, username, content, is_completed, is_deleted, due_date, created_at, updated_at, created_hlc, updated_hlc
+            FROM tasks
+            WHERE username = ? AND change_seq > ?
+            ORDER BY change_seq ASC
+            """,
+            (username, since),
+        )
+        rows = cur.fetchall()
+
+    return create_tasks_from_rows(rows)
+
+
+# A tasks row as a JSON object, with the same keys and values as json.dumps(asdict(task))
+TASK_JSON_SQL = """
+    json_object(
+        'id', id,
+        'username', username,
+        'content', content,
+        'is_completed', json(CASE WHEN is_completed THEN 'true' ELSE 'false' END),
+        'is_deleted', json(CASE WHEN is_deleted THEN 'true' ELSE 'false' END),
+        'due_date', due_date,
+        'created_at', created_at,
+        'updated_at', updated_at,
+        'created_hlc', created_hlc,
+        'updated_hlc', updated_hlc
+    )
+"""
+
+
+@timed
+def get_tasks_json_for_user(
+    username: str, DB_PATH: str, since: int | None = None
+) -> tuple[bytes, int]:
+    """
+    Return a user's tasks as a UTF-8 encoded JSON array, ready to send as is.
+
+    The same tasks in the same order as get_tasks_for_user, or as
+    get_tasks_changed_since if since is given. SQLite writes each row's JSON
+    itself, so no Task object, dict or Python JSON encoding is involved; the
+    rows are only joined here, which keeps their order (json_group_array
+    doesn't promise one before SQLite 3.44). Reading them as bytes saves
+    encoding a copy of the whole response.
+
+    A since above the last change_seq is not one this database handed out
+    (e.g. an HLC, which cursors were before change_seq), so it gets every task.
+
+    Returns:
+        The JSON, and the last change_seq, to hand out as the next delta cursor.
+    """
+    with connect(DB_PATH) as conn:
+        # Read the cursor and the rows in one transaction, so both come from the
+        # same snapshot: a task stored in between would be past the cursor and
+        # sent again, or a delete would leave a cursor beyond the rows read.
+        # Inside a caller's transaction (e.g. the pool's writer) there is one already.
+        own_transaction = not conn.in_transaction
+        if own_transaction:
+            conn.execute("BEGIN")
+        try:
+            cursor = conn.execute("SELECT seq FROM change_counter").fetchone()[0]
+            if since is None or since > cursor:
+                where_sql, order_sql = "username = ?", "created_at ASC"
+                params = (username,)
+            else:
+                where_sql = "username = ? AND change_seq > ?"
+                order_sql = "change_seq ASC"
+                params = (username, since)
+
+            rows = conn.execute(
+                f"""
+                SELECT CAST({TASK_JSON_SQL} AS BLOB)
+                FROM tasks
+                WHERE {where_sql}
+                ORDER BY {order_sql}
+                """,
+                params,
+            )
+            tasks_json = b"[" + b",".join(row[0] for row in rows) + b"]"
+        finally:
+            # It only read, so ending it this way loses nothing
+            if own_transaction:
+                conn.rollback()
+
+    return tasks_json, cursor
+
+
+# What sync_task can do with an incoming task
+SYNC_OUTCOMES = ("inserted", "updated", "skipped", "divergent")
+
+# Due-date ranges the filtered queries understand, besides only_today
+DUE_RANGES = ("today", "overdue", "week")
+
+
+def epoch_day(day: date) -> int:
+    """
+    Return a date as the number of days since 1970-01-01, the form stored in the
+    due_day and updated_day columns.
+    """
+    return day.toordinal() - date(1970, 1, 1).toordinal()
+
+
+def build_filter_where(
+    username: str,
+    only_completed: bool = False,
+    only_today: bool = False,
+    include_deleted: bool = False,
+    due: str | None = None,
+) -> tuple[list[str], list]:
+    """
+    Build the WHERE clauses and parameters shared by the filtered task queries.
+
+    Date filters are range predicates on the integer due_day/updated_day columns,
+    so they are answered from idx_tasks_due_day/idx_tasks_updated_day.
 
     Args:
         username: the username whose tasks to retrieve
-        DB_PATH: path to the SQLite database file
-        only_completed: if True, return only completed tasks
-        only_today: if True, return only tasks due today (or, if combined with only_completed, tasks completed today)
-    """
+        only_completed: if True, match only completed tasks
+        only_today: if True, match only tasks due today (or, if combined with only_completed, tasks completed today)
+        include_deleted: if True, also match soft-deleted tasks
+        due: one of DUE_RANGES: "today" (same as only_today), "overdue" (due before today)
+            or "week" (due in the seven days starting today)
 
-    init_db(DB_PATH)
-    conn = get_conn(DB_PATH)
-    cur = conn.cursor()
+    Returns:
+        A (clauses, params) tuple. The clauses are meant to be joined with AND.
+    """
+    if due is not None and due not in DUE_RANGES:
+        raise ValueError(f"Unknown due date range: {due}")
 
-    # Build WHERE clause
     where = ["username = ?"]
     params = [username]
 
@@ -331,155 +660,547 @@ def get_tasks_for_user_filtered(
     else:
         where.append("is_completed = 0")
 
-    # Handle today/due date filtering
-    if only_today and only_completed:
+    if not include_deleted:
+        where.append("is_deleted = 0")
+
+    today = epoch_day(date.today())
+    if only_today:
+        due = "today"
+
+    # Handle today/due date filtering. Even a single day is written as a half-open
+    # range: without table statistics, SQLite prefers the created_at index (to skip
+    # sorting) over an equality match on a day column, and scans every row.
+    if due == "today" and only_completed:
         # Completed *today* — ignore due date
-        where.append("DATE(updated_at) = DATE('now','localtime')")
-    elif only_today:
+        where.append("updated_day >= ? AND updated_day < ?")
+        params.extend([today, today + 1])
+    elif due == "today":
         # Due today (due_date must match today's date)
-        where.append("due_date IS NOT NULL")
-        where.append("DATE(due_date) = DATE('now','localtime')")
+        where.append("due_day >= ? AND due_day < ?")
+        params.extend([today, today + 1])
+    elif due == "overdue":
+        where.append("due_day < ?")
+        params.append(today)
+    elif due == "week":
+        where.append("due_day >= ? AND due_day < ?")
+        params.extend([today, today + 7])
+
+    return where, params
 
-    where.append("is_deleted = 0")
+
+@timed
+def get_tasks_for_user_filtered(
+    username: str,
+    DB_PATH: str,
+    only_completed: bool = False,
+    only_today: bool = False,
+    include_deleted: bool = False,
+    due: str | None = None,
+) -> list[Task]:
+    """
+    Return tasks for a given username as a list of Task objects, filtered by completion status and/or due date.
+
+    Args:
+        username: the username whose tasks to retrieve
+        DB_PATH: path to the SQLite database file
+        only_completed: if True, return only completed tasks
+        only_today: if True, return only tasks due today (or, if combined with only_completed, tasks completed today)
+        include_deleted: if True, also return soft-deleted tasks
+        due: "today", "overdue" or "week" (see build_filter_where)
+    """
+    return list(
+        iter_tasks_for_user_filtered(
+            username, DB_PATH, only_completed, only_today, include_deleted, due
+        )
+    )
+
+
+def iter_tasks_for_user_filtered(
+    username: str,
+    DB_PATH: str,
+    only_completed: bool = False,
+    only_today: bool = False,
+    include_deleted: bool = False,
+    due: str | None = None,
+    batch_size: int = 500,
+) -> Iterator[Task]:
+    """
+    Yield a user's tasks one at a time, with the same filters as get_tasks_for_user_filtered.
+
+    Rows are read from the cursor in batches of batch_size, so memory use does not
+    grow with the number of tasks. The connection stays open until the generator
+    is exhausted or closed (unless it is the connection bound by use_connection),
+    so callers that stop early should close it.
+    """
+    where, params = build_filter_where(
+        username, only_completed, only_today, include_deleted, due
+    )
     where_sql = " AND ".join(where)
 
-    cur.execute(
-        f"""
-        SELECT id, username, content, is_completed, is_deleted, due_date, created_at, updated_at
-        FROM tasks
-        WHERE {where_sql}
-        ORDER BY created_at ASC
-        """,
-        tuple(params),
+    with connect(DB_PATH) as conn:
+        cur = conn.cursor()
+
+        cur.execute(
+            f"""
+            SELECT id, username, content, is_completed, is_deleted, due_date, created_at, updated_at, created_hlc, updated_hlc
+            FROM tasks
+            WHERE {where_sql}
+            ORDER BY created_at ASC
+            """,
+            tuple(params),
+        )
+        while rows := cur.fetchmany(batch_size):
+            yield from create_tasks_from_rows(rows)
+
+
+@timed
+def get_tasks_page_for_user(
+    username: str,
+    DB_PATH: str,
+    after: tuple[str, int] | None = None,
+    limit: int = 100,
+    only_completed: bool = False,
+    only_today: bool = False,
+    include_deleted: bool = False,
+    due: str | None = None,
+) -> tuple[list[Task], tuple[str, int] | None]:
+    """
+    Return one page of a user's tasks using keyset pagination on (created_at, id).
+
+    Unlike OFFSET paging, each page is a single index range scan, so reading
+    page N costs the same as reading page 1.
+
+    Args:
+        username: the username whose tasks to retrieve
+        DB_PATH: path to the SQLite database file
+        after: the (created_at, id) key of the last task on the previous page, or None for the first page
+        limit: maximum number of tasks to return
+        only_completed, only_today, include_deleted, due: same as get_tasks_for_user_filtered
+
+    Returns:
+        A (tasks, next_key) tuple. next_key is the key to pass as `after` to
+        fetch the following page, or None if this is the last page.
+    """
+    where, params = build_filter_where(
+        username, only_completed, only_today, include_deleted, due
     )
-    rows = cur.fetchall()
-    conn.close()
+    if after is not None:
+        where.append("(created_at, id) > (?, ?)")
+        params.extend(after)
+    where_sql = " AND ".join(where)
+
+    with connect(DB_PATH) as conn:
+        # Fetch one extra row so we know whether another page follows
+        rows = conn.execute(
+            f"""
+            SELECT id, username, content, is_completed, is_deleted, due_date, created_at, updated_at, created_hlc, updated_hlc
+            FROM tasks
+            WHERE {where_sql}
+            ORDER BY created_at ASC, id ASC
+            LIMIT ?
+            """,
+            (*params, limit + 1),
+        ).fetchall()
+
+    tasks = create_tasks_from_rows(rows[:limit])
+    next_key = None
+    if len(rows) > limit:
+        last = tasks[-1]
+        next_key = (last.created_at, last.id)
+
+    return tasks, next_key
+
+
+def build_fts_query(query: str, username: str) -> str:
+    """
+    Turn free text typed by a user into a safe FTS5 MATCH expression.
+
+    Every word is quoted (so characters like '-', ':' or '"' are not treated as
+    FTS5 syntax) and matched as a prefix against the content column, and all
+    words must be present. The username is matched as a phrase so FTS only ranks
+    that user's tasks; the exact username check happens in SQL.
+    """
+    terms = " ".join('"' + term.replace('"', '""') + '"*' for term in query.split())
+    quoted_username = '"' + username.replace('"', '""') + '"'
+    return f"content : ({terms}) AND username : {quoted_username}"
+
+
+@timed
+def search_tasks(
+    username: str,
+    query: str,
+    DB_PATH: str,
+    limit: int = 50,
+    include_deleted: bool = False,
+) -> list[Task]:
+    """
+    Return a user's tasks whose content matches the query, best matches first.
+
+    Args:
+        username: the username whose tasks to search
+        query: words to look for; each word matches as a prefix, and all must appear
+        DB_PATH: path to the SQLite database file
+        limit: maximum number of tasks to return
+        include_deleted: if True, also search soft-deleted tasks
+
+    Uses the tasks_fts full-text index ranked by BM25. On SQLite builds without
+    FTS5 this falls back to an unranked LIKE scan in creation order.
+    """
+    if not query.split():
+        return []
+
+    with connect(DB_PATH) as conn:
+        cur = conn.cursor()
+
+        deleted_sql = "" if include_deleted else "AND t.is_deleted = 0"
+
+        if has_fts5(cur):
+            cur.execute(
+                f"""
+                SELECT t.id, t.username, t.content, t.is_completed, t.is_deleted, t.due_date, t.created_at, t.updated_at, t.created_hlc, t.updated_hlc
+                FROM tasks_fts
+                JOIN tasks t ON t.id = tasks_fts.rowid
+                WHERE tasks_fts MATCH ?
+                  AND t.username = ?
+                  {deleted_sql}
+                ORDER BY bm25(tasks_fts)
+                LIMIT ?
+                """,
+                (build_fts_query(query, username), username, limit),
+            )
+        else:
+            # Escape LIKE wildcards so they match literally
+            terms = [
+                "%" + re.sub(r"([\\%_])", r"\\\1", term) + "%"
+                for term in query.split()
+            ]
+            like_sql = " AND ".join("t.content LIKE ? ESCAPE '\\'" for _ in terms)
+            cur.execute(
+                f"""
+                SELECT t.id, t.username, t.content, t.is_completed, t.is_deleted, t.due_date, t.created_at, t.updated_at, t.created_hlc, t.updated_hlc
+                FROM tasks t
+                WHERE t.username = ?
+                  AND {like_sql}
+                  {deleted_sql}
+                ORDER BY t.created_at ASC
+                LIMIT ?
+                """,
+                (username, *terms, limit),
+            )
+
+        rows = cur.fetchall()
 
     return create_tasks_from_rows(rows)
 
 
+@timed
 def get_users(DB_PATH: str) -> list[str]:
     """
     Return a list of all usernames in the tasks database.
     """
-    init_db(DB_PATH)
-    conn = get_conn(DB_PATH)
-    cur = conn.cursor()
+    with connect(DB_PATH) as conn:
+        cur = conn.cursor()
 
-    cur.execute(
-        """
-        SELECT DISTINCT username
-        FROM tasks
-        """
-    )
-    rows = cur.fetchall()
-    conn.close()
+        cur.execute(
+            """
+            SELECT DISTINCT username
+            FROM tasks
+            """
+        )
+        rows = cur.fetchall()
 
     return [row[0] for row in rows]
 
 
-def sync_task(task: Task, DB_PATH: str) -> None:
+def sync_decision(
+    existing: Task | None,
+    task: Task,
+    archived_updated_hlc: int | None = None,
+    purge_horizon: int = 0,
+) -> str:
+    """
+    Decide what syncing an incoming task into a store should do. Every storage
+    engine (see todo_common.storage) merges with this, so they all agree.
+
+    Args:
+        existing: The stored task with the incoming task's ID, or None.
+        task: The incoming task, with HLCs filled in (see with_hlc).
+        archived_updated_hlc: The updated_hlc of an archived copy of the task, if any.
+        purge_horizon: The newest updated_hlc of any tombstone purged for the
+            task's user (see get_purge_horizon).
+
+    Returns:
+        One of SYNC_OUTCOMES (see sync_task).
+    """
+    if existing is None:
+        # Don't bring back a task that retention archived, unless this is a newer edit of it
+        if archived_updated_hlc is not None and archived_updated_hlc >= task.updated_hlc:
+            return "skipped"
+        # Nor a purged tombstone, or an older copy of its task from a device
+        # that hadn't seen the deletion
+        if task.updated_hlc <= purge_horizon:
+            return "skipped"
+        return "inserted"
+
+    # If the existing task has been updated more recently, skip updating
+    if existing.updated_hlc >= task.updated_hlc:
+        return "skipped"
+
+    # If the created_at timestamps differ, then these are divergent tasks and we want to keep both
+    if existing.created_at != task.created_at and existing.content != task.content:
+        return "divergent"
+
+    return "updated"
+
+
+@timed
+def sync_task(task: Task, DB_PATH: str) -> str:
     """
     Insert or update a task in the database based on its ID.
     If the task with the given ID exists, update it; otherwise, insert it.
+
+    Returns:
+        What happened, one of SYNC_OUTCOMES: "inserted" (new task), "updated",
+        "skipped" (the stored or archived copy is as new or newer) or "divergent"
+        (a different task with the same ID, inserted under a new ID).
+
+    The newer version is the one with the higher updated_hlc. Tasks from clients
+    that don't send HLCs get them from their timestamp strings (see with_hlc).
     """
-    print(f"Syncing task ID {task.id} '{task.content}' for user {task.username} into DB at {DB_PATH}")
+    task = with_hlc(task)
+    logger.debug(
+        "Syncing task ID %s %r for user %s into %s",
+        task.id, task.content, task.username, DB_PATH,
+    )
 
     # Check if task with given ID exists
     existing_task = get_task(task.id, DB_PATH)
-
+    archived_updated_hlc = None
+    purge_horizon = 0
     if existing_task is None:
-        print(f"Adding new task ID {task.id} '{task.content}' for user {task.username}")
-        new_task = add_full_task(task, DB_PATH)
-        print(f"New task added with ID {new_task.id}")
-        return
+        archived_updated_hlc = get_archived_updated_hlc(task.id, DB_PATH)
+        purge_horizon = get_purge_horizon(task.username, DB_PATH)
 
-    print(f"Task ID {task.id} '{task.content}' exists. Comparing timestamps...")
+    outcome = sync_decision(existing_task, task, archived_updated_hlc, purge_horizon)
 
-    # If the existing task has been updated more recently, skip updating
-    if existing_task.updated_at >= task.updated_at:
-        print(f"Skipping update for task ID {task.id} '{task.content}' (existing is newer, {existing_task.updated_at} >= {task.updated_at})")
-        return
-
-    # If the created_at timestamps differ, then these are divergent tasks and we want to keep both
-    if (
-        existing_task.created_at != task.created_at
-        and existing_task.content != task.content
-    ):
-        print(
-            f"Divergent tasks detected for ID {task.id} ('{existing_task.content}' vs. '{task.content}'). Keeping both by adding new task."
+    if outcome == "skipped":
+        logger.debug(
+            "Skipping task ID %s (stored, archived or purged copy is as new, %s >= %s)",
+            task.id,
+            existing_task.updated_hlc
+            if existing_task
+            else max(archived_updated_hlc or 0, purge_horizon),
+            task.updated_hlc,
         )
+        return outcome
+
+    if outcome == "inserted":
+        new_task = add_full_task(task, DB_PATH)
+        logger.debug("Added new task ID %s", new_task.id)
+        return outcome
+
+    if outcome == "divergent":
         new_task = add_full_task(task, DB_PATH, use_existing_id=False)
-        print(f"New task added with ID {new_task.id}")
-        return
+        logger.debug(
+            "Divergent tasks for ID %s (%r vs. %r), kept both; new copy has ID %s",
+            task.id, existing_task.content, task.content, new_task.id,
+        )
+        return "divergent"
 
-    conn = get_conn(DB_PATH)
-    cur = conn.cursor()
+    with connect(DB_PATH) as conn:
+        cur = conn.cursor()
 
-    # Update existing task
-    cur.execute(
-        """
-        UPDATE tasks
-        SET username = ?,
-            content = ?,
-            is_completed = ?,
-            is_deleted = ?,
-            due_date = ?,
-            created_at = ?,
-            updated_at = ?
-        WHERE id = ?
-        """,
-        (
-            task.username,
-            task.content,
-            int(task.is_completed),
-            int(task.is_deleted),
-            task.due_date,
-            task.created_at,
-            task.updated_at,
-            task.id,
-        ),
-    )
+        # Update existing task
+        cur.execute(
+            """
+            UPDATE tasks
+            SET username = ?,
+                content = ?,
+                is_completed = ?,
+                is_deleted = ?,
+                due_date = ?,
+                created_at = ?,
+                updated_at = ?,
+                created_hlc = ?,
+                updated_hlc = ?
+            WHERE id = ?
+            """,
+            (
+                task.username,
+                task.content,
+                int(task.is_completed),
+                int(task.is_deleted),
+                task.due_date,
+                task.created_at,
+                task.updated_at,
+                task.created_hlc,
+                task.updated_hlc,
+                task.id,
+            ),
+        )
 
-    conn.commit()
-    conn.close()
+    logger.debug("Updated task ID %s", task.id)
+    return "updated"
 
 
-def sync_tasks(tasks: list[Task], DB_PATH: str, clear_first: bool) -> None:
+@timed
+def sync_tasks(tasks: list[Task], DB_PATH: str, clear_first: bool) -> dict[str, int]:
     """
     Sync a list of tasks into the database.
+
+    Returns:
+        How many tasks had each of the SYNC_OUTCOMES.
     """
     if clear_first:
         with open(DB_PATH, "w"):
             pass  # Clear local database file
 
+    start = time.perf_counter()
+    outcomes = dict.fromkeys(SYNC_OUTCOMES, 0)
     for task in tasks:
-        sync_task(task, DB_PATH)
+        outcomes[sync_task(task, DB_PATH)] += 1
+
+    log_sync_summary(len(tasks), outcomes, time.perf_counter() - start, DB_PATH)
+    return outcomes
+
+
+def log_sync_summary(
+    received: int, outcomes: dict[str, int], seconds: float, where: str
+) -> None:
+    """
+    Log one INFO line summarising a sync, instead of a line per task.
+
+    Args:
+        received: Number of tasks in the sync.
+        outcomes: How many tasks had each of the SYNC_OUTCOMES.
+        seconds: How long the sync took.
+        where: The database, or the user for a server sync.
+    """
+    logger.info(
+        "Synced %d tasks (%s) in %.1f ms: %d inserted, %d updated, %d skipped, %d divergent",
+        received,
+        where,
+        seconds * 1000,
+        outcomes.get("inserted", 0),
+        outcomes.get("updated", 0),
+        outcomes.get("skipped", 0),
+        outcomes.get("divergent", 0),
+    )
+
+
+@timed
+def get_dirty_tasks(username: str, DB_PATH: str) -> list[tuple[Task, int]]:
+    """
+    Return the user's tasks with local changes the server hasn't acknowledged.
+
+    Returns:
+        (task, dirty) pairs, where dirty is the task's change counter as read now.
+        Pass them to apply_remote_tasks once the server has the tasks.
+    """
+    with connect(DB_PATH) as conn:
+        cur = conn.cursor()
+
+        cur.execute(
+            """
+            SELECT id, username, content, is_completed, is_deleted, due_date, created_at, updated_at, created_hlc, updated_hlc, dirty
+            FROM tasks
+            WHERE username = ? AND dirty > 0
+            ORDER BY id ASC
+            """,
+            (username,),
+        )
+        rows = cur.fetchall()
+
+    tasks = create_tasks_from_rows([row[:-1] for row in rows])
+    return [(task, row[-1]) for task, row in zip(tasks, rows)]
+
+
+@timed
+def apply_remote_tasks(
+    tasks: list[Task], acknowledged: dict[int, int], DB_PATH: str
+) -> None:
+    """
+    Make the local database match the server's list of tasks after a push,
+    keeping local changes made while the push was in flight. Runs as a single
+    transaction.
+
+    Args:
+        tasks: Every task the server has for the user, as returned by /sync.
+        acknowledged: Task id -> dirty counter of each pushed task, as returned by
+            get_dirty_tasks. A task is only marked clean if its counter hasn't
+            moved since, i.e. it wasn't edited again during the push.
+        DB_PATH: path to the SQLite database file
+    """
+    with connect(DB_PATH) as conn:
+        cur = conn.cursor()
+
+        cur.executemany(
+            "UPDATE tasks SET dirty = 0 WHERE id = ? AND dirty = ?;",
+            list(acknowledged.items()),
+        )
+
+        # Clean rows are replaced by the server's copies; still-dirty rows win
+        # over the server's copy with the same id until they are pushed
+        cur.execute("DELETE FROM tasks WHERE dirty = 0;")
+        cur.executemany(
+            """
+            INSERT INTO tasks (
+                id,
+                username,
+                content,
+                is_completed,
+                is_deleted,
+                due_date,
+                created_at,
+                updated_at,
+                created_hlc,
+                updated_hlc
+            )
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (id) DO NOTHING
+            """,
+            [
+                (
+                    task.id,
+                    task.username,
+                    task.content,
+                    int(task.is_completed),
+                    int(task.is_deleted),
+                    task.due_date,
+                    task.created_at,
+                    task.updated_at,
+                    task.created_hlc,
+                    task.updated_hlc,
+                )
+                for task in map(with_hlc, tasks)
+            ],
+        )
 
 
+@timed
 def uncomplete_task(task_id: int, DB_PATH: str) -> None:
     """
     Mark the given task as not completed in the database.
     """
-    init_db(DB_PATH)
-    conn = get_conn(DB_PATH)
-    cur = conn.cursor()
+    with connect(DB_PATH) as conn:
+        cur = conn.cursor()
 
-    now = datetime.now().isoformat(timespec="seconds")
+        now, stamp = next_timestamp(cur, task_id=task_id)
 
-    cur.execute(
-        """
-        UPDATE tasks
-        SET is_completed = 0,
-            updated_at = ?
-        WHERE id = ?
-        """,
-        (now, task_id),
-    )
-    conn.commit()
-    conn.close()
+        cur.execute(
+            """
+            UPDATE tasks
+            SET is_completed = 0,
+                updated_at = ?,
+                updated_hlc = ?,
+                dirty = dirty + 1
+            WHERE id = ?
+            """,
+            (now, stamp, task_id),
+        )
 
 
+@timed
 def update_task_content(task_id: int, new_content: str, DB_PATH: str) -> None:
     """
     Update the content of the given task in the database.
@@ -489,25 +1210,25 @@ def update_task_content(task_id: int, new_content: str, DB_PATH: str) -> None:
         new_content: new text content for the task
         DB_PATH: path to the SQLite database file
     """
-    init_db(DB_PATH)
-    conn = get_conn(DB_PATH)
-    cur = conn.cursor()
+    with connect(DB_PATH) as conn:
+        cur = conn.cursor()
 
-    now = datetime.now().isoformat(timespec="seconds")
+        now, stamp = next_timestamp(cur, task_id=task_id)
 
-    cur.execute(
-        """
-        UPDATE tasks
-        SET content = ?,
-            updated_at = ?
-        WHERE id = ?
-        """,
-        (new_content, now, task_id),
-    )
-    conn.commit()
-    conn.close()
+        cur.execute(
+            """
+            UPDATE tasks
+            SET content = ?,
+                updated_at = ?,
+                updated_hlc = ?,
+                dirty = dirty + 1
+            WHERE id = ?
+            """,
+            (new_content, now, stamp, task_id),
+        )
 
 
+@timed
 def set_due_date(task_id: int, due_date: str, DB_PATH: str) -> None:
     """
     Set the due date for the given task in the database.
@@ -517,25 +1238,25 @@ def set_due_date(task_id: int, due_date: str, DB_PATH: str) -> None:
         due_date: Date string in YYYY-MM-DD format
         DB_PATH: path to the SQLite database file
     """
-    init_db(DB_PATH)
-    conn = get_conn(DB_PATH)
-    cur = conn.cursor()
+    with connect(DB_PATH) as conn:
+        cur = conn.cursor()
 
-    now = datetime.now().isoformat(timespec="seconds")
+        now, stamp = next_timestamp(cur, task_id=task_id)
 
-    cur.execute(
-        """
-        UPDATE tasks
-        SET due_date = ?,
-            updated_at = ?
-        WHERE id = ?
-        """,
-        (due_date, now, task_id),
-    )
-    conn.commit()
-    conn.close()
+        cur.execute(
+            """
+            UPDATE tasks
+            SET due_date = ?,
+                updated_at = ?,
+                updated_hlc = ?,
+                dirty = dirty + 1
+            WHERE id = ?
+            """,
+            (due_date, now, stamp, task_id),
+        )
 
 
+@timed
 def remove_due_date(task_id: int, DB_PATH: str) -> None:
     """
     Remove the due date from the given task in the database.
@@ -544,25 +1265,25 @@ def remove_due_date(task_id: int, DB_PATH: str) -> None:
         task_id: ID of the task to update
         DB_PATH: path to the SQLite database file
     """
-    init_db(DB_PATH)
-    conn = get_conn(DB_PATH)
-    cur = conn.cursor()
+    with connect(DB_PATH) as conn:
+        cur = conn.cursor()
 
-    now = datetime.now().isoformat(timespec="seconds")
+        now, stamp = next_timestamp(cur, task_id=task_id)
 
-    cur.execute(
-        """
-        UPDATE tasks
-        SET due_date = NULL,
-            updated_at = ?
-        WHERE id = ?
-        """,
-        (now, task_id),
-    )
-    conn.commit()
-    conn.close()
+        cur.execute(
+            """
+            UPDATE tasks
+            SET due_date = NULL,
+                updated_at = ?,
+                updated_hlc = ?,
+                dirty = dirty + 1
+            WHERE id = ?
+            """,
+            (now, stamp, task_id),
+        )
 
 
+@timed
 def delete_task(task_id: int, DB_PATH: str) -> None:
     """
     Mark the given task as deleted in the database (soft delete).
@@ -572,20 +1293,19 @@ def delete_task(task_id: int, DB_PATH: str) -> None:
         task_id: ID of the task to delete
         DB_PATH: path to the SQLite database file
     """
-    init_db(DB_PATH)
-    conn = get_conn(DB_PATH)
-    cur = conn.cursor()
+    with connect(DB_PATH) as conn:
+        cur = conn.cursor()
 
-    now = datetime.now().isoformat(timespec="seconds")
+        now, stamp = next_timestamp(cur, task_id=task_id)
 
-    cur.execute(
-        """
-        UPDATE tasks
-        SET is_deleted = 1,
-            updated_at = ?
-        WHERE id = ?
-        """,
-        (now, task_id),
-    )
-    conn.commit()
-    conn.close()
+        cur.execute(
+            """
+            UPDATE tasks
+            SET is_deleted = 1,
+                updated_at = ?,
+                updated_hlc = ?,
+                dirty = dirty + 1
+            WHERE id = ?
+            """,
+            (now, stamp, task_id),
+        )
@@ -0,0 +1,76 @@
+"""
+Hybrid logical clock (HLC) timestamps for tasks.
+
+Every task version carries created_hlc and updated_hlc alongside the readable
+created_at and updated_at strings. An HLC is one sortable 64-bit integer: the
+wall clock in milliseconds since 1970 in the high 48 bits and a logical counter
+in the low 16 bits.
+
+A new timestamp is the later of the wall clock and one tick after the newest
+timestamp already seen (see tick). The database is the clock's memory: each
+local edit ticks past the user's newest stored updated_hlc, which includes every
+version received from the server. So an edit always orders after the versions
+it was made on top of, even if two edits land in the same millisecond or this
+device's clock is behind another's, and comparing two versions of a task is a
+single integer comparison.
+
+Timestamps from before HLCs existed are converted with from_timestamp, which
+gives the same order as comparing the old strings.
+"""
+
+import time
+from datetime import datetime
+
+LOGICAL_BITS = 16
+LOGICAL_MASK = (1 << LOGICAL_BITS) - 1
+
+
+def encode(millis: int, counter: int = 0) -> int:
+    return (millis << LOGICAL_BITS) | counter
+
+
+def decode(hlc: int) -> tuple[int, int]:
+    """
+    Split an HLC into (milliseconds since 1970, logical counter).
+    """
+    return hlc >> LOGICAL_BITS, hlc & LOGICAL_MASK
+
+
+def wall_clock() -> int:
+    """
+    Return the current wall clock time as an HLC with a zero counter.
+    """
+    return encode(time.time_ns() // 1_000_000)
+
+
+def tick(last: int | None = None, wall: int | None = None) -> int:
+    """
+    Return a new timestamp, later than both the wall clock and last.
+
+    Args:
+        last: The newest HLC seen so far, e.g. the highest stored updated_hlc.
+        wall: The wall clock as an HLC (defaults to wall_clock()), for tests.
+    """
+    if wall is None:
+        wall = wall_clock()
+    # If the clock hasn't moved past last, this bumps last's counter instead
+    return max(wall, (last or 0) + 1)
+
+
+def from_timestamp(value: str | None) -> int:
+    """
+    Convert an ISO timestamp string as stored in created_at/updated_at (local
+    time) into an HLC, or 0 if it isn't one.
+    """
+    try:
+        return encode(int(datetime.fromisoformat(value).timestamp() * 1000))
+    except (TypeError, ValueError):
+        return 0
+
+
+def to_timestamp(hlc: int) -> str:
+    """
+    Format an HLC's wall clock part like the created_at/updated_at strings.
+    """
+    millis, _ = decode(hlc)
+    return datetime.fromtimestamp(millis / 1000).isoformat(timespec="seconds")
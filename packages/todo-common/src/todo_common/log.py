@@ -0,0 +1,93 @@
+"""
+Logging setup shared by the client and server.
+
+Modules log through `logging.getLogger(__name__)`, with %-style arguments rather
+than f-strings so a message is only formatted if its level is enabled. Per-task
+detail (e.g. each task handled by a sync) is logged at DEBUG, and one summary
+per sync at INFO.
+
+configure_logging attaches a handler to the package loggers (todo_common plus
+todo_client or todo_server), leaving the root logger and e.g. uvicorn's own
+loggers alone. With use_queue, records are put on an in-memory queue and a
+listener thread does the actual writing, so a slow stderr or log file never
+blocks the thread that logged.
+"""
+
+import atexit
+import logging
+import logging.handlers
+import queue
+import sys
+
+LOG_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+# The listener started by the last configure_logging(use_queue=True), if any
+_listener: logging.handlers.QueueListener | None = None
+
+
+def parse_bool(value: str | None, default: bool = False) -> bool:
+    """
+    Interpret a config value such as "true", "yes", "1", "false" or "off".
+    """
+    if value is None or value.strip() == "":
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def stop_listener() -> None:
+    """
+    Stop the queue listener, if there is one, after it writes out queued records.
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(stop_listener)
+
+
+def configure_logging(
+    level: str | int = "INFO",
+    use_queue: bool = False,
+    logger_names: tuple[str, ...] = ("todo_common",),
+    stream=None,
+) -> None:
+    """
+    Send the given package loggers to stderr (or stream) at the given level.
+
+    Args:
+        level: A level name such as "DEBUG" or "WARNING", or a logging level number.
+        use_queue: Hand records to a background thread instead of writing them inline.
+        logger_names: Top-level loggers to configure; their child loggers follow.
+        stream: Where to write log lines, stderr by default.
+
+    Calling it again replaces the handlers installed by the previous call.
+    """
+    global _listener
+
+    if isinstance(level, str):
+        name = level.strip().upper()
+        level = logging.getLevelNamesMapping().get(name)
+        if level is None:
+            raise ValueError(f"Unknown log level: {name}")
+
+    handler = logging.StreamHandler(stream if stream is not None else sys.stderr)
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+
+    stop_listener()
+
+    if use_queue:
+        records = queue.SimpleQueue()
+        _listener = logging.handlers.QueueListener(records, handler)
+        _listener.start()
+        handler = logging.handlers.QueueHandler(records)
+
+    for logger_name in logger_names:
+        logger = logging.getLogger(logger_name)
+        for old in list(logger.handlers):
+            logger.removeHandler(old)
+        logger.addHandler(handler)
+        logger.setLevel(level)
+        # Don't log twice if the application also configured the root logger
+        logger.propagate = False
@@ -0,0 +1,409 @@
+"""
+This module defines the schema migrations for client and server databases.
+
+Each migration is a function that takes a cursor and moves the schema forward by
+one version. The current version is stored in SQLite's `PRAGMA user_version`, so
+a database only ever runs the migrations it has not seen yet.
+
+Databases created before migrations existed are at version 0 with the tasks table
+already in place, which is why the first migration uses IF NOT EXISTS.
+
+To change the schema, append a new function to MIGRATIONS. Never edit or reorder
+a migration that has already shipped.
+"""
+
+import sqlite3
+
+from todo_common.hlc import from_timestamp
+
+
+def create_tasks_table(cur: sqlite3.Cursor) -> None:
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS tasks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT NOT NULL,
+            content TEXT NOT NULL,
+            is_completed INTEGER NOT NULL DEFAULT 0,
+            is_deleted INTEGER NOT NULL DEFAULT 0,
+            due_date TEXT,
+            created_at TEXT NOT NULL,
+            updated_at TEXT NOT NULL
+        );
+        """
+    )
+
+    # Supports per-user listing in creation order and keyset pagination
+    cur.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_tasks_username_created_at
+        ON tasks (username, created_at, id);
+        """
+    )
+
+
+def create_tasks_fts(cur: sqlite3.Cursor) -> None:
+    """
+    Add a full-text index over tasks.content, kept in sync by triggers.
+
+    The FTS table is an external-content table, so it stores only the index and
+    reads content from the tasks table itself. The username is indexed too, so a
+    search only ranks the searching user's tasks instead of everyone's. SQLite
+    builds without FTS5 skip this step, and search falls back to a LIKE scan.
+    """
+    if not has_fts5(cur):
+        return
+
+    cur.execute(
+        """
+        CREATE VIRTUAL TABLE tasks_fts USING fts5(
+            content,
+            username,
+            content='tasks',
+            content_rowid='id'
+        );
+        """
+    )
+    create_fts_triggers(cur)
+
+    # Index any tasks that existed before this migration
+    cur.execute("INSERT INTO tasks_fts (tasks_fts) VALUES ('rebuild');")
+
+
+def create_fts_triggers(cur: sqlite3.Cursor) -> None:
+    """
+    Create the triggers that keep tasks_fts in step with the tasks table.
+    """
+    cur.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS tasks_fts_insert AFTER INSERT ON tasks BEGIN
+            INSERT INTO tasks_fts (rowid, content, username)
+            VALUES (new.id, new.content, new.username);
+        END;
+        """
+    )
+    cur.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS tasks_fts_delete AFTER DELETE ON tasks BEGIN
+            INSERT INTO tasks_fts (tasks_fts, rowid, content, username)
+            VALUES ('delete', old.id, old.content, old.username);
+        END;
+        """
+    )
+    cur.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS tasks_fts_update
+        AFTER UPDATE OF id, content, username ON tasks
+        BEGIN
+            INSERT INTO tasks_fts (tasks_fts, rowid, content, username)
+            VALUES ('delete', old.id, old.content, old.username);
+            INSERT INTO tasks_fts (rowid, content, username)
+            VALUES (new.id, new.content, new.username);
+        END;
+        """
+    )
+
+
+def drop_fts_triggers(cur: sqlite3.Cursor) -> None:
+    """
+    Drop the tasks_fts triggers, e.g. to bulk load rows and rebuild the index once afterwards.
+    Recreate them with create_fts_triggers.
+    """
+    for trigger in ("tasks_fts_insert", "tasks_fts_delete", "tasks_fts_update"):
+        cur.execute(f"DROP TRIGGER IF EXISTS {trigger};")
+
+
+def create_tasks_archive(cur: sqlite3.Cursor) -> None:
+    """
+    Add the table that retention moves old completed and deleted tasks into.
+    """
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS tasks_archive (
+            id INTEGER PRIMARY KEY,
+            username TEXT NOT NULL,
+            content TEXT NOT NULL,
+            is_completed INTEGER NOT NULL DEFAULT 0,
+            is_deleted INTEGER NOT NULL DEFAULT 0,
+            due_date TEXT,
+            created_at TEXT NOT NULL,
+            updated_at TEXT NOT NULL,
+            archived_at TEXT NOT NULL
+        );
+        """
+    )
+
+    # Lets retention find old completed and deleted tasks without a full scan
+    cur.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_tasks_retention
+        ON tasks (is_completed, is_deleted, updated_at);
+        """
+    )
+
+
+# Turns an ISO date or datetime column into its calendar day, counted in days
+# since 1970-01-01. Timestamps are stored in local time, so this is the local day.
+EPOCH_DAY_SQL = "CAST(julianday(DATE({column})) - 2440587.5 AS INTEGER)"
+
+
+def add_epoch_day_columns(cur: sqlite3.Cursor) -> None:
+    """
+    Add integer day columns for due_date and updated_at, so date filters can be
+    index range scans instead of calling DATE() on every one of a user's rows.
+
+    They are virtual generated columns: SQLite computes them from the ISO strings,
+    so they can never drift from them and no writer has to set them. Only the
+    indexes store the values.
+    """
+    cur.execute(
+        f"""
+        ALTER TABLE tasks ADD COLUMN due_day INTEGER
+        GENERATED ALWAYS AS ({EPOCH_DAY_SQL.format(column="due_date")}) VIRTUAL;
+        """
+    )
+    cur.execute(
+        f"""
+        ALTER TABLE tasks ADD COLUMN updated_day INTEGER
+        GENERATED ALWAYS AS ({EPOCH_DAY_SQL.format(column="updated_at")}) VIRTUAL;
+        """
+    )
+
+    # Due today / overdue / due this week, and completed today
+    cur.execute(
+        """
+        CREATE INDEX idx_tasks_due_day
+        ON tasks (username, is_completed, is_deleted, due_day);
+        """
+    )
+    cur.execute(
+        """
+        CREATE INDEX idx_tasks_updated_day
+        ON tasks (username, is_completed, is_deleted, updated_day);
+        """
+    )
+
+
+def add_dirty_counter(cur: sqlite3.Cursor) -> None:
+    """
+    Add a counter of local changes not yet acknowledged by the server, so the
+    client can push only the tasks that changed.
+
+    Every local edit increments it, and a successful push resets it to 0, but
+    only if it hasn't changed since the push read it. Existing rows start at 0,
+    since there is no telling what was already synced.
+    """
+    cur.execute("ALTER TABLE tasks ADD COLUMN dirty INTEGER NOT NULL DEFAULT 0;")
+
+    # Only the few dirty rows are indexed
+    cur.execute(
+        """
+        CREATE INDEX idx_tasks_dirty
+        ON tasks (username) WHERE dirty > 0;
+        """
+    )
+
+
+def add_hlc_columns(cur: sqlite3.Cursor) -> None:
+    """
+    Add hybrid logical clock timestamps (see todo_common.hlc), so that sync can
+    tell which version of a task is newer with one integer comparison, even for
+    edits made in the same second or on devices whose clocks disagree.
+
+    Existing rows, archived ones included, are converted from their timestamp
+    strings, which keeps their order. The index answers both "newest version
+    of this user's tasks" for the next local edit and "what changed since" for
+    delta queries.
+    """
+    cur.connection.create_function(
+        "hlc_from_timestamp", 1, from_timestamp, deterministic=True
+    )
+    for table in ("tasks", "tasks_archive"):
+        cur.execute(
+            f"ALTER TABLE {table} ADD COLUMN created_hlc INTEGER NOT NULL DEFAULT 0;"
+        )
+        cur.execute(
+            f"ALTER TABLE {table} ADD COLUMN updated_hlc INTEGER NOT NULL DEFAULT 0;"
+        )
+        cur.execute(
+            f"""
+            UPDATE {table}
+            SET created_hlc = hlc_from_timestamp(created_at),
+                updated_hlc = hlc_from_timestamp(updated_at);
+            """
+        )
+
+    cur.execute(
+        """
+        CREATE INDEX idx_tasks_updated_hlc
+        ON tasks (username, updated_hlc);
+        """
+    )
+
+
+def create_sync_registry(cur: sqlite3.Cursor) -> None:
+    """
+    Add the tables that let the server purge tombstones (see todo_server.devices).
+
+    On the server, devices records how far each of a user's devices has synced,
+    as the cursor of the last /sync response it applied, and purge_horizons the
+    newest version of any tombstone purged for each user. On the client,
+    sync_state keeps this database's device ID and its last applied cursor.
+    """
+    cur.execute(
+        """
+        CREATE TABLE devices (
+            username TEXT NOT NULL,
+            device_id TEXT NOT NULL,
+            acked_hlc INTEGER NOT NULL DEFAULT 0,
+            first_seen_at TEXT NOT NULL,
+            last_seen_at TEXT NOT NULL,
+            PRIMARY KEY (username, device_id)
+        ) WITHOUT ROWID;
+        """
+    )
+    cur.execute(
+        """
+        CREATE TABLE purge_horizons (
+            username TEXT PRIMARY KEY,
+            purged_hlc INTEGER NOT NULL
+        );
+        """
+    )
+    cur.execute(
+        """
+        CREATE TABLE sync_state (
+            username TEXT PRIMARY KEY,
+            device_id TEXT NOT NULL,
+            cursor INTEGER
+        );
+        """
+    )
+
+
+def add_change_sequence(cur: sqlite3.Cursor) -> None:
+    """
+    Number every version of a task in the order this database stored it, for
+    /sync deltas and acks (see todo_common.db.get_tasks_changed_since).
+
+    updated_hlc says when a version was edited, which decides merges, but not
+    when it arrived: an edit made offline reaches the server late, with an HLC
+    below cursors it has already handed out. change_seq comes from
+    change_counter, which only ever counts up (deletes don't lower it), and is
+    set by triggers whenever a row is inserted or its data changes.
+
+    Existing rows are numbered in updated_hlc order. Device acks and purge
+    horizons were HLCs, which mean nothing as change_seqs, so acks start again
+    at 0 and each device's next sync sets its first real one.
+    """
+    cur.execute("ALTER TABLE tasks ADD COLUMN change_seq INTEGER NOT NULL DEFAULT 0;")
+    cur.execute(
+        """
+        UPDATE tasks SET change_seq = ordered.position
+        FROM (
+            SELECT id, ROW_NUMBER() OVER (ORDER BY updated_hlc, id) AS position
+            FROM tasks
+        ) AS ordered
+        WHERE tasks.id = ordered.id;
+        """
+    )
+    cur.execute("CREATE TABLE change_counter (seq INTEGER NOT NULL);")
+    cur.execute("INSERT INTO change_counter (seq) SELECT COUNT(*) FROM tasks;")
+    # Not dirty (client-side bookkeeping) nor change_seq itself
+    data_columns = (
+        "username, content, is_completed, is_deleted, due_date, "
+        "created_at, updated_at, created_hlc, updated_hlc"
+    )
+    for name, event in (("insert", "INSERT"), ("update", f"UPDATE OF {data_columns}")):
+        cur.execute(
+            f"""
+            CREATE TRIGGER tasks_change_seq_{name} AFTER {event} ON tasks
+            BEGIN
+                UPDATE change_counter SET seq = seq + 1;
+                UPDATE tasks SET change_seq = (SELECT seq FROM change_counter)
+                WHERE id = new.id;
+            END;
+            """
+        )
+    cur.execute(
+        """
+        CREATE INDEX idx_tasks_change_seq
+        ON tasks (username, change_seq);
+        """
+    )
+
+    cur.execute("ALTER TABLE devices RENAME COLUMN acked_hlc TO acked_seq;")
+    cur.execute("UPDATE devices SET acked_seq = 0;")
+    cur.execute(
+        "ALTER TABLE purge_horizons ADD COLUMN purged_seq INTEGER NOT NULL DEFAULT 0;"
+    )
+
+
+def add_sync_horizon(cur: sqlite3.Cursor) -> None:
+    """
+    Keep the server's purge horizon in sync_state, as of the last /sync.
+
+    A device whose clock is behind could otherwise give a new task an
+    updated_hlc at or below the horizon, e.g. after every task newer than it
+    was deleted and purged, and the server would skip it as a purged copy.
+    db.next_timestamp ticks past it instead.
+    """
+    cur.execute(
+        "ALTER TABLE sync_state ADD COLUMN horizon INTEGER NOT NULL DEFAULT 0;"
+    )
+
+
+MIGRATIONS = [
+    create_tasks_table,
+    create_tasks_fts,
+    create_tasks_archive,
+    add_epoch_day_columns,
+    add_dirty_counter,
+    add_hlc_columns,
+    create_sync_registry,
+    add_change_sequence,
+    add_sync_horizon,
+]
+
+
+def has_fts5(cur: sqlite3.Cursor) -> bool:
+    """
+    Return True if this SQLite build supports FTS5.
+    """
+    cur.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5');")
+    return bool(cur.fetchone()[0])
+
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version;").fetchone()[0]
+
+
+def migrate(conn: sqlite3.Connection) -> None:
+    """
+    Apply any migrations the database has not seen yet.
+
+    Each migration runs in its own write transaction together with the version
+    bump, so a crash or a concurrent process can never apply one twice.
+    """
+    if get_schema_version(conn) >= len(MIGRATIONS):
+        return
+
+    cur = conn.cursor()
+
+    # auto_vacuum can only be switched on cheaply before the first table exists.
+    # It lets retention hand freed pages back with PRAGMA incremental_vacuum.
+    cur.execute("SELECT COUNT(*) FROM sqlite_master;")
+    if cur.fetchone()[0] == 0:
+        cur.execute("PRAGMA auto_vacuum = INCREMENTAL;")
+
+    for version in range(1, len(MIGRATIONS) + 1):
+        cur.execute("BEGIN IMMEDIATE;")
+        try:
+            # Re-check inside the lock in case another process got here first
+            if get_schema_version(conn) < version:
+                MIGRATIONS[version - 1](cur)
+                cur.execute(f"PRAGMA user_version = {version};")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
@@ -0,0 +1,185 @@
+"""
+This module moves old completed and deleted tasks out of the tasks table.
+
+Completed tasks and soft-deleted tombstones are never read again by the client,
+but they stay in the tasks table and in every sync payload forever. Retention
+moves them, in small batches, into the server's tasks_archive table, and then
+hands the freed pages back to the filesystem with an incremental vacuum.
+Clients never archive on their own: their tasks are rebuilt from the server's
+on every sync, so they lose archived tasks when the server does.
+
+A task is archived if either rule matches:
+    * it is completed or deleted, and was last updated more than older_than_days ago
+    * it is completed, and its owner has more than keep_completed newer completed tasks
+      (the design doc's "retain the last 10 completed tasks")
+"""
+
+from datetime import datetime, timedelta
+
+from todo_common.db import get_conn, init_db
+
+TASK_COLUMNS = (
+    "id, username, content, is_completed, is_deleted, due_date, created_at, updated_at, "
+    "created_hlc, updated_hlc"
+)
+
+
+def find_old_task_ids(cur, older_than_days: int, limit: int = 500) -> list[int]:
+    """
+    Return up to `limit` ids of completed and deleted tasks last updated more
+    than older_than_days ago.
+    """
+    cutoff = (datetime.now() - timedelta(days=older_than_days)).isoformat(
+        timespec="seconds"
+    )
+    # Tombstones, then completed tasks; both are range scans on idx_tasks_retention
+    cur.execute(
+        """
+        SELECT id FROM tasks
+        WHERE is_completed IN (0, 1) AND is_deleted = 1 AND updated_at < ?
+        UNION
+        SELECT id FROM tasks
+        WHERE is_completed = 1 AND is_deleted = 0 AND updated_at < ?
+        LIMIT ?
+        """,
+        (cutoff, cutoff, limit),
+    )
+    return [row[0] for row in cur.fetchall()]
+
+
+def find_excess_completed_ids(
+    cur, keep_completed: int, limit: int | None = None
+) -> list[int]:
+    """
+    Return the ids of completed tasks beyond each user's keep_completed most
+    recent ones (at most `limit` of them, if given).
+
+    This ranks every completed task of every user, so archive_tasks runs it
+    once per run and works through the result in batches.
+    """
+    cur.execute(
+        """
+        SELECT id FROM (
+            SELECT id, ROW_NUMBER() OVER (
+                PARTITION BY username ORDER BY updated_at DESC, id DESC
+            ) AS position
+            FROM tasks
+            WHERE is_completed = 1 AND is_deleted = 0
+        )
+        WHERE position > ?
+        LIMIT ?
+        """,
+        (keep_completed, -1 if limit is None else limit),
+    )
+    return [row[0] for row in cur.fetchall()]
+
+
+def archive_tasks(
+    DB_PATH: str,
+    older_than_days: int | None = None,
+    keep_completed: int | None = None,
+    batch_size: int = 500,
+    max_batches: int | None = None,
+    vacuum: bool = True,
+) -> int:
+    """
+    Move archivable tasks from the tasks table to tasks_archive in batches.
+
+    Each batch is its own short transaction, so a large backlog never holds the
+    write lock for long and concurrent syncs can interleave with retention.
+    Tasks over the keep_completed limit are ranked once, before the first
+    batch; a task that was uncompleted or deleted since is left alone.
+
+    Args:
+        DB_PATH: path to the SQLite database file
+        older_than_days: archive completed and deleted tasks last updated more than this many days ago
+        keep_completed: archive completed tasks beyond this many most recent ones per user
+        batch_size: number of tasks moved per transaction
+        max_batches: stop after this many batches (None means until nothing is left)
+        vacuum: if True, return the freed pages to the filesystem afterwards
+
+    Returns:
+        The number of tasks archived.
+    """
+    init_db(DB_PATH)
+    conn = get_conn(DB_PATH)
+    cur = conn.cursor()
+
+    excess = []
+    if keep_completed is not None:
+        limit = None if max_batches is None else batch_size * max_batches
+        excess = find_excess_completed_ids(cur, keep_completed, limit)
+
+    archived = 0
+    batches = 0
+    offset = 0
+    try:
+        while max_batches is None or batches < max_batches:
+            if offset < len(excess):
+                ids = excess[offset : offset + batch_size]
+                offset += batch_size
+                still_archivable = "AND is_completed = 1 AND is_deleted = 0"
+            elif older_than_days is not None:
+                ids = find_old_task_ids(cur, older_than_days, batch_size)
+                still_archivable = ""
+            else:
+                break
+            if not ids:
+                break
+
+            placeholders = ", ".join("?" for _ in ids)
+            now = datetime.now().isoformat(timespec="seconds")
+            cur.execute(
+                f"""
+                INSERT OR REPLACE INTO tasks_archive ({TASK_COLUMNS}, archived_at)
+                SELECT {TASK_COLUMNS}, ? FROM tasks
+                WHERE id IN ({placeholders}) {still_archivable}
+                """,
+                (now, *ids),
+            )
+            cur.execute(
+                f"DELETE FROM tasks WHERE id IN ({placeholders}) {still_archivable}", ids
+            )
+            archived += cur.rowcount
+            conn.commit()
+
+            batches += 1
+
+        if vacuum and archived:
+            incremental_vacuum(conn)
+    finally:
+        conn.close()
+
+    return archived
+
+
+def incremental_vacuum(conn, pages: int | None = None) -> None:
+    """
+    Release free pages at the end of the database file back to the filesystem.
+
+    Only has an effect on databases created with auto_vacuum=INCREMENTAL, which is
+    every database created since the retention migration. Older databases can be
+    converted once with convert_to_incremental_vacuum.
+    """
+    if pages is None:
+        conn.execute("PRAGMA incremental_vacuum;").fetchall()
+    else:
+        conn.execute(f"PRAGMA incremental_vacuum({int(pages)});").fetchall()
+    conn.commit()
+
+
+def convert_to_incremental_vacuum(DB_PATH: str) -> None:
+    """
+    Switch an existing database to auto_vacuum=INCREMENTAL.
+
+    This needs a full VACUUM, which rewrites the whole file and blocks writers
+    while it runs, so it is an explicit one-off step rather than a migration.
+    """
+    conn = get_conn(DB_PATH)
+    try:
+        if conn.execute("PRAGMA auto_vacuum;").fetchone()[0] != 2:
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL;")
+            conn.execute("VACUUM;")
+    finally:
+        conn.close()
+
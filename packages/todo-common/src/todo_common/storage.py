@@ -0,0 +1,633 @@
+"""
+Storage engines for tasks, behind one interface.
+
+StorageBackend covers what the client and server do with tasks: create, get,
+list, filter, search, sync and list users, plus the client's edits. Two engines
+implement it:
+
+* SQLiteBackend, the default, runs the functions in todo_common.db against a
+  database file, so it behaves exactly as before.
+* MemoryBackend keeps tasks in dicts, with per-user sorted indexes standing in
+  for SQLite's. Nothing touches the disk and nothing survives the process, which
+  suits tests, benchmarks and throwaway deployments (e.g. a server at the edge
+  that clients resync into).
+
+Both merge syncs with todo_common.db.sync_decision, so they keep the same task
+for the same input. Pick one with `storage_backend` ("sqlite" or "memory") in
+the client or server config; see open_storage.
+"""
+
+import json
+import re
+import threading
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left, bisect_right, insort
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager, nullcontext
+from dataclasses import asdict, replace
+from datetime import date
+from itertools import islice
+
+from todo_common import db, hlc
+from todo_common.task import Task
+
+BACKENDS = ("sqlite", "memory")
+
+
+class StorageBackend(ABC):
+    """
+    Where tasks live. Methods match the todo_common.db functions of the same
+    name, without the DB_PATH argument.
+    """
+
+    @abstractmethod
+    def create_task(self, content: str, username: str) -> Task:
+        """Create a task as a local edit and return it."""
+
+    @abstractmethod
+    def add_full_task(self, task: Task, use_existing_id: bool = True) -> Task:
+        """Store a complete task (e.g. from another device) and return it with its ID."""
+
+    @abstractmethod
+    def get_task(self, task_id: int) -> Task | None:
+        """Return the task with this ID, or None."""
+
+    @abstractmethod
+    def get_tasks_for_user(self, username: str) -> list[Task]:
+        """Return all of a user's tasks, deleted ones included, oldest first."""
+
+    @abstractmethod
+    def get_tasks_for_user_filtered(
+        self,
+        username: str,
+        only_completed: bool = False,
+        only_today: bool = False,
+        include_deleted: bool = False,
+        due: str | None = None,
+    ) -> list[Task]:
+        """Return a user's tasks matching the filters (see db.build_filter_where), oldest first."""
+
+    def iter_tasks_for_user_filtered(
+        self,
+        username: str,
+        only_completed: bool = False,
+        only_today: bool = False,
+        include_deleted: bool = False,
+        due: str | None = None,
+    ) -> Iterator[Task]:
+        """Yield the tasks get_tasks_for_user_filtered returns, one at a time."""
+        yield from self.get_tasks_for_user_filtered(
+            username, only_completed, only_today, include_deleted, due
+        )
+
+    @abstractmethod
+    def get_tasks_page_for_user(
+        self,
+        username: str,
+        after: tuple[str, int] | None = None,
+        limit: int = 100,
+        only_completed: bool = False,
+        only_today: bool = False,
+        include_deleted: bool = False,
+        due: str | None = None,
+    ) -> tuple[list[Task], tuple[str, int] | None]:
+        """Return one page of filtered tasks after the (created_at, id) key, and the next key."""
+
+    @abstractmethod
+    def get_tasks_changed_since(self, username: str, since: int) -> list[Task]:
+        """Return a user's tasks stored after change_seq since, in the order they were stored."""
+
+    @abstractmethod
+    def get_last_change_seq(self) -> int:
+        """Return the change_seq of the newest version stored (see db.get_last_change_seq)."""
+
+    def get_tasks_json_for_user(
+        self, username: str, since: int | None = None
+    ) -> tuple[bytes, int]:
+        """
+        Return a user's tasks (or those changed since) as a JSON array, and the
+        cursor for the next delta (see db.get_tasks_json_for_user).
+        """
+        # Read before the tasks, so the cursor never covers a change they miss
+        cursor = self.get_last_change_seq()
+        if since is None or since > cursor:
+            tasks = self.get_tasks_for_user(username)
+        else:
+            tasks = self.get_tasks_changed_since(username, since)
+        tasks_json = json.dumps([asdict(task) for task in tasks], ensure_ascii=False)
+        return tasks_json.encode(), cursor
+
+    @abstractmethod
+    def search_tasks(
+        self, username: str, query: str, limit: int = 50, include_deleted: bool = False
+    ) -> list[Task]:
+        """Return a user's tasks containing every word of query (as word prefixes)."""
+
+    @abstractmethod
+    def get_users(self) -> list[str]:
+        """Return every username with tasks."""
+
+    @abstractmethod
+    def sync_task(self, task: Task) -> str:
+        """Merge one incoming task and return what happened, one of db.SYNC_OUTCOMES."""
+
+    def sync_tasks(self, tasks: list[Task], clear_first: bool = False) -> dict[str, int]:
+        """
+        Merge a list of tasks, after removing every stored task if clear_first.
+
+        Returns:
+            How many tasks had each of db.SYNC_OUTCOMES.
+        """
+        if clear_first:
+            self.clear()
+
+        start = time.perf_counter()
+        outcomes = dict.fromkeys(db.SYNC_OUTCOMES, 0)
+        with self.writing():
+            for task in tasks:
+                outcomes[self.sync_task(task)] += 1
+
+        db.log_sync_summary(len(tasks), outcomes, time.perf_counter() - start, repr(self))
+        return outcomes
+
+    @abstractmethod
+    def clear(self) -> None:
+        """Remove every task."""
+
+    @abstractmethod
+    def complete_task(self, task_id: int) -> None:
+        """Mark a task completed."""
+
+    @abstractmethod
+    def uncomplete_task(self, task_id: int) -> None:
+        """Mark a task not completed."""
+
+    @abstractmethod
+    def update_task_content(self, task_id: int, new_content: str) -> None:
+        """Change a task's content."""
+
+    @abstractmethod
+    def set_due_date(self, task_id: int, due_date: str) -> None:
+        """Set a task's due date (YYYY-MM-DD)."""
+
+    @abstractmethod
+    def remove_due_date(self, task_id: int) -> None:
+        """Remove a task's due date."""
+
+    @abstractmethod
+    def delete_task(self, task_id: int) -> None:
+        """Soft-delete a task."""
+
+    @abstractmethod
+    def get_sync_state(self, username: str) -> tuple[str | None, int | None]:
+        """Return the client's device ID and last applied /sync cursor for a user (see db.get_sync_state)."""
+
+    @abstractmethod
+    def save_sync_state(
+        self, username: str, device_id: str, cursor: int | None, horizon: int = 0
+    ) -> None:
+        """Record the client's device ID, applied /sync cursor and the server's purge horizon for a user."""
+
+    def reading(self):
+        """
+        Context manager around a group of reads, e.g. to hold a pooled connection.
+        """
+        return nullcontext()
+
+    def writing(self):
+        """
+        Context manager around a group of writes, applied together where the engine can.
+        """
+        return nullcontext()
+
+    def savepoint(self):
+        """
+        Context manager around part of a writing() group, whose writes are undone
+        alone if it raises, where the engine can. Other engines keep them.
+        """
+        return nullcontext()
+
+    def close(self) -> None:
+        """Release the engine's resources."""
+
+
+class SQLiteBackend(StorageBackend):
+    """
+    Tasks in a SQLite database file, through the functions in todo_common.db.
+    """
+
+    def __init__(self, DB_PATH: str):
+        self.DB_PATH = DB_PATH
+
+    def __repr__(self) -> str:
+        return self.DB_PATH
+
+    def create_task(self, content, username):
+        return db.create_task(content, username, self.DB_PATH)
+
+    def add_full_task(self, task, use_existing_id=True):
+        return db.add_full_task(task, self.DB_PATH, use_existing_id)
+
+    def get_task(self, task_id):
+        return db.get_task(task_id, self.DB_PATH)
+
+    def get_tasks_for_user(self, username):
+        return db.get_tasks_for_user(username, self.DB_PATH)
+
+    def get_tasks_for_user_filtered(
+        self, username, only_completed=False, only_today=False, include_deleted=False, due=None
+    ):
+        return db.get_tasks_for_user_filtered(
+            username, self.DB_PATH, only_completed, only_today, include_deleted, due
+        )
+
+    def iter_tasks_for_user_filtered(
+        self, username, only_completed=False, only_today=False, include_deleted=False, due=None
+    ):
+        # Streams from the cursor instead of building the list first
+        return db.iter_tasks_for_user_filtered(
+            username, self.DB_PATH, only_completed, only_today, include_deleted, due
+        )
+
+    def get_tasks_page_for_user(self, username, after=None, limit=100, **filters):
+        return db.get_tasks_page_for_user(
+            username, self.DB_PATH, after=after, limit=limit, **filters
+        )
+
+    def get_tasks_changed_since(self, username, since):
+        return db.get_tasks_changed_since(username, since, self.DB_PATH)
+
+    def get_last_change_seq(self):
+        return db.get_last_change_seq(self.DB_PATH)
+
+    def get_tasks_json_for_user(self, username, since=None):
+        # SQLite writes the JSON itself, which is several times faster
+        return db.get_tasks_json_for_user(username, self.DB_PATH, since)
+
+    def search_tasks(self, username, query, limit=50, include_deleted=False):
+        return db.search_tasks(
+            username, query, self.DB_PATH, limit=limit, include_deleted=include_deleted
+        )
+
+    def get_users(self):
+        return db.get_users(self.DB_PATH)
+
+    def sync_task(self, task):
+        return db.sync_task(task, self.DB_PATH)
+
+    def sync_tasks(self, tasks, clear_first=False):
+        return db.sync_tasks(tasks, self.DB_PATH, clear_first)
+
+    def clear(self):
+        with db.connect(self.DB_PATH) as conn:
+            conn.execute("DELETE FROM tasks;")
+
+    def complete_task(self, task_id):
+        db.complete_task(task_id, self.DB_PATH)
+
+    def uncomplete_task(self, task_id):
+        db.uncomplete_task(task_id, self.DB_PATH)
+
+    def update_task_content(self, task_id, new_content):
+        db.update_task_content(task_id, new_content, self.DB_PATH)
+
+    def set_due_date(self, task_id, due_date):
+        db.set_due_date(task_id, due_date, self.DB_PATH)
+
+    def remove_due_date(self, task_id):
+        db.remove_due_date(task_id, self.DB_PATH)
+
+    def delete_task(self, task_id):
+        db.delete_task(task_id, self.DB_PATH)
+
+    def get_sync_state(self, username):
+        return db.get_sync_state(username, self.DB_PATH)
+
+    def save_sync_state(self, username, device_id, cursor, horizon=0):
+        db.save_sync_state(username, device_id, cursor, self.DB_PATH, horizon)
+
+
+def day_of(value: str | None) -> int | None:
+    """
+    Return an ISO date or timestamp as days since 1970-01-01, like the due_day
+    and updated_day columns (None if it isn't a date).
+    """
+    try:
+        return db.epoch_day(date.fromisoformat(value[:10]))
+    except (TypeError, ValueError):
+        return None
+
+
+# Which day a date filter looks at, as an index into MemoryBackend's cached days
+DUE_DAY, UPDATED_DAY = 0, 1
+
+
+def day_range(
+    only_completed: bool = False, only_today: bool = False, due: str | None = None
+) -> tuple[int, float, float] | None:
+    """
+    Return the days the date filters of db.build_filter_where select, as
+    (DUE_DAY or UPDATED_DAY, first day, day after the last), or None if there
+    is no date filter.
+    """
+    if due is not None and due not in db.DUE_RANGES:
+        raise ValueError(f"Unknown due date range: {due}")
+    if only_today:
+        due = "today"
+
+    today = db.epoch_day(date.today())
+    if due == "today" and only_completed:
+        # Completed *today* — ignore due date
+        return UPDATED_DAY, today, today + 1
+    if due == "today":
+        return DUE_DAY, today, today + 1
+    if due == "overdue":
+        return DUE_DAY, float("-inf"), today
+    if due == "week":
+        return DUE_DAY, today, today + 7
+    return None
+
+
+class MemoryBackend(StorageBackend):
+    """
+    Tasks in memory: a dict by ID, plus three sorted lists of keys per user,
+    by (created_at, id) for listing and paging, by (updated_hlc, id) for the
+    next HLC and by (change_seq, id) for deltas. A re-entrant lock makes each
+    method, and each `with writing():` block, atomic across threads.
+    """
+
+    def __init__(self, name: str = "memory"):
+        self.name = name
+        self._tasks: dict[int, Task] = {}
+        self._by_created: dict[str, list[tuple[str, int]]] = {}
+        self._by_updated: dict[str, list[tuple[int, int]]] = {}
+        self._by_change: dict[str, list[tuple[int, int]]] = {}
+        # ID -> change_seq of the stored version, and the last one given out,
+        # which a clear doesn't reset
+        self._changes: dict[int, int] = {}
+        self._seq = 0
+        # ID -> (due day, updated day), parsed once like SQLite's generated columns
+        self._days: dict[int, tuple[int | None, int | None]] = {}
+        # Like AUTOINCREMENT, IDs are never reused
+        self._last_id = 0
+        # Username -> (device ID, cursor, horizon), as the sync_state table
+        self._sync_state: dict[str, tuple[str, int | None, int]] = {}
+        self._lock = threading.RLock()
+
+    def __repr__(self) -> str:
+        return f"memory:{self.name}"
+
+    def _put(self, task: Task) -> Task:
+        old = self._tasks.get(task.id)
+        # Store first, so a store that can fail (e.g. on disk) leaves the indexes as they were
+        self._tasks[task.id] = task
+        self._index(task, old, self._stored_seq(task.id))
+        return task
+
+    def _stored_seq(self, task_id: int) -> int:
+        # The change_seq of the version of the task just stored
+        return self._seq + 1
+
+    def _index(self, task: Task, old: Task | None, seq: int) -> None:
+        # Add a stored task to the indexes, in place of the version it replaced
+        if old is not None:
+            self._unindex(old)
+        self._days[task.id] = (day_of(task.due_date), day_of(task.updated_at))
+        insort(self._by_created.setdefault(task.username, []), (task.created_at, task.id))
+        insort(self._by_updated.setdefault(task.username, []), (task.updated_hlc, task.id))
+        insort(self._by_change.setdefault(task.username, []), (seq, task.id))
+        self._changes[task.id] = seq
+        self._seq = max(self._seq, seq)
+        self._last_id = max(self._last_id, task.id)
+
+    def _unindex(self, task: Task) -> None:
+        for keys, key in (
+            (self._by_created[task.username], (task.created_at, task.id)),
+            (self._by_updated[task.username], (task.updated_hlc, task.id)),
+            (self._by_change[task.username], (self._changes[task.id], task.id)),
+        ):
+            del keys[bisect_left(keys, key)]
+
+    def _next_timestamp(self, username: str) -> tuple[str, int]:
+        # As db.next_timestamp: tick past the newest version of the user's
+        # tasks and the server's purge horizon
+        changes = self._by_updated.get(username)
+        horizon = self._sync_state.get(username, (None, None, 0))[2]
+        stamp = hlc.tick(max(changes[-1][0] if changes else 0, horizon))
+        return hlc.to_timestamp(stamp), stamp
+
+    def _edit(self, task_id: int, **changes) -> None:
+        with self._lock:
+            task = self._tasks.get(task_id)
+            if task is None:
+                return
+            now, stamp = self._next_timestamp(task.username)
+            self._put(replace(task, updated_at=now, updated_hlc=stamp, **changes))
+
+    def _tasks_for(self, keys: list[tuple]) -> list[Task]:
+        return [self._tasks[task_id] for _, task_id in keys]
+
+    def _filtered(
+        self,
+        keys: Iterable[tuple],
+        only_completed: bool = False,
+        only_today: bool = False,
+        include_deleted: bool = False,
+        due: str | None = None,
+    ) -> Iterator[Task]:
+        # The tasks for keys that pass the same filters as db.build_filter_where
+        days = day_range(only_completed, only_today, due)
+        for _, task_id in keys:
+            task = self._tasks[task_id]
+            if task.is_completed != only_completed:
+                continue
+            if task.is_deleted and not include_deleted:
+                continue
+            if days is not None:
+                column, first, end = days
+                day = self._days[task_id][column]
+                if day is None or not first <= day < end:
+                    continue
+            yield task
+
+    def create_task(self, content, username):
+        with self._lock:
+            now, stamp = self._next_timestamp(username)
+            return self._put(
+                Task(
+                    id=self._last_id + 1,
+                    username=username,
+                    content=content,
+                    is_completed=False,
+                    is_deleted=False,
+                    due_date=None,
+                    created_at=now,
+                    updated_at=now,
+                    created_hlc=stamp,
+                    updated_hlc=stamp,
+                )
+            )
+
+    def add_full_task(self, task, use_existing_id=True):
+        task = db.with_hlc(task)
+        with self._lock:
+            if not use_existing_id or task.id is None:
+                task = replace(task, id=self._last_id + 1)
+            elif task.id in self._tasks:
+                raise ValueError(f"Task {task.id} already exists")
+            return self._put(task)
+
+    def get_task(self, task_id):
+        return self._tasks.get(task_id)
+
+    def get_tasks_for_user(self, username):
+        with self._lock:
+            return self._tasks_for(self._by_created.get(username, []))
+
+    def get_tasks_for_user_filtered(
+        self, username, only_completed=False, only_today=False, include_deleted=False, due=None
+    ):
+        with self._lock:
+            return list(
+                self._filtered(
+                    self._by_created.get(username, []),
+                    only_completed,
+                    only_today,
+                    include_deleted,
+                    due,
+                )
+            )
+
+    def get_tasks_page_for_user(self, username, after=None, limit=100, **filters):
+        tasks = []
+        with self._lock:
+            keys = self._by_created.get(username, [])
+            start = bisect_right(keys, tuple(after)) if after is not None else 0
+            for task in self._filtered(islice(keys, start, None), **filters):
+                tasks.append(task)
+                # One extra, so we know whether another page follows
+                if len(tasks) > limit:
+                    break
+
+        next_key = None
+        if len(tasks) > limit:
+            tasks = tasks[:limit]
+            next_key = (tasks[-1].created_at, tasks[-1].id)
+        return tasks, next_key
+
+    def get_tasks_changed_since(self, username, since):
+        with self._lock:
+            keys = self._by_change.get(username, [])
+            # Every key with change_seq > since sorts after (since, any id)
+            start = bisect_right(keys, (since, float("inf")))
+            return self._tasks_for(keys[start:])
+
+    def get_last_change_seq(self):
+        return self._seq
+
+    def search_tasks(self, username, query, limit=50, include_deleted=False):
+        # Prefix matching on words, like the FTS index, but unranked: oldest first
+        terms = [term.lower() for term in query.split()]
+        if not terms:
+            return []
+
+        found = []
+        for task in self.get_tasks_for_user(username):
+            if task.is_deleted and not include_deleted:
+                continue
+            words = re.findall(r"\w+", task.content.lower())
+            if all(any(word.startswith(term) for word in words) for term in terms):
+                found.append(task)
+                if len(found) == limit:
+                    break
+        return found
+
+    def get_users(self):
+        with self._lock:
+            return [user for user, keys in self._by_created.items() if keys]
+
+    def sync_task(self, task):
+        task = db.with_hlc(task)
+        with self._lock:
+            outcome = db.sync_decision(self._tasks.get(task.id), task)
+            if outcome == "inserted" or outcome == "updated":
+                self._put(task)
+            elif outcome == "divergent":
+                self._put(replace(task, id=self._last_id + 1))
+        return outcome
+
+    def _clear_indexes(self) -> None:
+        self._days.clear()
+        self._by_created.clear()
+        self._by_updated.clear()
+        self._by_change.clear()
+        self._changes.clear()
+
+    def clear(self):
+        with self._lock:
+            self._tasks.clear()
+            self._clear_indexes()
+
+    def complete_task(self, task_id):
+        self._edit(task_id, is_completed=True)
+
+    def uncomplete_task(self, task_id):
+        self._edit(task_id, is_completed=False)
+
+    def update_task_content(self, task_id, new_content):
+        self._edit(task_id, content=new_content)
+
+    def set_due_date(self, task_id, due_date):
+        self._edit(task_id, due_date=due_date)
+
+    def remove_due_date(self, task_id):
+        self._edit(task_id, due_date=None)
+
+    def delete_task(self, task_id):
+        self._edit(task_id, is_deleted=True)
+
+    def get_sync_state(self, username):
+        return self._sync_state.get(username, (None, None, 0))[:2]
+
+    def save_sync_state(self, username, device_id, cursor, horizon=0):
+        horizon = max(self._sync_state.get(username, (None, None, 0))[2], horizon)
+        self._sync_state[username] = (device_id, cursor, horizon)
+
+    @contextmanager
+    def writing(self):
+        # Other threads wait until the whole group is applied
+        with self._lock:
+            yield
+
+
+# Memory engines by name, so everything in a process that opens the same name
+# (e.g. each command in a client shell) sees the same tasks
+_memory_backends: dict[str, MemoryBackend] = {}
+
+
+def open_storage(config: dict, default_database_file: str) -> StorageBackend:
+    """
+    Return the storage engine named by the config's storage_backend.
+
+    Args:
+        config: client or server config; storage_backend is "sqlite" (the
+            default) or "memory", and database_file names the SQLite file, or
+            the in-memory store
+        default_database_file: database_file when the config has none
+
+    Raises:
+        ValueError for an unknown storage_backend.
+    """
+    backend = config.get("storage_backend", "sqlite")
+    database_file = config.get("database_file", default_database_file)
+
+    if backend == "sqlite":
+        return SQLiteBackend(database_file)
+    if backend == "memory":
+        if database_file not in _memory_backends:
+            _memory_backends[database_file] = MemoryBackend(database_file)
+        return _memory_backends[database_file]
+    raise ValueError(
+        f"Unknown storage_backend: {backend} (expected one of {', '.join(BACKENDS)})"
+    )
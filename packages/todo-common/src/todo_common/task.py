@@ -19,3 +19,7 @@ class Task:
     due_date: str | None
     created_at: str
     updated_at: str
+    # Hybrid logical clock versions of the timestamps (see todo_common.hlc).
+    # 0 means unknown, e.g. a task from a client that predates them.
+    created_hlc: int = 0
+    updated_hlc: int = 0
@@ -0,0 +1,178 @@
+"""
+Lightweight span tracing for syncs, with no collector or extra dependency.
+
+The client starts a trace for each sync and sends its id to the server in a
+W3C-style `traceparent` header. Both sides time the steps of the sync as spans,
+which can be appended to a local JSON-lines file (`trace_file` in the client or
+server config), one span per line, to be joined on trace_id later. The server
+also returns its span durations in a `Server-Timing` header, so the client can
+show the whole breakdown (`todo-client sync --timings`) without reading the
+server's file.
+"""
+
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+TRACEPARENT = re.compile(r"^00-(?P<trace_id>[0-9a-f]{32})-(?P<span_id>[0-9a-f]{16})-[0-9a-f]{2}$")
+
+# Appends from concurrent requests must not interleave
+_export_lock = threading.Lock()
+
+
+def new_trace_id() -> str:
+    return os.urandom(16).hex()
+
+
+def new_span_id() -> str:
+    return os.urandom(8).hex()
+
+
+def format_traceparent(trace_id: str, span_id: str) -> str:
+    return f"00-{trace_id}-{span_id}-01"
+
+
+def parse_traceparent(value: str | None) -> tuple[str, str] | None:
+    """
+    Return (trace_id, parent span_id) from a traceparent header, or None if it
+    is missing or malformed.
+    """
+    match = TRACEPARENT.match(value.strip().lower()) if value else None
+    if match is None:
+        return None
+    return match["trace_id"], match["span_id"]
+
+
+class Tracer:
+    """
+    Records the spans of one trace in memory.
+
+    Args:
+        service: Name recorded on every span, e.g. "todo-client".
+        traceparent: An incoming traceparent header to continue, if any.
+    """
+
+    def __init__(self, service: str, traceparent: str | None = None):
+        self.service = service
+        self.spans = []
+        self._stack = []
+
+        parent = parse_traceparent(traceparent)
+        if parent is None:
+            self.trace_id, self.parent_id = new_trace_id(), None
+        else:
+            self.trace_id, self.parent_id = parent
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        """
+        Time the body of the with block as a span, nested under the enclosing one.
+        Yields the span dict, so attributes can be added while it runs.
+        """
+        span = self.add_span(name, None, **attributes)
+        span["start"] = time.time()
+        self._stack.append(span)
+        start = time.perf_counter()
+        try:
+            yield span
+        finally:
+            span["duration_ms"] = round((time.perf_counter() - start) * 1000, 3)
+            self._stack.pop()
+
+    def add_span(
+        self,
+        name: str,
+        duration_ms: float | None,
+        parent: dict | None = None,
+        service: str | None = None,
+        **attributes,
+    ) -> dict:
+        """
+        Record a span that was timed elsewhere, e.g. one reported by the server.
+        It is nested under parent, or else under the span currently running.
+        """
+        if parent is None and self._stack:
+            parent = self._stack[-1]
+        span = {
+            "trace_id": self.trace_id,
+            "span_id": new_span_id(),
+            "parent_id": parent["span_id"] if parent else self.parent_id,
+            "service": service or self.service,
+            "name": name,
+            "start": None,
+            "duration_ms": duration_ms,
+            "attributes": attributes,
+        }
+        self.spans.append(span)
+        return span
+
+    def traceparent(self) -> str:
+        """
+        The header to send downstream, naming the span currently running as parent.
+        """
+        span_id = self._stack[-1]["span_id"] if self._stack else new_span_id()
+        return format_traceparent(self.trace_id, span_id)
+
+    def server_timing(self) -> str:
+        """
+        Format the finished spans as a Server-Timing header value.
+        """
+        return ", ".join(
+            f"{span['name']};dur={span['duration_ms']}"
+            for span in self.spans
+            if span["duration_ms"] is not None
+        )
+
+    def export(self, path: str) -> None:
+        """
+        Append every span to a JSON-lines file.
+        """
+        lines = "".join(json.dumps(span) + "\n" for span in self.spans)
+        with _export_lock, open(path, "a") as f:
+            f.write(lines)
+
+    def render(self) -> str:
+        """
+        Format the spans as an indented table of durations, children under parents.
+        """
+        children = {}
+        for span in self.spans:
+            children.setdefault(span["parent_id"], []).append(span)
+
+        ids = {span["span_id"] for span in self.spans}
+        roots = [span for span in self.spans if span["parent_id"] not in ids]
+
+        lines = []
+
+        def add(span: dict, depth: int) -> None:
+            label = "  " * depth + span["name"]
+            if span["service"] != self.service:
+                label += f" ({span['service']})"
+            lines.append(f"{label:<32} {span['duration_ms']:>10.1f} ms")
+            for child in children.get(span["span_id"], []):
+                add(child, depth + 1)
+
+        for root in roots:
+            add(root, 0)
+        return "\n".join(lines)
+
+
+def parse_server_timing(value: str | None) -> list[tuple[str, float]]:
+    """
+    Return (name, duration in ms) for each metric in a Server-Timing header.
+    Metrics without a duration are left out.
+    """
+    timings = []
+    for metric in (value or "").split(","):
+        name, *params = (part.strip() for part in metric.split(";"))
+        for param in params:
+            key, _, dur = param.partition("=")
+            if name and key == "dur":
+                try:
+                    timings.append((name, float(dur)))
+                except ValueError:
+                    pass
+    return timings
@@ -0,0 +1,124 @@
+import io
+import os
+import sqlite3
+import sys
+import tempfile
+
+import pytest
+
+# Ensure the project root is in sys.path for module resolution
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from todo_common import bulk, db
+
+"""
+These tests cover streaming export and batched import in common/bulk.py.
+"""
+
+
+@pytest.fixture(scope="function")
+def db_paths():
+    with tempfile.TemporaryDirectory() as tmp:
+        yield os.path.join(tmp, "source.db"), os.path.join(tmp, "target.db")
+
+
+@pytest.mark.parametrize("fmt", bulk.FORMATS)
+def test_export_import_round_trip(db_paths, fmt):
+    source, target = db_paths
+    first = db.create_task("First, with a comma", "alice", source)
+    second = db.create_task('Second "quoted"\nmultiline', "alice", source)
+    db.set_due_date(second.id, "2025-12-01", source)
+    db.delete_task(first.id, source)
+    db.create_task("Someone else's", "bob", source)
+
+    out = io.StringIO()
+    assert bulk.export_tasks(source, out, fmt=fmt, username="alice") == 2
+
+    out.seek(0)
+    result = bulk.import_tasks(target, bulk.read_records(out, fmt), batch_size=1)
+
+    assert result == {"read": 2, "written": 2}
+    assert db.get_tasks_for_user("alice", target) == db.get_tasks_for_user(
+        "alice", source
+    )
+
+
+def record(task_id, content, updated_at):
+    return {
+        "id": task_id,
+        "username": "carol",
+        "content": content,
+        "created_at": "2025-01-01T00:00:00",
+        "updated_at": updated_at,
+    }
+
+
+@pytest.mark.parametrize(
+    "policy, expected_content, expected_written",
+    [
+        ("skip", "Original", 0),
+        ("replace", "Older import", 1),
+        ("newer", "Original", 0),
+    ],
+)
+def test_import_conflict_policies(db_paths, policy, expected_content, expected_written):
+    _, target = db_paths
+    bulk.import_tasks(target, [record(1, "Original", "2025-06-01T00:00:00")])
+
+    result = bulk.import_tasks(
+        target, [record(1, "Older import", "2025-02-01T00:00:00")], on_conflict=policy
+    )
+
+    assert result["written"] == expected_written
+    assert db.get_task(1, target).content == expected_content
+
+
+def test_import_newer_policy_takes_later_update(db_paths):
+    _, target = db_paths
+    bulk.import_tasks(target, [record(1, "Original", "2025-06-01T00:00:00")])
+
+    bulk.import_tasks(
+        target, [record(1, "Later import", "2025-07-01T00:00:00")], on_conflict="newer"
+    )
+
+    assert db.get_task(1, target).content == "Later import"
+
+
+def test_import_fail_and_new_ids_policies(db_paths):
+    _, target = db_paths
+    bulk.import_tasks(target, [record(1, "Original", "2025-06-01T00:00:00")])
+
+    with pytest.raises(sqlite3.IntegrityError):
+        bulk.import_tasks(
+            target, [record(1, "Duplicate", "2025-06-01T00:00:00")], on_conflict="fail"
+        )
+
+    bulk.import_tasks(
+        target, [record(1, "Duplicate", "2025-06-01T00:00:00")], on_conflict="new-ids"
+    )
+    assert sorted(t.content for t in db.get_tasks_for_user("carol", target)) == [
+        "Duplicate",
+        "Original",
+    ]
+
+
+def test_import_with_deferred_search_index(db_paths):
+    _, target = db_paths
+    records = [
+        record(i, f"Task {i} about invoices", "2025-06-01T00:00:00")
+        for i in range(1, 51)
+    ]
+
+    bulk.import_tasks(target, records, batch_size=20, defer_search_index=True)
+
+    assert len(db.search_tasks("carol", "invoices", target, limit=100)) == 50
+    # Triggers are back, so later writes are indexed again
+    task = db.create_task("New receipt", "carol", target)
+    assert [t.id for t in db.search_tasks("carol", "receipt", target)] == [task.id]
+
+
+def test_import_rejects_record_without_content(db_paths):
+    _, target = db_paths
+
+    with pytest.raises(ValueError):
+        bulk.import_tasks(target, [{"id": 1, "username": "dave"}])
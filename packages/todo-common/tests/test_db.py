@@ -1,14 +1,18 @@
+import json
 import pytest
 import os
+import sqlite3
 import tempfile
 import sys
+import threading
 import time
-from datetime import datetime
+from dataclasses import asdict
+from datetime import datetime, timedelta
 
 # Ensure the project root is in sys.path for module resolution
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
-from todo_common import db
+from todo_common import db, hlc, migrations
 from todo_common.task import Task
 
 """
@@ -317,6 +321,56 @@ def test_get_tasks_for_user_filtered_today():
         os.remove(db_path)
 
 
+def test_get_tasks_for_user_filtered_due_ranges():
+    with tempfile.NamedTemporaryFile(delete=False) as tf:
+        db_path = tf.name
+    try:
+        db.init_db(db_path)
+        today = datetime.now().date()
+        due_dates = {
+            "Yesterday": today - timedelta(days=1),
+            "Today": today,
+            "In six days": today + timedelta(days=6),
+            "In a week": today + timedelta(days=7),
+        }
+        for content, due_date in due_dates.items():
+            task = db.create_task(content, "erin", db_path)
+            db.set_due_date(task.id, due_date.isoformat(), db_path)
+        db.create_task("No due date", "erin", db_path)
+
+        def contents(**kwargs):
+            tasks = db.get_tasks_for_user_filtered("erin", db_path, **kwargs)
+            return sorted(t.content for t in tasks)
+
+        assert contents(due="today") == ["Today"]
+        assert contents(due="overdue") == ["Yesterday"]
+        assert contents(due="week") == ["In six days", "Today"]
+        with pytest.raises(ValueError):
+            contents(due="someday")
+    finally:
+        os.remove(db_path)
+
+
+def test_day_columns_match_python_epoch_day():
+    with tempfile.NamedTemporaryFile(delete=False) as tf:
+        db_path = tf.name
+    try:
+        db.init_db(db_path)
+        task = db.create_task("Pay rent", "erin", db_path)
+        db.set_due_date(task.id, "2025-12-01", db_path)
+
+        conn = db.get_conn(db_path)
+        due_day, updated_day = conn.execute(
+            "SELECT due_day, updated_day FROM tasks WHERE id = ?", (task.id,)
+        ).fetchone()
+        conn.close()
+
+        assert due_day == db.epoch_day(datetime(2025, 12, 1).date())
+        assert updated_day == db.epoch_day(datetime.now().date())
+    finally:
+        os.remove(db_path)
+
+
 def test_complete_and_uncomplete_task():
     with tempfile.NamedTemporaryFile(delete=False) as tf:
         db_path = tf.name
@@ -453,3 +507,384 @@ def test_update_task_content_nonexistent():
         conn.close()
     finally:
         os.remove(db_path)
+
+
+def test_get_tasks_page_for_user_walks_all_pages():
+    with tempfile.NamedTemporaryFile(delete=False) as tf:
+        db_path = tf.name
+    try:
+        db.init_db(db_path)
+        created = [db.create_task(f"Task {i}", "kate", db_path) for i in range(5)]
+        db.create_task("Other user's task", "liam", db_path)
+
+        seen = []
+        after = None
+        pages = 0
+        while True:
+            tasks, after = db.get_tasks_page_for_user(
+                "kate", db_path, after=after, limit=2
+            )
+            seen.extend(tasks)
+            pages += 1
+            if after is None:
+                break
+
+        assert pages == 3
+        assert [t.id for t in seen] == [t.id for t in created]
+    finally:
+        os.remove(db_path)
+
+
+def test_get_tasks_page_for_user_include_deleted():
+    with tempfile.NamedTemporaryFile(delete=False) as tf:
+        db_path = tf.name
+    try:
+        db.init_db(db_path)
+        db.create_task("Kept", "mia", db_path)
+        deleted = db.create_task("Deleted", "mia", db_path)
+        db.delete_task(deleted.id, db_path)
+
+        tasks, next_key = db.get_tasks_page_for_user("mia", db_path, limit=10)
+        assert [t.content for t in tasks] == ["Kept"]
+        assert next_key is None
+
+        tasks, _ = db.get_tasks_page_for_user(
+            "mia", db_path, limit=10, include_deleted=True
+        )
+        assert len(tasks) == 2
+    finally:
+        os.remove(db_path)
+
+
+def test_init_db_applies_migrations_once():
+    with tempfile.NamedTemporaryFile(delete=False) as tf:
+        db_path = tf.name
+    try:
+        db.init_db(db_path)
+        db.init_db(db_path)
+        conn = db.get_conn(db_path)
+        version = conn.execute("PRAGMA user_version;").fetchone()[0]
+        conn.close()
+
+        assert version == len(migrations.MIGRATIONS)
+    finally:
+        os.remove(db_path)
+
+
+def test_search_tasks_follows_updates_and_deletes():
+    with tempfile.NamedTemporaryFile(delete=False) as tf:
+        db_path = tf.name
+    try:
+        db.init_db(db_path)
+        report = db.create_task("Finish quarterly report", "nina", db_path)
+        milk = db.create_task("Buy milk", "nina", db_path)
+        db.create_task("Quarterly report for someone else", "omar", db_path)
+
+        assert [t.id for t in db.search_tasks("nina", "quart", db_path)] == [report.id]
+
+        db.update_task_content(milk.id, "Buy milk for the report", db_path)
+        assert {t.id for t in db.search_tasks("nina", "report", db_path)} == {
+            report.id,
+            milk.id,
+        }
+
+        db.delete_task(report.id, db_path)
+        assert [t.id for t in db.search_tasks("nina", "report", db_path)] == [milk.id]
+    finally:
+        os.remove(db_path)
+
+
+def test_search_tasks_treats_query_syntax_literally(monkeypatch):
+    with tempfile.NamedTemporaryFile(delete=False) as tf:
+        db_path = tf.name
+    try:
+        db.init_db(db_path)
+        task = db.create_task('Fix "quoted" 100% bug', "pat", db_path)
+        db.create_task("Fix 1000 bugs", "pat", db_path)
+
+        assert [t.id for t in db.search_tasks("pat", '"quoted', db_path)] == [task.id]
+
+        # Without FTS5 the LIKE fallback must not treat % as a wildcard
+        monkeypatch.setattr(db, "has_fts5", lambda cur: False)
+        assert [t.id for t in db.search_tasks("pat", "100%", db_path)] == [task.id]
+    finally:
+        os.remove(db_path)
+
+
+def test_sync_task_reports_outcome(test_dbs):
+    server_db = test_dbs["server"]
+    task = Task(
+        id=1,
+        username="olga",
+        content="Original",
+        is_completed=False,
+        is_deleted=False,
+        due_date=None,
+        created_at="2025-01-01T09:00:00",
+        updated_at="2025-01-01T09:00:00",
+    )
+
+    assert db.sync_task(task, server_db) == "inserted"
+    assert db.sync_task(task, server_db) == "skipped"
+
+    edited = Task(
+        **{**task.__dict__, "is_completed": True, "updated_at": "2025-01-02T09:00:00"}
+    )
+    assert db.sync_task(edited, server_db) == "updated"
+
+    other = Task(
+        **{
+            **task.__dict__,
+            "content": "Someone else's task",
+            "created_at": "2025-01-03T09:00:00",
+            "updated_at": "2025-01-03T09:00:00",
+        }
+    )
+    assert db.sync_task(other, server_db) == "divergent"
+    assert len(db.get_tasks_for_user("olga", server_db)) == 2
+
+
+def test_operation_hooks_time_db_calls(test_dbs):
+    calls = []
+
+    def hook(operation, seconds):
+        calls.append((operation, seconds))
+
+    db.add_operation_hook(hook)
+    try:
+        task = db.create_task("Timed", "quinn", test_dbs["client1"])
+        db.get_task(task.id, test_dbs["client1"])
+    finally:
+        db.remove_operation_hook(hook)
+    db.get_task(task.id, test_dbs["client1"])
+
+    operations = [operation for operation, _ in calls]
+    assert operations.count("create_task") == 1
+    assert operations.count("get_task") == 1
+    assert all(seconds >= 0 for _, seconds in calls)
+
+
+def test_sync_tasks_logs_one_summary(test_dbs, caplog):
+    tasks = [
+        Task(
+            id=i,
+            username="olga",
+            content=f"Task {i}",
+            is_completed=False,
+            is_deleted=False,
+            due_date=None,
+            created_at="2025-01-01T09:00:00",
+            updated_at="2025-01-01T09:00:00",
+        )
+        for i in range(1, 4)
+    ]
+    db.sync_tasks(tasks[:1], test_dbs["server"], clear_first=False)
+
+    with caplog.at_level("INFO", logger="todo_common"):
+        outcomes = db.sync_tasks(tasks, test_dbs["server"], clear_first=False)
+
+    assert outcomes == {"inserted": 2, "updated": 0, "skipped": 1, "divergent": 0}
+    # Per-task detail is DEBUG, so INFO only gets the summary
+    assert len(caplog.records) == 1
+    assert "Synced 3 tasks" in caplog.text
+    assert "2 inserted, 0 updated, 1 skipped" in caplog.text
+
+
+def test_local_edits_mark_tasks_dirty(test_dbs):
+    client_db = test_dbs["client1"]
+    task = db.create_task("Water plants", "olga", client_db)
+    db.update_task_content(task.id, "Water all plants", client_db)
+    db.complete_task(task.id, client_db)
+
+    # A copy from the server is not a local change
+    db.add_full_task(
+        Task(
+            id=50,
+            username="olga",
+            content="From the server",
+            is_completed=False,
+            is_deleted=False,
+            due_date=None,
+            created_at="2025-01-01T09:00:00",
+            updated_at="2025-01-01T09:00:00",
+        ),
+        client_db,
+    )
+
+    dirty = db.get_dirty_tasks("olga", client_db)
+    assert [(t.id, t.content, count) for t, count in dirty] == [
+        (task.id, "Water all plants", 3)
+    ]
+    assert db.get_dirty_tasks("someone_else", client_db) == []
+
+
+def test_apply_remote_tasks_keeps_edits_made_during_push(test_dbs):
+    client_db = test_dbs["client1"]
+    first = db.create_task("First", "olga", client_db)
+    second = db.create_task("Second", "olga", client_db)
+    pushed = db.get_dirty_tasks("olga", client_db)
+
+    # Edited again while the push was in flight
+    db.update_task_content(second.id, "Second, edited", client_db)
+
+    from_other_device = Task(
+        id=99,
+        username="olga",
+        content="From another device",
+        is_completed=False,
+        is_deleted=False,
+        due_date=None,
+        created_at="2025-01-01T09:00:00",
+        updated_at="2025-01-01T09:00:00",
+    )
+    server_tasks = [task for task, _ in pushed] + [from_other_device]
+    db.apply_remote_tasks(
+        server_tasks, {task.id: count for task, count in pushed}, client_db
+    )
+
+    tasks = {task.id: task for task in db.get_tasks_for_user("olga", client_db)}
+    assert set(tasks) == {first.id, second.id, 99}
+    assert tasks[second.id].content == "Second, edited"
+    assert [t.id for t, _ in db.get_dirty_tasks("olga", client_db)] == [second.id]
+
+
+def test_edits_in_the_same_second_are_not_lost(test_dbs):
+    server_db = test_dbs["server"]
+    task = db.create_task("Buy milk", "olga", test_dbs["client1"])
+    db.sync_task(task, server_db)
+
+    # Another device picks the task up and edits it right away, no sleep
+    db.add_full_task(db.get_task(task.id, server_db), test_dbs["client2"])
+    db.update_task_content(task.id, "Buy oat milk", test_dbs["client2"])
+    edited = db.get_task(task.id, test_dbs["client2"])
+
+    assert edited.updated_hlc > task.updated_hlc
+    assert db.sync_task(edited, server_db) == "updated"
+    assert db.get_task(task.id, server_db).content == "Buy oat milk"
+
+
+def test_edit_on_a_device_with_a_slow_clock_wins(test_dbs, monkeypatch):
+    server_db = test_dbs["server"]
+    task = db.create_task("Book flights", "olga", test_dbs["client1"])
+    db.sync_task(task, server_db)
+    db.add_full_task(db.get_task(task.id, server_db), test_dbs["client2"])
+
+    # client2's clock is an hour behind the device that made the task
+    slow = hlc.wall_clock() - hlc.encode(3600 * 1000)
+    monkeypatch.setattr(hlc, "wall_clock", lambda: slow)
+    db.complete_task(task.id, test_dbs["client2"])
+    completed = db.get_task(task.id, test_dbs["client2"])
+
+    assert completed.updated_hlc == task.updated_hlc + 1
+    assert db.sync_task(completed, server_db) == "updated"
+    assert db.get_task(task.id, server_db).is_completed
+
+
+def test_hlc_migration_converts_existing_timestamps(monkeypatch):
+    with tempfile.NamedTemporaryFile(delete=False) as tf:
+        db_path = tf.name
+    try:
+        # A database from before the HLC columns, with a task in it
+        before = migrations.MIGRATIONS.index(migrations.add_hlc_columns)
+        monkeypatch.setattr(migrations, "MIGRATIONS", migrations.MIGRATIONS[:before])
+        conn = db.get_conn(db_path)
+        migrations.migrate(conn)
+        conn.execute(
+            """
+            INSERT INTO tasks (id, username, content, created_at, updated_at)
+            VALUES (1, 'olga', 'Old task', '2025-01-01T09:00:00', '2025-01-02T10:30:00')
+            """
+        )
+        conn.commit()
+        conn.close()
+        monkeypatch.undo()
+
+        task = db.get_task(1, db_path)
+
+        assert task.created_hlc == hlc.from_timestamp("2025-01-01T09:00:00")
+        assert task.updated_hlc == hlc.from_timestamp("2025-01-02T10:30:00")
+    finally:
+        os.remove(db_path)
+
+
+def test_get_tasks_changed_since(test_dbs):
+    client_db = test_dbs["client1"]
+    first = db.create_task("First", "olga", client_db)
+    second = db.create_task("Second", "olga", client_db)
+    db.create_task("Not olga's", "pat", client_db)
+
+    cursor = db.get_last_change_seq(client_db)
+    assert db.get_tasks_changed_since("olga", cursor, client_db) == []
+
+    db.delete_task(first.id, client_db)
+    changed = db.get_tasks_changed_since("olga", cursor, client_db)
+    assert [(t.id, t.is_deleted) for t in changed] == [(first.id, True)]
+    assert [t.id for t in db.get_tasks_changed_since("olga", 0, client_db)] == [
+        second.id,
+        first.id,
+    ]
+
+
+def test_get_tasks_json_for_user_matches_task_objects(test_dbs):
+    client_db = test_dbs["client1"]
+    first = db.create_task('Café "quotes" \\ and\nnewline ✅', "olga", client_db)
+    second = db.create_task("Second", "olga", client_db)
+    db.set_due_date(first.id, "2025-12-01", client_db)
+    since = db.get_last_change_seq(client_db)
+    db.complete_task(second.id, client_db)
+    db.delete_task(db.create_task("Third", "olga", client_db).id, client_db)
+    db.create_task("Not olga's", "pat", client_db)
+
+    tasks_json, cursor = db.get_tasks_json_for_user("olga", client_db)
+
+    tasks = db.get_tasks_for_user("olga", client_db)
+    assert json.loads(tasks_json) == [asdict(task) for task in tasks]
+    assert cursor == db.get_last_change_seq(client_db)
+
+    changed_json, changed_cursor = db.get_tasks_json_for_user("olga", client_db, since)
+    changed = db.get_tasks_changed_since("olga", since, client_db)
+    assert json.loads(changed_json) == [asdict(task) for task in changed]
+    assert [task.content for task in changed] == ["Second", "Third"]
+    assert changed_cursor == cursor
+
+    assert db.get_tasks_json_for_user("nobody", client_db) == (b"[]", cursor)
+    assert db.get_tasks_json_for_user("olga", client_db, cursor) == (b"[]", cursor)
+    # A cursor this database never handed out, e.g. an HLC, gets every task
+    stale_json, _ = db.get_tasks_json_for_user("olga", client_db, tasks[0].updated_hlc)
+    assert stale_json == tasks_json
+
+
+def test_get_tasks_json_for_user_reads_one_snapshot(test_dbs):
+    server_db = test_dbs["server"]
+    db.create_task("Before", "olga", server_db)
+    setup = sqlite3.connect(server_db)
+    setup.execute("PRAGMA journal_mode=WAL;")
+    setup.close()
+
+    # Another connection (from a thread, outside use_connection) stores a task
+    # between the cursor and the rows reads
+    def store_in_between(statement):
+        if "FROM tasks" in statement and not stored:
+            thread = threading.Thread(
+                target=lambda: stored.append(
+                    db.create_task("In between", "olga", server_db)
+                )
+            )
+            thread.start()
+            thread.join()
+
+    stored = []
+    conn = sqlite3.connect(server_db)
+    conn.set_trace_callback(store_in_between)
+    try:
+        with db.use_connection(conn, server_db):
+            tasks_json, cursor = db.get_tasks_json_for_user("olga", server_db)
+        assert not conn.in_transaction
+    finally:
+        conn.close()
+
+    assert stored
+    assert [task["content"] for task in json.loads(tasks_json)] == ["Before"]
+    # So the next delta still brings it
+    changed_json, _ = db.get_tasks_json_for_user("olga", server_db, cursor)
+    assert [task["content"] for task in json.loads(changed_json)] == ["In between"]
@@ -0,0 +1,45 @@
+import os
+import sys
+
+# Ensure the project root is in sys.path for module resolution
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from todo_common import hlc
+
+"""
+These tests cover the hybrid logical clock in common/hlc.py.
+"""
+
+
+def test_encode_decode_round_trip():
+    stamp = hlc.encode(1_750_000_000_123, 7)
+
+    assert hlc.decode(stamp) == (1_750_000_000_123, 7)
+    assert hlc.encode(1_750_000_000_123, 8) > stamp
+    assert hlc.encode(1_750_000_000_124, 0) > hlc.encode(1_750_000_000_123, 99)
+
+
+def test_tick_follows_wall_clock_when_it_is_ahead():
+    wall = hlc.encode(2_000, 0)
+
+    assert hlc.tick(hlc.encode(1_000, 5), wall=wall) == wall
+    assert hlc.tick(None, wall=wall) == wall
+
+
+def test_tick_counts_past_last_when_wall_clock_is_behind():
+    last = hlc.encode(2_000, 3)
+
+    # Same millisecond, or a clock that is behind: bump the counter
+    assert hlc.tick(last, wall=hlc.encode(2_000, 0)) == hlc.encode(2_000, 4)
+    assert hlc.tick(last, wall=hlc.encode(1_000, 0)) == hlc.encode(2_000, 4)
+
+
+def test_from_timestamp_keeps_string_order():
+    stamps = ["2025-01-01T09:00:00", "2025-01-01T09:00:01", "2025-06-30T23:59:59"]
+
+    converted = [hlc.from_timestamp(s) for s in stamps]
+
+    assert converted == sorted(converted)
+    assert hlc.to_timestamp(converted[1]) == stamps[1]
+    assert hlc.from_timestamp("not a date") == 0
+    assert hlc.from_timestamp(None) == 0
@@ -0,0 +1,74 @@
+import io
+import logging
+import os
+import sys
+
+import pytest
+
+# Ensure the project root is in sys.path for module resolution
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from todo_common import log
+
+"""
+These tests cover the logging setup in common/log.py.
+"""
+
+
+@pytest.fixture
+def test_logger():
+    # A logger of our own, so the todo_common logger is left alone for other tests
+    name = "todo_common_log_test"
+    yield name
+    log.configure_logging("WARNING", logger_names=(name,))
+    logging.getLogger(name).handlers.clear()
+
+
+def test_parse_bool():
+    assert log.parse_bool("true")
+    assert log.parse_bool(" Yes ")
+    assert log.parse_bool("1")
+    assert not log.parse_bool("off")
+    assert not log.parse_bool(None)
+    assert log.parse_bool("", default=True)
+
+
+def test_configure_logging_sets_level(test_logger):
+    stream = io.StringIO()
+    log.configure_logging("info", logger_names=(test_logger,), stream=stream)
+
+    logger = logging.getLogger(f"{test_logger}.child")
+    logger.debug("hidden %s", "detail")
+    logger.info("shown %s", "summary")
+
+    assert "shown summary" in stream.getvalue()
+    assert "hidden" not in stream.getvalue()
+
+
+def test_configure_logging_rejects_unknown_level(test_logger):
+    with pytest.raises(ValueError):
+        log.configure_logging("LOUD", logger_names=(test_logger,))
+
+
+def test_disabled_levels_are_not_formatted(test_logger):
+    class Expensive:
+        def __str__(self):
+            raise AssertionError("formatted a disabled message")
+
+    log.configure_logging("INFO", logger_names=(test_logger,), stream=io.StringIO())
+    logging.getLogger(test_logger).debug("detail %s", Expensive())
+
+
+def test_configure_logging_with_queue(test_logger):
+    stream = io.StringIO()
+    log.configure_logging(
+        "DEBUG", use_queue=True, logger_names=(test_logger,), stream=stream
+    )
+    logger = logging.getLogger(test_logger)
+    assert isinstance(logger.handlers[0], logging.handlers.QueueHandler)
+
+    logger.debug("queued %d", 1)
+    # Reconfiguring stops the listener, which flushes the queue first
+    log.configure_logging("DEBUG", logger_names=(test_logger,), stream=io.StringIO())
+
+    assert "queued 1" in stream.getvalue()
@@ -0,0 +1,126 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# Ensure the project root is in sys.path for module resolution
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from todo_common import db, retention
+
+"""
+These tests cover archiving old completed and deleted tasks in common/retention.py.
+"""
+
+
+@pytest.fixture(scope="function")
+def db_path():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "retention.db")
+        db.init_db(path)
+        yield path
+
+
+def set_updated_at(db_path, task_id, updated_at):
+    conn = db.get_conn(db_path)
+    conn.execute("UPDATE tasks SET updated_at = ? WHERE id = ?", (updated_at, task_id))
+    conn.commit()
+    conn.close()
+
+
+def count_rows(db_path, table):
+    conn = db.get_conn(db_path)
+    count = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    conn.close()
+    return count
+
+
+def test_archive_by_age_moves_old_completed_and_deleted(db_path):
+    old_done = db.create_task("Old and done", "alice", db_path)
+    old_deleted = db.create_task("Old and deleted", "alice", db_path)
+    old_open = db.create_task("Old but still open", "alice", db_path)
+    new_done = db.create_task("Recently done", "alice", db_path)
+
+    db.complete_task(old_done.id, db_path)
+    db.delete_task(old_deleted.id, db_path)
+    db.complete_task(new_done.id, db_path)
+    for task in (old_done, old_deleted, old_open):
+        set_updated_at(db_path, task.id, "2020-01-01T00:00:00")
+
+    archived = retention.archive_tasks(db_path, older_than_days=30, batch_size=1)
+
+    assert archived == 2
+    remaining = {t.id for t in db.get_tasks_for_user("alice", db_path)}
+    assert remaining == {old_open.id, new_done.id}
+    assert count_rows(db_path, "tasks_archive") == 2
+
+
+def test_archive_keeps_last_completed_per_user(db_path):
+    for username in ("bob", "carol"):
+        for i in range(5):
+            task = db.create_task(f"{username} task {i}", username, db_path)
+            db.complete_task(task.id, db_path)
+            set_updated_at(db_path, task.id, f"2025-01-0{i + 1}T00:00:00")
+
+    archived = retention.archive_tasks(db_path, keep_completed=2)
+
+    assert archived == 6
+    bob_tasks = db.get_tasks_for_user("bob", db_path)
+    assert sorted(t.content for t in bob_tasks) == ["bob task 3", "bob task 4"]
+
+
+def test_archive_max_batches_bounds_work(db_path):
+    for i in range(10):
+        task = db.create_task(f"Task {i}", "dana", db_path)
+        db.delete_task(task.id, db_path)
+        set_updated_at(db_path, task.id, "2020-01-01T00:00:00")
+
+    archived = retention.archive_tasks(
+        db_path, older_than_days=1, batch_size=3, max_batches=2
+    )
+
+    assert archived == 6
+    assert count_rows(db_path, "tasks") == 4
+
+
+def test_keep_completed_ranks_once_and_rechecks_each_batch(db_path, monkeypatch):
+    tasks = []
+    for i in range(5):
+        task = db.create_task(f"Task {i}", "erin", db_path)
+        db.complete_task(task.id, db_path)
+        set_updated_at(db_path, task.id, f"2025-01-0{i + 1}T00:00:00")
+        tasks.append(task)
+
+    rankings = []
+    find_excess_completed_ids = retention.find_excess_completed_ids
+
+    def rank_then_uncomplete(cur, keep_completed, limit=None):
+        ids = find_excess_completed_ids(cur, keep_completed, limit)
+        rankings.append(ids)
+        # Uncompleted on another device after the ranking, before its batch
+        db.uncomplete_task(tasks[0].id, db_path)
+        return ids
+
+    monkeypatch.setattr(retention, "find_excess_completed_ids", rank_then_uncomplete)
+    archived = retention.archive_tasks(db_path, keep_completed=1, batch_size=1)
+
+    assert len(rankings) == 1
+    assert sorted(rankings[0]) == [t.id for t in tasks[:4]]
+    assert archived == 3
+    assert [t.content for t in db.get_tasks_for_user("erin", db_path)] == [
+        "Task 0",
+        "Task 4",
+    ]
+    assert count_rows(db_path, "tasks_archive") == 3
+
+
+def test_sync_does_not_resurrect_archived_task(db_path):
+    task = db.create_task("Done long ago", "fred", db_path)
+    db.complete_task(task.id, db_path)
+    stale_copy = db.get_task(task.id, db_path)
+
+    retention.archive_tasks(db_path, keep_completed=0)
+    db.sync_task(stale_copy, db_path)
+
+    assert db.get_task(task.id, db_path) is None
@@ -0,0 +1,267 @@
+import json
+import os
+import sys
+from dataclasses import asdict, replace
+from datetime import date, timedelta
+
+import pytest
+
+# Ensure the project root is in sys.path for module resolution
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from todo_common import hlc
+from todo_common.storage import (
+    MemoryBackend,
+    SQLiteBackend,
+    StorageBackend,
+    open_storage,
+)
+from todo_common.task import Task
+
+"""
+These tests cover the storage engines in common/storage.py.
+
+Every test runs against both the SQLite and the in-memory engine, which must
+behave the same. The SQLite engine gets a fresh database file per test.
+"""
+
+
+@pytest.fixture(params=["sqlite", "memory"])
+def storage(request, tmp_path) -> StorageBackend:
+    if request.param == "sqlite":
+        return SQLiteBackend(str(tmp_path / "storage.db"))
+    return MemoryBackend()
+
+
+def remote_task(task_id, content, username="alice", stamp=None, **fields):
+    # A task as another device would send it
+    stamp = stamp or hlc.encode(1_750_000_000_000, 0)
+    when = hlc.to_timestamp(stamp)
+    return Task(
+        id=task_id,
+        username=username,
+        content=content,
+        is_completed=fields.pop("is_completed", False),
+        is_deleted=fields.pop("is_deleted", False),
+        due_date=fields.pop("due_date", None),
+        created_at=fields.pop("created_at", when),
+        updated_at=when,
+        created_hlc=stamp,
+        updated_hlc=stamp,
+    )
+
+
+def test_create_get_and_list(storage):
+    first = storage.create_task("Write report", "alice")
+    second = storage.create_task("Pay rent", "alice")
+    storage.create_task("Walk dog", "bob")
+
+    assert storage.get_task(first.id) == first
+    assert storage.get_task(999) is None
+    assert second.id > first.id
+    assert second.updated_hlc > first.updated_hlc
+    assert [t.content for t in storage.get_tasks_for_user("alice")] == [
+        "Write report",
+        "Pay rent",
+    ]
+    assert sorted(storage.get_users()) == ["alice", "bob"]
+
+
+def test_edits_bump_the_hlc(storage):
+    task = storage.create_task("Write report", "alice")
+
+    storage.update_task_content(task.id, "Write the report")
+    storage.set_due_date(task.id, "2025-12-01")
+    storage.complete_task(task.id)
+    edited = storage.get_task(task.id)
+
+    assert edited.content == "Write the report"
+    assert edited.due_date == "2025-12-01"
+    assert edited.is_completed
+    assert edited.updated_hlc > task.updated_hlc
+
+    storage.uncomplete_task(task.id)
+    storage.remove_due_date(task.id)
+    storage.delete_task(task.id)
+    edited = storage.get_task(task.id)
+    assert (edited.is_completed, edited.due_date, edited.is_deleted) == (False, None, True)
+
+
+def test_filters(storage):
+    today = date.today()
+    open_task = storage.create_task("Open", "alice")
+    done = storage.create_task("Done", "alice")
+    deleted = storage.create_task("Deleted", "alice")
+    due_today = storage.create_task("Due today", "alice")
+    overdue = storage.create_task("Overdue", "alice")
+    next_week = storage.create_task("Due in three days", "alice")
+    storage.complete_task(done.id)
+    storage.delete_task(deleted.id)
+    storage.set_due_date(due_today.id, today.isoformat())
+    storage.set_due_date(overdue.id, (today - timedelta(days=2)).isoformat())
+    storage.set_due_date(next_week.id, (today + timedelta(days=3)).isoformat())
+
+    def ids(**filters):
+        return [t.id for t in storage.get_tasks_for_user_filtered("alice", **filters)]
+
+    assert ids() == [open_task.id, due_today.id, overdue.id, next_week.id]
+    assert ids(include_deleted=True) == [
+        open_task.id, deleted.id, due_today.id, overdue.id, next_week.id
+    ]
+    assert ids(only_completed=True) == [done.id]
+    # Completed today, whatever the due date
+    assert ids(only_completed=True, only_today=True) == [done.id]
+    assert ids(only_today=True) == [due_today.id]
+    assert ids(due="overdue") == [overdue.id]
+    assert ids(due="week") == [due_today.id, next_week.id]
+    assert list(storage.iter_tasks_for_user_filtered("alice", due="overdue")) == [
+        storage.get_task(overdue.id)
+    ]
+    with pytest.raises(ValueError):
+        storage.get_tasks_for_user_filtered("alice", due="someday")
+
+
+def test_pages(storage):
+    created = [storage.create_task(f"Task {i}", "alice") for i in range(7)]
+    storage.complete_task(created[3].id)
+
+    seen = []
+    after = None
+    while True:
+        tasks, after = storage.get_tasks_page_for_user("alice", after=after, limit=2)
+        seen.extend(t.id for t in tasks)
+        if after is None:
+            break
+
+    assert seen == [t.id for i, t in enumerate(created) if i != 3]
+
+
+def test_search(storage):
+    storage.create_task("Buy oat milk", "alice")
+    storage.create_task("Call the bank about milk", "alice")
+    storage.create_task("Buy milk", "bob")
+    gone = storage.create_task("Buy milkshake", "alice")
+    storage.delete_task(gone.id)
+
+    def contents(query, **kwargs):
+        return sorted(t.content for t in storage.search_tasks("alice", query, **kwargs))
+
+    assert contents("milk") == ["Buy oat milk", "Call the bank about milk"]
+    assert contents("bu mil") == ["Buy oat milk"]
+    assert contents("milksh", include_deleted=True) == ["Buy milkshake"]
+    assert contents("   ") == []
+
+
+def test_sync_outcomes(storage):
+    base = hlc.encode(1_750_000_000_000, 0)
+    assert storage.sync_task(remote_task(1, "Original", stamp=base)) == "inserted"
+    assert storage.sync_task(remote_task(1, "Edited", stamp=base + 1)) == "updated"
+    assert storage.sync_task(remote_task(1, "Stale", stamp=base)) == "skipped"
+
+    # Same ID, different task (created elsewhere at another time): both are kept
+    other = remote_task(
+        1, "Someone else's", stamp=base + 2, created_at="2025-01-01T00:00:00"
+    )
+    assert storage.sync_task(other) == "divergent"
+
+    tasks = storage.get_tasks_for_user("alice")
+    assert sorted(t.content for t in tasks) == ["Edited", "Someone else's"]
+    assert storage.get_task(1).content == "Edited"
+
+
+def test_sync_tasks_with_clear_first(storage):
+    storage.create_task("Local only", "alice")
+
+    outcomes = storage.sync_tasks(
+        [remote_task(10, "From server"), remote_task(11, "Also from server")],
+        clear_first=True,
+    )
+
+    assert outcomes["inserted"] == 2
+    assert [t.id for t in storage.get_tasks_for_user("alice")] == [10, 11]
+
+
+def test_sync_state(storage):
+    assert storage.get_sync_state("alice") == (None, None)
+
+    storage.sync_tasks([remote_task(10, "From server")], clear_first=True)
+    storage.save_sync_state("alice", "laptop", 1234)
+    storage.save_sync_state("alice", "laptop", 5678)
+
+    assert storage.get_sync_state("alice") == ("laptop", 5678)
+    assert storage.get_sync_state("bob") == (None, None)
+
+
+def test_edits_tick_past_the_purge_horizon(storage):
+    task = storage.create_task("Mine", "alice")
+    # The server purged tombstones stamped by a device with a clock an hour ahead
+    horizon = hlc.tick(wall=hlc.wall_clock() + hlc.encode(3_600_000))
+    storage.save_sync_state("alice", "laptop", 1, horizon)
+    # A response without a horizon doesn't lower it
+    storage.save_sync_state("alice", "laptop", 2)
+
+    created = storage.create_task("New", "alice")
+    assert created.updated_hlc == horizon + 1
+    storage.complete_task(task.id)
+    assert storage.get_task(task.id).updated_hlc == horizon + 2
+    assert storage.create_task("Bob's", "bob").updated_hlc < horizon
+
+
+def test_changes_since_and_json(storage):
+    first = storage.create_task("First", "alice")
+    since = storage.get_last_change_seq()
+    storage.create_task("Second", "alice")
+    storage.create_task("Bob's", "bob")
+    storage.update_task_content(first.id, "First, edited")
+
+    changed = storage.get_tasks_changed_since("alice", since)
+    assert [t.content for t in changed] == ["Second", "First, edited"]
+
+    tasks_json, cursor = storage.get_tasks_json_for_user("alice")
+    tasks = storage.get_tasks_for_user("alice")
+    assert json.loads(tasks_json) == [asdict(t) for t in tasks]
+    assert cursor == storage.get_last_change_seq()
+
+    tasks_json, delta_cursor = storage.get_tasks_json_for_user("alice", since=cursor)
+    assert json.loads(tasks_json) == []
+    assert delta_cursor == cursor
+
+
+def test_changes_are_ordered_by_arrival(storage):
+    # An edit made offline arrives after newer ones, with an older HLC
+    base = hlc.encode(1_750_000_000_000, 0)
+    storage.sync_task(remote_task(1, "Edited late", stamp=base + 10))
+    _, cursor = storage.get_tasks_json_for_user("alice")
+
+    storage.sync_task(remote_task(2, "Edited offline", stamp=base))
+
+    tasks_json, delta_cursor = storage.get_tasks_json_for_user("alice", since=cursor)
+    assert [t["content"] for t in json.loads(tasks_json)] == ["Edited offline"]
+    assert delta_cursor > cursor
+    # A cursor it never handed out, e.g. an HLC from before change_seq, gets every task
+    tasks_json, _ = storage.get_tasks_json_for_user("alice", since=base + 10)
+    assert len(json.loads(tasks_json)) == 2
+
+
+def test_add_full_task(storage):
+    task = storage.add_full_task(remote_task(5, "Kept ID"))
+    copy = storage.add_full_task(replace(task, content="New ID"), use_existing_id=False)
+
+    assert task.id == 5
+    assert copy.id > 5
+    assert storage.get_task(copy.id).content == "New ID"
+
+
+def test_open_storage(tmp_path):
+    database_file = str(tmp_path / "config.db")
+
+    sqlite = open_storage({"database_file": database_file}, "default.db")
+    memory = open_storage({"storage_backend": "memory"}, "shared")
+
+    assert isinstance(sqlite, SQLiteBackend)
+    assert sqlite.DB_PATH == database_file
+    assert isinstance(memory, MemoryBackend)
+    # The same name is the same store for the whole process
+    assert open_storage({"storage_backend": "memory"}, "shared") is memory
+    with pytest.raises(ValueError, match="storage_backend"):
+        open_storage({"storage_backend": "postgres"}, "default.db")
@@ -0,0 +1,83 @@
+import json
+import os
+import sys
+import tempfile
+
+# Ensure the project root is in sys.path for module resolution
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from todo_common import tracing
+
+"""
+These tests cover the span tracing in common/tracing.py.
+"""
+
+
+def test_traceparent_round_trip():
+    header = tracing.format_traceparent("ab" * 16, "cd" * 8)
+
+    assert tracing.parse_traceparent(header) == ("ab" * 16, "cd" * 8)
+    assert tracing.parse_traceparent(None) is None
+    assert tracing.parse_traceparent("not-a-traceparent") is None
+
+
+def test_tracer_continues_incoming_trace():
+    upstream = tracing.Tracer("todo-client")
+    with upstream.span("http"):
+        header = upstream.traceparent()
+
+    downstream = tracing.Tracer("todo-server", header)
+    with downstream.span("server"):
+        pass
+
+    assert downstream.trace_id == upstream.trace_id
+    assert downstream.spans[0]["parent_id"] == upstream.spans[0]["span_id"]
+
+
+def test_spans_nest_and_export():
+    tracer = tracing.Tracer("todo-client")
+    with tracer.span("sync") as root, tracer.span("read", tasks=3):
+        pass
+
+    root_span, read_span = tracer.spans
+    assert read_span["parent_id"] == root["span_id"]
+    assert read_span["attributes"] == {"tasks": 3}
+    assert root_span["duration_ms"] >= read_span["duration_ms"]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "trace.jsonl")
+        tracer.export(path)
+        tracer.export(path)
+        with open(path) as f:
+            lines = [json.loads(line) for line in f]
+
+    assert [span["name"] for span in lines] == ["sync", "read", "sync", "read"]
+    assert {span["trace_id"] for span in lines} == {tracer.trace_id}
+
+
+def test_server_timing_round_trip():
+    tracer = tracing.Tracer("todo-server")
+    with tracer.span("server"), tracer.span("merge"):
+        pass
+
+    timings = tracing.parse_server_timing(tracer.server_timing())
+
+    assert [name for name, _ in timings] == ["server", "merge"]
+    assert tracing.parse_server_timing("cache;desc=hit, db;dur=bad, app;dur=1.5") == [
+        ("app", 1.5)
+    ]
+    assert tracing.parse_server_timing(None) == []
+
+
+def test_render_indents_children():
+    tracer = tracing.Tracer("todo-client")
+    with tracer.span("sync"), tracer.span("http") as http:
+        pass
+    tracer.add_span("merge", 2.5, parent=http, service="todo-server")
+
+    lines = tracer.render().splitlines()
+
+    assert lines[0].startswith("sync ")
+    assert lines[1].startswith("  http ")
+    assert lines[2].startswith("    merge (todo-server) ")
+    assert lines[2].endswith("2.5 ms")
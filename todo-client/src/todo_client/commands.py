@@ -0,0 +1,402 @@
+"""
+The client's command handlers, and the table that maps each subcommand to one.
+
+todo_client.main runs one command per process; the shell and batch mode
+(todo_client.shell) run many from the same table. Keeping the table here rather
+than in main means the shell doesn't import the entry module, which under
+`python -m todo_client.main` would load it a second time.
+"""
+
+import sqlite3
+import sys
+from dataclasses import asdict
+
+from todo_common.config import init_config_file
+from todo_common.storage import StorageBackend, open_storage
+from todo_common.task import Task
+
+from todo_client.parser import build_parser
+
+# NOTE: requests is slow to import and only needed by sync, so it is imported inside
+# the handler that uses it (the same goes for the display module). Keep it that way;
+# todo-client/tests/test_startup.py will fail if heavy modules leak back in here.
+
+
+def exit_on_broken_pipe():
+    # The reader went away (e.g. piped to `head`). Point stdout at devnull so
+    # Python doesn't complain again while flushing on exit.
+    import os
+
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, sys.stdout.fileno())
+    sys.exit(1)
+
+
+def get_storage(config) -> StorageBackend:
+    # The SQLite database file, or (storage_backend=memory) tasks that only live
+    # as long as the process, e.g. for a shell session
+    return open_storage(config, "todo_client.db")
+
+
+def require_sqlite(config, command: str) -> None:
+    # Commands that work on the database file directly
+    if config.get("storage_backend", "sqlite") != "sqlite":
+        print(f"Error: '{command}' needs storage_backend=sqlite.")
+        sys.exit(1)
+
+
+def print_tasks(config, tasks, output_format=None):
+    from todo_client.display import render_tasks
+
+    try:
+        render_tasks(
+            tasks,
+            output_format=output_format or config.get("list_format", "table"),
+            sample_size=int(config.get("list_sample_size", 200)),
+        )
+        sys.stdout.flush()
+    except BrokenPipeError:
+        # Stop reading rows as soon as nobody is listening
+        if hasattr(tasks, "close"):
+            tasks.close()
+        exit_on_broken_pipe()
+
+
+def handle_list(config, only_today, only_completed, output_format=None, due=None):
+    tasks = get_storage(config).iter_tasks_for_user_filtered(
+        config.get("username", "default_user"),
+        only_completed=only_completed,
+        only_today=only_today,
+        due=due,
+    )
+
+    print_tasks(config, tasks, output_format)
+
+
+def handle_search(config, query, limit, output_format=None):
+    tasks = get_storage(config).search_tasks(
+        config.get("username", "default_user"), query, limit=limit
+    )
+
+    if not tasks:
+        print(f"No tasks match '{query}'.")
+        return
+
+    print_tasks(config, tasks, output_format)
+
+
+def handle_complete(config, task_id: str):
+    get_storage(config).complete_task(int(task_id))
+    print(f"✅ Marked task #{task_id} as complete.")
+
+
+def handle_create(config, content):
+    if not content:
+        print("Error: missing task content.\n")
+        sys.exit(1)
+
+    new_task = get_storage(config).create_task(
+        content, config.get("username", "default_user")
+    )
+
+    print(f"✅ Created task #{new_task.id}: {new_task.content}")
+
+
+def handle_export(config, output, fmt):
+    from todo_common.bulk import export_tasks, guess_format
+
+    require_sqlite(config, "export")
+    fmt = fmt or (guess_format(output) if output else "ndjson")
+    username = config.get("username", "default_user")
+    database_file = config.get("database_file", "todo_client.db")
+
+    if output in (None, "-"):
+        try:
+            export_tasks(database_file, sys.stdout, fmt=fmt, username=username)
+            sys.stdout.flush()
+        except BrokenPipeError:
+            exit_on_broken_pipe()
+        return
+
+    with open(output, "w", encoding="utf-8", newline="") as f:
+        count = export_tasks(database_file, f, fmt=fmt, username=username)
+    print(f"📤 Exported {count} tasks to {output}.")
+
+
+def handle_import(config, input_path, fmt, on_conflict):
+    from todo_common.bulk import guess_format, import_tasks, read_records
+
+    require_sqlite(config, "import")
+    fmt = fmt or guess_format(input_path)
+
+    try:
+        if input_path == "-":
+            result = import_tasks(
+                config.get("database_file", "todo_client.db"),
+                read_records(sys.stdin, fmt),
+                on_conflict=on_conflict,
+                username=config.get("username", "default_user"),
+            )
+        else:
+            with open(input_path, encoding="utf-8", newline="") as f:
+                result = import_tasks(
+                    config.get("database_file", "todo_client.db"),
+                    read_records(f, fmt),
+                    on_conflict=on_conflict,
+                    username=config.get("username", "default_user"),
+                )
+    except (OSError, ValueError, sqlite3.IntegrityError) as e:
+        print(f"Error: import failed: {e}")
+        sys.exit(1)
+
+    skipped = result["read"] - result["written"]
+    print(f"📥 Imported {result['written']} tasks ({skipped} left unchanged).")
+
+
+def handle_init():
+    print("Initializing config...")
+
+    init_config_file("client")
+
+    print("✅ Initialization complete.")
+
+
+def handle_sync(config, timings: bool = False, device_id: str | None = None):
+    import json
+    import os
+
+    from todo_common.tracing import Tracer
+
+    from todo_client.remote import post_sync
+
+    remote_server = config.get("server_url", "http://localhost:8030")
+    username = config.get("username", "default_user")
+    storage = get_storage(config)
+    # Lets the server skip notifying this device about its own changes, and
+    # track how far it has synced (the cursor of the last response applied here)
+    stored_device_id, ack = storage.get_sync_state(username)
+    device_id = (
+        device_id or config.get("device_id") or stored_device_id or os.urandom(8).hex()
+    )
+    print(f"Syncing with remote server {remote_server}...")
+
+    # Time each step; the server reports its own steps in a Server-Timing header
+    tracer = Tracer("todo-client")
+    with tracer.span("sync", username=username):
+        with tracer.span("read"):
+            local_tasks = storage.get_tasks_for_user(username)
+
+        with tracer.span("serialize") as span:
+            tasks_data = [asdict(task) for task in local_tasks]
+            payload = {"tasks": tasks_data, "username": username, "device_id": device_id}
+            if ack is not None:
+                payload["ack"] = ack
+            body = json.dumps(payload)
+            span["attributes"].update(tasks=len(tasks_data), bytes=len(body))
+
+        with tracer.span("http") as http:
+            response = post_sync(
+                remote_server,
+                username,
+                retries=int(config.get("sync_retries", "3")),
+                data=body,
+                headers={
+                    "Content-Type": "application/json",
+                    "traceparent": tracer.traceparent(),
+                },
+            )
+            http["attributes"]["status"] = response.status_code
+
+        if response.status_code != 200:
+            print(f"Error: Failed to sync with server. Status code: {response.status_code}")
+            sys.exit(1)
+
+        with tracer.span("decode"):
+            server_response = response.json()
+
+            tasks = []
+            for t in server_response.get("tasks", []):
+                tasks.append(Task(**t))
+
+        with tracer.span("apply"):
+            storage.sync_tasks(tasks, clear_first=True)
+            # After the clear, which empties the database file
+            storage.save_sync_state(
+                username,
+                device_id,
+                server_response.get("cursor"),
+                server_response.get("horizon", 0),
+            )
+
+    add_server_spans(tracer, http, response.headers.get("Server-Timing"))
+
+    if config.get("trace_file"):
+        tracer.export(config["trace_file"])
+
+    if server_response.get("resync"):
+        # Nothing is lost here, since every local task was just sent
+        print("Deleted tasks were purged on the server since this device last synced.")
+        print("Replaced the local tasks with the server's.")
+    print("✅ Sync complete.")
+
+    if timings:
+        print(f"\nTimings for trace {tracer.trace_id}:")
+        print(tracer.render())
+
+
+def add_server_spans(tracer, http: dict, server_timing: str | None) -> None:
+    """
+    Nest the server's reported steps under the HTTP span, and record what is
+    left of the HTTP time as "network".
+
+    Args:
+        tracer: The client's tracer for this sync.
+        http: The span that timed the request.
+        server_timing: The response's Server-Timing header, if any.
+    """
+    from todo_common.tracing import parse_server_timing
+
+    timings = parse_server_timing(server_timing)
+    server = None
+    for name, duration_ms in timings:
+        if name == "server":
+            server = tracer.add_span(
+                name, duration_ms, parent=http, service="todo-server", source="Server-Timing"
+            )
+    if server is None:
+        return
+
+    for name, duration_ms in timings:
+        if name != "server":
+            tracer.add_span(
+                name, duration_ms, parent=server, service="todo-server", source="Server-Timing"
+            )
+
+    network_ms = max(http["duration_ms"] - server["duration_ms"], 0.0)
+    tracer.add_span("network", round(network_ms, 3), parent=http)
+
+
+def handle_uncomplete(config, task_id: str):
+    get_storage(config).uncomplete_task(int(task_id))
+    print(f"❌ Marked task #{task_id} as incomplete.")
+
+
+def handle_update(config, task_id: str, new_content: str):
+    print(f"Updating task #{task_id} to new content: {new_content}")
+    get_storage(config).update_task_content(int(task_id), new_content)
+    print(f"✏️ Updated task #{task_id}.")
+
+
+def handle_due(config, task_id: str, due_date: str):
+    print(f"Handling due date for task #{task_id} to {due_date}.")
+    import re
+    from datetime import datetime
+
+    # Validate date format YYYY-MM-DD
+    date_pattern = r"^\d{4}-\d{2}-\d{2}$"
+    if not re.match(date_pattern, due_date):
+        print("Error: Invalid date format. Please use YYYY-MM-DD (e.g., 2025-12-01).")
+        sys.exit(1)
+
+    # Validate that it's a valid date
+    try:
+        datetime.strptime(due_date, "%Y-%m-%d")
+    except ValueError:
+        print("Error: Invalid date format. Please use YYYY-MM-DD (e.g., 2025-12-01).")
+        sys.exit(1)
+
+    get_storage(config).set_due_date(int(task_id), due_date)
+    print(f"📅 Set due date for task #{task_id} to {due_date}.")
+
+
+def handle_undue(config, task_id: str):
+    get_storage(config).remove_due_date(int(task_id))
+    print(f"📅 Removed due date from task #{task_id}.")
+
+
+def handle_delete(config, task_id: str):
+    get_storage(config).delete_task(int(task_id))
+    print(f"🗑️  Deleted task #{task_id}.")
+
+
+def handle_shell(config):
+    from todo_client.shell import run_shell
+
+    run_shell(config, build_parser())
+
+
+def handle_batch(config, batch_size, stop_on_error):
+    from todo_client.shell import run_batch
+
+    require_sqlite(config, "batch")
+    failed = run_batch(
+        config,
+        build_parser(),
+        sys.stdin,
+        batch_size=batch_size,
+        stop_on_error=stop_on_error,
+    )
+    if failed:
+        sys.exit(1)
+
+
+def handle_watch(config):
+    from todo_client.watch import run_watch
+
+    # Keep the device ID the last sync used, so the server doesn't register a new device
+    device_id, _ = get_storage(config).get_sync_state(config.get("username", "default_user"))
+    try:
+        run_watch(
+            config,
+            lambda device_id: handle_sync(config, device_id=device_id),
+            device_id=device_id,
+        )
+    except KeyboardInterrupt:
+        print("\nStopped watching.")
+
+
+def handle_daemon(config, debounce: float, max_delay: float):
+    from todo_client.daemon import run_daemon
+
+    require_sqlite(config, "daemon")
+    try:
+        run_daemon(config, debounce=debounce, max_delay=max_delay)
+    except KeyboardInterrupt:
+        print("\nStopped pushing changes.")
+
+
+# Maps each subcommand to its handler. Every entry takes (config, parsed_args).
+COMMANDS = {
+    "batch": lambda config, args: handle_batch(
+        config, args.batch_size, args.stop_on_error
+    ),
+    "complete": lambda config, args: handle_complete(config, args.task_id),
+    "daemon": lambda config, args: handle_daemon(
+        config, args.debounce, args.max_delay
+    ),
+    "create": lambda config, args: handle_create(config, args.content),
+    "export": lambda config, args: handle_export(config, args.output, args.format),
+    "import": lambda config, args: handle_import(
+        config, args.input, args.format, args.on_conflict
+    ),
+    "list": lambda config, args: handle_list(
+        config,
+        only_today=args.today,
+        only_completed=args.completed,
+        output_format=args.format,
+        due=args.due,
+    ),
+    "search": lambda config, args: handle_search(
+        config, args.query, args.limit, output_format=args.format
+    ),
+    "shell": lambda config, args: handle_shell(config),
+    "sync": lambda config, args: handle_sync(config, args.timings),
+    "watch": lambda config, args: handle_watch(config),
+    "uncomplete": lambda config, args: handle_uncomplete(config, args.task_id),
+    "due": lambda config, args: handle_due(config, args.task_id, args.due_date),
+    "undue": lambda config, args: handle_undue(config, args.task_id),
+    "update": lambda config, args: handle_update(
+        config, args.task_id, args.new_content
+    ),
+    "delete": lambda config, args: handle_delete(config, str(args.task_id)),
+}
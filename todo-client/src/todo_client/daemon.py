@@ -0,0 +1,169 @@
+"""
+The client's auto-sync daemon (`todo-client daemon`).
+
+Every local edit bumps the task's dirty counter (see
+todo_common.migrations.add_dirty_counter). The daemon notices commits to the
+database from other processes through PRAGMA data_version, which is a cheap
+read of a counter in the open connection, and waits until edits stop coming for
+`debounce` seconds (or `max_delay` seconds have passed since the first one).
+Then it pushes only the dirty tasks to /sync.
+
+Once the server has answered, apply_remote_tasks marks the pushed tasks clean,
+unless they were edited again meanwhile, and takes the server's copy of every
+other task, all in one transaction. The cursor of that answer is kept and sent
+as `ack` with the next push, so the server knows how far this device has synced
+(see todo_server.devices). While the server can't be reached, pushes
+are retried with exponential backoff; nothing is lost, since the tasks stay
+dirty until a push succeeds.
+"""
+
+import os
+import random
+import time
+from collections.abc import Callable
+from dataclasses import asdict
+
+from todo_common.db import (
+    apply_remote_tasks,
+    get_conn,
+    get_dirty_tasks,
+    get_sync_state,
+    init_db,
+    save_sync_state,
+)
+from todo_common.task import Task
+
+# Seconds to wait after a failed push, doubling up to the maximum
+INITIAL_BACKOFF = 1
+MAX_BACKOFF = 300
+
+
+def push_dirty_tasks(config, device_id: str | None = None) -> int:
+    """
+    Send the user's dirty tasks to the server and apply its answer.
+
+    Returns:
+        The number of tasks pushed (0 if there was nothing to push).
+
+    Raises:
+        requests.RequestException if the server can't be reached or returns an
+        error. The tasks stay dirty.
+    """
+    from todo_client.remote import post_sync
+
+    remote_server = config.get("server_url", "http://localhost:8030")
+    username = config.get("username", "default_user")
+    database_file = config.get("database_file", "todo_client.db")
+
+    dirty = get_dirty_tasks(username, database_file)
+    if not dirty:
+        return 0
+
+    payload = {
+        "tasks": [asdict(task) for task, _ in dirty],
+        "username": username,
+    }
+    if device_id:
+        payload["device_id"] = device_id
+    _, ack = get_sync_state(username, database_file)
+    if ack is not None:
+        payload["ack"] = ack
+
+    response = post_sync(
+        remote_server,
+        username,
+        retries=int(config.get("sync_retries", "3")),
+        json=payload,
+        timeout=30,
+    )
+    response.raise_for_status()
+
+    server_response = response.json()
+    tasks = [Task(**t) for t in server_response.get("tasks", [])]
+    apply_remote_tasks(tasks, {task.id: count for task, count in dirty}, database_file)
+    if device_id:
+        save_sync_state(
+            username,
+            device_id,
+            server_response.get("cursor"),
+            database_file,
+            server_response.get("horizon", 0),
+        )
+    return len(dirty)
+
+
+def run_daemon(
+    config,
+    debounce: float = 2.0,
+    max_delay: float = 30.0,
+    poll_interval: float = 0.5,
+    clock: Callable[[], float] = time.monotonic,
+    sleep: Callable[[float], None] = time.sleep,
+) -> None:
+    """
+    Push local changes to the server as they happen, until interrupted.
+
+    Args:
+        config: The client config.
+        debounce: Seconds without new edits before a burst of edits is pushed.
+        max_delay: Longest time an edit waits, even if edits keep coming.
+        poll_interval: Seconds between checks for new commits.
+        clock: Monotonic time in seconds (e.g. a fake one for tests).
+        sleep: Waits between checks.
+    """
+    import requests
+
+    database_file = config.get("database_file", "todo_client.db")
+    remote_server = config.get("server_url", "http://localhost:8030")
+    username = config.get("username", "default_user")
+
+    init_db(database_file)
+    # The ID this database last synced as, so the server doesn't see a new device each run
+    device_id = (
+        config.get("device_id")
+        or get_sync_state(username, database_file)[0]
+        or os.urandom(8).hex()
+    )
+    # Only used to read data_version, which changes when another connection commits
+    watcher = get_conn(database_file)
+
+    print(f"Pushing local changes to {remote_server} (Ctrl-C to stop)...")
+
+    last_version = watcher.execute("PRAGMA data_version;").fetchone()[0]
+    # Start with a push, for edits made while the daemon wasn't running
+    first_change = last_change = clock() - debounce
+    retry_at = 0.0
+    backoff = INITIAL_BACKOFF
+    try:
+        while True:
+            now = clock()
+            version = watcher.execute("PRAGMA data_version;").fetchone()[0]
+            if version != last_version:
+                last_version = version
+                last_change = now
+                if first_change is None:
+                    first_change = now
+
+            quiet = now - last_change >= debounce
+            overdue = first_change is not None and now - first_change >= max_delay
+            if first_change is not None and (quiet or overdue) and now >= retry_at:
+                try:
+                    pushed = push_dirty_tasks(config, device_id)
+                except requests.RequestException as e:
+                    if isinstance(e, (requests.ConnectionError, requests.Timeout)):
+                        reason = "server unreachable"
+                    else:
+                        reason = str(e)
+                    delay = backoff * random.uniform(0.5, 1)
+                    print(f"Push failed ({reason}). Retrying in {delay:.0f} s...")
+                    retry_at = now + delay
+                    backoff = min(backoff * 2, MAX_BACKOFF)
+                else:
+                    first_change = None
+                    backoff = INITIAL_BACKOFF
+                    if pushed:
+                        print(f"✅ Pushed {pushed} changed task(s).")
+
+            sleep(poll_interval)
+    finally:
+        watcher.close()
@@ -1,33 +1,163 @@
-from prettytable import PrettyTable
+import json
+import sys
+import unicodedata
+from collections.abc import Iterable
+from dataclasses import asdict
+from itertools import chain, islice
 
+OUTPUT_FORMATS = ("table", "plain", "tsv", "ndjson")
 
-def get_task_table(tasks):
+TABLE_HEADERS = [
+    "ID",
+    "Content",
+    "Completed",
+    "Due Date",
+    "Created At",
+    "Updated At",
+]
+
+
+def get_task_row(task) -> list:
+    """
+    Return the table cells shown for a single Task.
     """
-    Return an ASCII table representation of the given list of Task objects.
+    return [
+        task.id,
+        task.content,
+        "✅" if task.is_completed else "❌",
+        task.due_date if task.due_date else "-",
+        task.created_at,
+        task.updated_at,
+    ]
+
 
-    I'm using PrettyTable here because I don't want to implement table formatting myself for this POC.
+def display_width(text: str) -> int:
     """
+    Return how many terminal columns the text takes up (wide characters such as emoji take two).
+    """
+    return sum(
+        2 if unicodedata.east_asian_width(ch) in ("W", "F") else 1 for ch in text
+    )
 
-    table = PrettyTable()
-    table.field_names = [
-        "ID",
-        "Content",
-        "Completed",
-        "Due Date",
-        "Created At",
-        "Updated At",
-    ]
+
+def fit_cell(text: str, width: int, truncate: bool = False) -> str:
+    """
+    Center text within the given display width.
+    If truncate is True, text that is too wide is cut to fit and marked with "…".
+    """
+    if truncate and display_width(text) > width:
+        while display_width(text) > width - 1:
+            text = text[:-1]
+        text += "…"
+    padding = max(width - display_width(text), 0)
+    left = padding // 2
+    return " " * left + text + " " * (padding - left)
+
+
+def render_tasks(
+    tasks: Iterable,
+    output_format: str = "table",
+    out=None,
+    sample_size: int = 200,
+    max_content_width: int = 60,
+) -> int:
+    """
+    Write tasks to out (stdout by default) as they are read, without holding the whole list in memory.
+
+    Args:
+        tasks: an iterable of Task objects, typically a generator reading from the database
+        output_format: one of "table", "plain", "tsv" or "ndjson"
+        out: a text stream to write to
+        sample_size: number of tasks read ahead to size the table columns; longer content in later rows is truncated
+        max_content_width: upper bound for the width of the Content column in table output
+
+    Returns:
+        The number of tasks written.
+    """
+    out = out or sys.stdout
+    tasks = iter(tasks)
+
+    if output_format == "table":
+        return _render_table(tasks, out, sample_size, max_content_width)
+
+    count = 0
+    if output_format == "tsv":
+        out.write("\t".join(TABLE_HEADERS) + "\n")
 
     for task in tasks:
-        table.add_row(
-            [
-                task.id,
-                task.content,
-                "✅" if task.is_completed else "❌",
-                task.due_date if task.due_date else "-",
-                task.created_at,
-                task.updated_at,
-            ]
+        if output_format == "plain":
+            line = f"#{task.id} [{'x' if task.is_completed else ' '}] {task.content}"
+            if task.due_date:
+                line += f" (due {task.due_date})"
+        elif output_format == "tsv":
+            line = "\t".join(_escape_tsv(_plain_value(v)) for v in _plain_row(task))
+        elif output_format == "ndjson":
+            line = json.dumps(asdict(task), ensure_ascii=False)
+        else:
+            raise ValueError(f"Unknown output format: {output_format}")
+        out.write(line + "\n")
+        count += 1
+
+    return count
+
+
+def _render_table(tasks, out, sample_size: int, max_content_width: int) -> int:
+    # Size the columns from a bounded sample, then stream the rest through the same layout.
+    # Only Content is truncated; other columns are short and would rather overflow.
+    sample = [get_task_row(task) for task in islice(tasks, sample_size)]
+
+    widths = [len(header) for header in TABLE_HEADERS]
+    for row in sample:
+        for i, value in enumerate(row):
+            widths[i] = max(widths[i], display_width(_escape_tsv(str(value))))
+    widths[1] = min(widths[1], max(max_content_width, len(TABLE_HEADERS[1])))
+
+    border = "+" + "+".join("-" * (w + 2) for w in widths) + "+"
+
+    def format_row(values) -> str:
+        cells = (
+            fit_cell(_escape_tsv(str(v)), w, truncate=(i == 1))
+            for i, (v, w) in enumerate(zip(values, widths))
         )
+        return "| " + " | ".join(cells) + " |"
+
+    out.write(border + "\n")
+    out.write(format_row(TABLE_HEADERS) + "\n")
+    out.write(border + "\n")
+
+    count = 0
+    rest = (get_task_row(task) for task in tasks)
+    for row in chain(sample, rest):
+        out.write(format_row(row) + "\n")
+        count += 1
+
+    out.write(border + "\n")
+    return count
+
+
+def _plain_row(task) -> list:
+    return [
+        task.id,
+        task.content,
+        task.is_completed,
+        task.due_date,
+        task.created_at,
+        task.updated_at,
+    ]
+
+
+def _plain_value(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    return str(value)
+
 
-    return table
+def _escape_tsv(value: str) -> str:
+    return (
+        value.replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
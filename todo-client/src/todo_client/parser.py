@@ -0,0 +1,193 @@
+"""
+The client's command-line parser, shared by todo_client.main and the shell.
+"""
+
+import argparse
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Todo Client CLI")
+    parser.add_argument("--config", type=str, default=None, help="Path to config file")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    # Create subparser for the "batch" command
+    batch_parser = subparsers.add_parser(
+        "batch",
+        help="Run commands read from stdin, one per line, in one process and transaction",
+    )
+    batch_parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=500,
+        metavar="N",
+        help="Commit every N lines (default 500). A failed line is rolled back on its own.",
+    )
+    batch_parser.add_argument(
+        "--stop-on-error",
+        action="store_true",
+        help="Stop at the first failed line and roll back its whole batch.",
+    )
+
+    # Create subparser for the "complete" command
+    complete_parser = subparsers.add_parser("complete", help="Mark a task as completed")
+    complete_parser.add_argument("task_id", help="ID of the task to mark as completed")
+
+    # Create subparser for the "create" command
+    create_parser = subparsers.add_parser("create", help="Create a new task")
+    create_parser.add_argument("content", help="Content of the task")
+
+    # Create subparser for the "export" command
+    export_parser = subparsers.add_parser(
+        "export", help="Export your tasks as NDJSON or CSV"
+    )
+    export_parser.add_argument(
+        "--output", "-o", default=None, help="File to write to (default: stdout)"
+    )
+    export_parser.add_argument(
+        "--format",
+        choices=("ndjson", "csv"),
+        default=None,
+        help="Defaults to csv for .csv files and ndjson otherwise.",
+    )
+
+    # Create subparser for the "import" command
+    import_parser = subparsers.add_parser(
+        "import", help="Import tasks from an NDJSON or CSV file"
+    )
+    import_parser.add_argument("input", help="File to read from ('-' for stdin)")
+    import_parser.add_argument(
+        "--format",
+        choices=("ndjson", "csv"),
+        default=None,
+        help="Defaults to csv for .csv files and ndjson otherwise.",
+    )
+    import_parser.add_argument(
+        "--on-conflict",
+        choices=("skip", "replace", "newer", "fail", "new-ids"),
+        default="skip",
+        help="What to do with tasks whose ID already exists (default: skip).",
+    )
+
+    # Create subparser for the "init" command
+    subparsers.add_parser("init", help="Initialize the client configuration")
+
+    # Create subparser for the "list" command
+    list_parser = subparsers.add_parser(
+        "list",
+        help="List tasks (optionally filter with --today / --overdue / --week / --completed).",
+    )
+    due_group = list_parser.add_mutually_exclusive_group()
+    due_group.add_argument(
+        "--today",
+        action="store_true",
+        help="Show only tasks due today. If combined with --completed, shows tasks completed today (ignores due date).",
+    )
+    due_group.add_argument(
+        "--overdue",
+        action="store_const",
+        const="overdue",
+        dest="due",
+        help="Show only tasks whose due date has passed.",
+    )
+    due_group.add_argument(
+        "--week",
+        action="store_const",
+        const="week",
+        dest="due",
+        help="Show only tasks due in the next seven days, today included.",
+    )
+    list_parser.add_argument(
+        "--completed",
+        action="store_true",
+        help="Show only completed tasks. If combined with --today, shows tasks completed today.",
+    )
+    list_parser.add_argument(
+        "--format",
+        choices=("table", "plain", "tsv", "ndjson"),
+        default=None,
+        help="Output format. Tasks are printed as they are read; plain, tsv and ndjson are meant for piping.",
+    )
+
+    # Create subparser for the "search" command
+    search_parser = subparsers.add_parser(
+        "search", help="Search task content, best matches first"
+    )
+    search_parser.add_argument("query", help="Words to search for")
+    search_parser.add_argument(
+        "--limit", type=int, default=20, help="Maximum number of results"
+    )
+    search_parser.add_argument(
+        "--format",
+        choices=("table", "plain", "tsv", "ndjson"),
+        default=None,
+        help="Output format (same as list).",
+    )
+
+    # Create subparser for the "uncomplete" command
+    uncomplete_parser = subparsers.add_parser(
+        "uncomplete", help="Mark a task as incomplete"
+    )
+    uncomplete_parser.add_argument(
+        "task_id", help="ID of the task to mark as incomplete"
+    )
+
+    # Create subparser for the "update" command
+    update_parser = subparsers.add_parser("update", help="Update the content of a task")
+    update_parser.add_argument("task_id", help="ID of the task to update")
+    update_parser.add_argument("new_content", help="New content for the task")
+
+    # Create subparser for the "due" command
+    due_parser = subparsers.add_parser("due", help="Set a due date for a task")
+    due_parser.add_argument("task_id", help="ID of the task to set due date for")
+    due_parser.add_argument(
+        "due_date", help="Due date in YYYY-MM-DD format (e.g., 2025-12-01)"
+    )
+
+    # Create subparser for the "undue" command
+    undue_parser = subparsers.add_parser(
+        "undue", help="Remove the due date from a task"
+    )
+    undue_parser.add_argument("task_id", help="ID of the task to remove due date from")
+
+    # Create subparser for the "delete" command
+    delete_parser = subparsers.add_parser("delete", help="Delete a task (soft delete)")
+    delete_parser.add_argument("task_id", type=int, help="ID of the task to delete")
+
+    # Create subparser for the "shell" command
+    subparsers.add_parser(
+        "shell", help="Start an interactive shell that keeps the database open"
+    )
+
+    # Create subparser for the "sync" command
+    sync_parser = subparsers.add_parser(
+        "sync", help="Sync local tasks with the remote server"
+    )
+    sync_parser.add_argument(
+        "--timings",
+        action="store_true",
+        help="Show how long each step of the sync took, on the client and the server",
+    )
+
+    # Create subparser for the "daemon" command
+    daemon_parser = subparsers.add_parser(
+        "daemon", help="Push local changes to the server in the background as they happen"
+    )
+    daemon_parser.add_argument(
+        "--debounce",
+        type=float,
+        default=2.0,
+        help="Seconds without new edits before pushing them (default 2)",
+    )
+    daemon_parser.add_argument(
+        "--max-delay",
+        type=float,
+        default=30.0,
+        help="Longest seconds an edit waits while edits keep coming (default 30)",
+    )
+
+    # Create subparser for the "watch" command
+    subparsers.add_parser(
+        "watch", help="Stay connected to the server and sync whenever tasks change there"
+    )
+
+    return parser
@@ -0,0 +1,62 @@
+"""
+Requests to the server's /sync endpoint, shared by `todo-client sync`, watch and
+the daemon.
+
+A busy server answers 429 (too many syncs for this user) or 503 (server
+saturated) with a Retry-After header instead of letting requests time out.
+post_sync waits that long, stretched by a random factor so that clients turned
+away together don't all come back at the same moment, and tries again.
+"""
+
+import random
+import time
+
+import requests
+
+RETRY_STATUSES = (429, 503)
+
+
+def retry_delay(retry_after: str | None, attempt: int) -> float:
+    """
+    Seconds to wait before retrying, from a Retry-After header value if it has
+    one in seconds, otherwise doubling with each attempt, plus up to 50% jitter.
+    """
+    try:
+        delay = max(float(retry_after), 0.0)
+    except (TypeError, ValueError):
+        delay = float(2**attempt)
+    return delay * random.uniform(1, 1.5)
+
+
+def post_sync(
+    server_url: str,
+    username: str,
+    retries: int = 3,
+    sleep=time.sleep,
+    **kwargs,
+) -> requests.Response:
+    """
+    POST to {server_url}/sync, retrying while the server says it is busy.
+
+    Args:
+        server_url: The server's base URL.
+        username: Sent as X-Todo-Username, which the server uses to share
+            capacity fairly between users.
+        retries: How many times to retry after a 429 or 503.
+        sleep: Called with the delay before each retry.
+        **kwargs: Passed on to requests.post (data or json, headers, timeout...).
+
+    Returns:
+        The last response, which may still be a 429 or 503 if every retry was
+        turned away too.
+    """
+    headers = {**kwargs.pop("headers", {}), "X-Todo-Username": username}
+    for attempt in range(retries + 1):
+        response = requests.post(f"{server_url}/sync", headers=headers, **kwargs)
+        if response.status_code not in RETRY_STATUSES or attempt == retries:
+            return response
+
+        delay = retry_delay(response.headers.get("Retry-After"), attempt)
+        print(f"Server busy ({response.status_code}); retrying in {delay:.1f} s...")
+        sleep(delay)
+    return response
@@ -0,0 +1,236 @@
+"""
+The client's interactive shell (`todo-client shell`) and stdin batch mode
+(`todo-client batch`).
+
+Both parse each line with the normal command-line parser and run it through the
+same handlers as todo-client itself, but the config is loaded once and one
+database connection stays open, so a command costs a few SQL statements instead
+of a new Python process, a config read, a schema check and a commit.
+"""
+
+import shlex
+import sqlite3
+import sys
+from collections.abc import Iterable
+from contextlib import redirect_stderr
+from io import StringIO
+
+from todo_common.db import get_conn, init_db, use_connection
+
+from todo_client.commands import COMMANDS
+
+# Commands that only touch the local tasks table, so they can share the open
+# connection (and, in batch mode, its transaction)
+SHARED_CONNECTION_COMMANDS = {
+    "complete",
+    "create",
+    "delete",
+    "due",
+    "list",
+    "search",
+    "uncomplete",
+    "undue",
+    "update",
+}
+
+# Commands that can't be run from inside a shell or batch
+NESTED_COMMANDS = {"batch", "init", "shell"}
+
+
+def parse_line(parser, line: str):
+    """
+    Split a line into words like a POSIX shell would, and parse it with the CLI parser.
+
+    Returns the parsed arguments, or None for blank lines, comments and --help.
+    Raises ValueError with argparse's message if the line isn't a valid command.
+    """
+    try:
+        words = shlex.split(line, comments=True)
+    except ValueError as e:
+        raise ValueError(f"can't split line: {e}") from None
+    if not words:
+        return None
+
+    errors = StringIO()
+    try:
+        with redirect_stderr(errors):
+            return parser.parse_args(words)
+    except SystemExit as e:
+        if not e.code:
+            return None  # --help, already printed
+        lines = errors.getvalue().strip().splitlines()
+        raise ValueError(lines[-1] if lines else "invalid command") from None
+
+
+def run_command(config, args, conn: sqlite3.Connection | None = None) -> bool:
+    """
+    Run one parsed command, on conn if given. Returns False if the command failed.
+
+    The handlers print their own errors and exit, so SystemExit counts as a failure
+    rather than ending the shell, as do database errors, bad values and I/O errors
+    (including requests' errors, e.g. the server being unreachable during sync).
+    Anything else is a bug and ends the shell with its traceback. Committing or
+    rolling back is up to the caller.
+    """
+    try:
+        if conn is None:
+            COMMANDS[args.command](config, args)
+        else:
+            with use_connection(conn, config.get("database_file", "todo_client.db")):
+                COMMANDS[args.command](config, args)
+    except SystemExit as e:
+        return not e.code
+    except (sqlite3.Error, ValueError, OSError) as e:
+        print(f"Error: {e}")
+        return False
+    return True
+
+
+def run_shell(config, parser) -> None:
+    """
+    Read commands interactively until 'exit', 'quit' or end of input.
+
+    Task commands run on the shell's open connection and are committed one by one.
+    The rest (sync, import, export) manage their own connections and
+    transactions, so the shell's connection is closed while they run. With
+    storage_backend=memory there is no connection, and the tasks last as long
+    as the shell.
+    """
+    try:
+        import readline  # noqa: F401 - gives input() line editing and history
+    except ImportError:
+        pass
+
+    database_file = config.get("database_file", "todo_client.db")
+    in_memory = config.get("storage_backend", "sqlite") != "sqlite"
+    conn = None
+    if not in_memory:
+        init_db(database_file)
+        conn = get_conn(database_file)
+
+    print("Type a command (e.g. 'list' or 'complete 3'), 'help', or 'exit'.")
+    try:
+        while True:
+            try:
+                line = input("todo> ")
+            except EOFError:
+                print()
+                break
+            except KeyboardInterrupt:
+                print()
+                continue
+
+            if line.strip() in ("exit", "quit"):
+                break
+            if line.strip() == "help":
+                parser.print_help()
+                continue
+
+            try:
+                args = parse_line(parser, line)
+            except ValueError as e:
+                print(f"Error: {e}")
+                continue
+            if args is None:
+                continue
+            if args.command in NESTED_COMMANDS:
+                print(f"Error: '{args.command}' can't be used inside the shell.")
+                continue
+
+            if in_memory:
+                try:
+                    run_command(config, args)
+                except KeyboardInterrupt:
+                    print()
+            elif args.command in SHARED_CONNECTION_COMMANDS:
+                try:
+                    ok = run_command(config, args, conn)
+                except KeyboardInterrupt:
+                    print()
+                    ok = False
+                if ok:
+                    conn.commit()
+                else:
+                    conn.rollback()
+            else:
+                # sync rewrites the database file, so don't hold it open meanwhile
+                conn.close()
+                try:
+                    run_command(config, args)
+                except KeyboardInterrupt:
+                    print()
+                conn = get_conn(database_file)
+    finally:
+        if conn is not None:
+            conn.close()
+
+
+def run_batch(
+    config,
+    parser,
+    lines: Iterable[str],
+    batch_size: int = 500,
+    stop_on_error: bool = False,
+) -> int:
+    """
+    Run task commands read from lines (e.g. stdin), one command per line.
+
+    Every batch_size commands are applied in one transaction. Each line also runs
+    inside its own savepoint, so a line that fails is rolled back and reported on
+    stderr with its line number, without undoing the lines around it.
+
+    Args:
+        config: the client config
+        parser: the CLI argument parser (from todo_client.parser.build_parser)
+        lines: command lines; blank lines and '#' comments are skipped
+        batch_size: number of commands per transaction
+        stop_on_error: if True, the first failed line rolls back its whole batch
+            and nothing after it runs
+
+    Returns:
+        The number of failed lines.
+    """
+    database_file = config.get("database_file", "todo_client.db")
+    init_db(database_file)
+    conn = get_conn(database_file)
+
+    failed = 0
+    in_batch = 0
+    try:
+        for line_number, line in enumerate(lines, start=1):
+            error = None
+            try:
+                args = parse_line(parser, line)
+            except ValueError as e:
+                args, error = None, str(e)
+            if args is not None and args.command not in SHARED_CONNECTION_COMMANDS:
+                args, error = None, f"'{args.command}' can't be used in a batch"
+
+            if args is not None:
+                if not conn.in_transaction:
+                    conn.execute("BEGIN IMMEDIATE;")
+                conn.execute("SAVEPOINT batch_line;")
+                if run_command(config, args, conn):
+                    conn.execute("RELEASE batch_line;")
+                else:
+                    conn.execute("ROLLBACK TO batch_line;")
+                    conn.execute("RELEASE batch_line;")
+                    error = "command failed"
+                in_batch += 1
+
+            if error:
+                failed += 1
+                print(f"line {line_number}: {error}: {line.strip()}", file=sys.stderr)
+                if stop_on_error:
+                    conn.rollback()
+                    break
+
+            if in_batch >= batch_size:
+                conn.commit()
+                in_batch = 0
+
+        conn.commit()
+    finally:
+        conn.close()
+
+    return failed
@@ -0,0 +1,127 @@
+"""
+The client's watch mode (`todo-client watch`).
+
+Instead of running `todo-client sync` on a timer, watch keeps a Server-Sent
+Events stream open to GET /users/{username}/events and syncs only when the
+server says another device changed this user's tasks. It also syncs once when it
+first connects and after losing the connection, since changes may have been
+missed in between. When the server ends the stream normally (every minute or
+so), watch reconnects with Last-Event-ID and the server only sends a change if
+one happened meanwhile.
+
+The device id sent with the stream and with each sync keeps the server from
+notifying this device about its own changes. It comes from `device_id` in the
+config, or is made up for the life of the process.
+"""
+
+import os
+import random
+import time
+from collections.abc import Callable, Iterable, Iterator
+from urllib.parse import quote
+
+# Seconds to wait before reconnecting after an error, doubling up to the maximum
+INITIAL_BACKOFF = 1
+MAX_BACKOFF = 60
+
+# The server writes at least every 15 seconds, so a longer silence means a dead connection
+READ_TIMEOUT = 45
+
+
+def iter_events(lines: Iterable[str]) -> Iterator[dict]:
+    """
+    Parse a Server-Sent Events stream, one decoded line at a time.
+
+    Yields:
+        A dict with the event's "event" (default "message"), "data" and "id".
+    """
+    event = {}
+    data = []
+    for line in lines:
+        if not line:
+            if data or event:
+                yield {
+                    "event": event.get("event", "message"),
+                    "data": "\n".join(data),
+                    "id": event.get("id"),
+                }
+            event, data = {}, []
+            continue
+        if line.startswith(":"):
+            continue  # comment, e.g. a keepalive
+
+        field, _, value = line.partition(":")
+        value = value.removeprefix(" ")
+        if field == "data":
+            data.append(value)
+        elif field in ("event", "id"):
+            event[field] = value
+
+
+def run_watch(
+    config, sync: Callable[[str], None], device_id: str | None = None
+) -> None:
+    """
+    Follow the server's change notifications until interrupted.
+
+    Args:
+        config: The client config.
+        sync: Runs one sync, given this device's id. May raise SystemExit or a
+            requests exception if it fails; it is retried on the next notification
+            or reconnect.
+        device_id: This device's id, if it has one already (default: the
+            config's device_id, or a new random one).
+    """
+    import requests
+
+    remote_server = config.get("server_url", "http://localhost:8030")
+    username = config.get("username", "default_user")
+    device_id = device_id or config.get("device_id") or os.urandom(8).hex()
+    url = f"{remote_server}/users/{quote(username, safe='')}/events"
+
+    def try_sync() -> bool:
+        try:
+            sync(device_id)
+            return True
+        except SystemExit:
+            pass  # sync has already printed why
+        except requests.RequestException as e:
+            print(f"Sync failed: {e}")
+        print("Will retry on the next change.")
+        return False
+
+    print(f"Watching {remote_server} for changes to {username}'s tasks (Ctrl-C to stop)...")
+
+    last_event_id = None
+    needs_sync = True
+    backoff = INITIAL_BACKOFF
+    while True:
+        headers = {"Accept": "text/event-stream"}
+        if last_event_id is not None:
+            headers["Last-Event-ID"] = last_event_id
+        try:
+            with requests.get(
+                url,
+                params={"device_id": device_id},
+                headers=headers,
+                stream=True,
+                timeout=(10, READ_TIMEOUT),
+            ) as response:
+                response.raise_for_status()
+                backoff = INITIAL_BACKOFF
+                lines = response.iter_lines(decode_unicode=True)
+                for event in iter_events(lines):
+                    if event["id"] is not None:
+                        last_event_id = event["id"]
+                    # Sync once subscribed, so nothing is missed between the sync and the stream
+                    if event["event"] == "changed" or (
+                        event["event"] == "ready" and needs_sync
+                    ):
+                        needs_sync = not try_sync()
+            # The server ended the stream; reconnect, and Last-Event-ID covers the gap
+        except requests.RequestException as e:
+            delay = backoff * random.uniform(0.5, 1)
+            print(f"Lost connection to {remote_server} ({e}). Reconnecting in {delay:.0f} s...")
+            needs_sync = True
+            time.sleep(delay)
+            backoff = min(backoff * 2, MAX_BACKOFF)
@@ -0,0 +1,159 @@
+import sqlite3
+from dataclasses import asdict, replace
+
+import pytest
+import requests
+from todo_client import daemon, remote
+from todo_client.daemon import push_dirty_tasks, run_daemon
+from todo_common import db
+from todo_common.task import Task
+
+
+@pytest.fixture
+def config(tmp_path):
+    database_file = str(tmp_path / "client.db")
+    db.init_db(database_file)
+    return {
+        "username": "alice",
+        "database_file": database_file,
+        "server_url": "http://todo.invalid",
+    }
+
+
+class FakeResponse:
+    def __init__(self, body):
+        self.body = body
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.body
+
+
+def test_push_sends_dirty_tasks_and_keeps_edits_made_meanwhile(config, monkeypatch):
+    path = config["database_file"]
+    synced = db.add_full_task(
+        Task(
+            id=1,
+            username="alice",
+            content="Synced earlier",
+            is_completed=False,
+            is_deleted=False,
+            due_date=None,
+            created_at="2025-01-01T00:00:00",
+            updated_at="2025-01-01T00:00:00",
+        ),
+        path,
+    )
+    first = db.create_task("First", "alice", path)
+    second = db.create_task("Second", "alice", path)
+    db.save_sync_state("alice", "laptop", 5, path)
+    from_phone = replace(synced, id=99, content="From the phone")
+
+    sent = []
+
+    def post_sync(server_url, username, retries, json, timeout):
+        sent.append(json)
+        # The user edits the second task while the first push is in flight
+        if len(sent) == 1:
+            db.update_task_content(second.id, "Second, edited", path)
+        tasks = [*json["tasks"], asdict(synced), asdict(from_phone)]
+        return FakeResponse({"tasks": tasks, "cursor": 42, "horizon": 7})
+
+    monkeypatch.setattr(remote, "post_sync", post_sync)
+
+    assert push_dirty_tasks(config, "laptop") == 2
+
+    (payload,) = sent
+    assert [task["content"] for task in payload["tasks"]] == ["First", "Second"]
+    assert (payload["device_id"], payload["ack"]) == ("laptop", 5)
+
+    # Only the edit made during the push is left to send
+    assert [task.content for task, _ in db.get_dirty_tasks("alice", path)] == [
+        "Second, edited"
+    ]
+    assert db.get_task(first.id, path).content == "First"
+    assert db.get_task(99, path).content == "From the phone"
+    assert db.get_sync_state("alice", path) == ("laptop", 42)
+    conn = sqlite3.connect(path)
+    try:
+        assert conn.execute("SELECT horizon FROM sync_state").fetchone() == (7,)
+    finally:
+        conn.close()
+
+    assert push_dirty_tasks(config, "laptop") == 1
+    assert push_dirty_tasks(config, "laptop") == 0
+    assert len(sent) == 2
+
+
+class Stop(Exception):
+    pass
+
+
+class FakeTime:
+    """
+    A clock that sleep moves forward, making the edits scheduled up to then.
+    """
+
+    def __init__(self, path, edits, until):
+        self.path = path
+        self.now = 1000.0
+        self.edits = sorted(1000.0 + at for at in edits)
+        self.until = 1000.0 + until
+
+    def clock(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+        while self.edits and self.edits[0] <= self.now:
+            self.edits.pop(0)
+            db.create_task("Edit", "alice", self.path)
+        if self.now >= self.until:
+            raise Stop()
+
+
+def run(config, monkeypatch, edits, until, failures=0, **kwargs):
+    """
+    Run the daemon on a FakeTime, and return the (relative) times of its pushes.
+    """
+    fake = FakeTime(config["database_file"], edits, until)
+    pushes = []
+
+    def push(config, device_id):
+        pushes.append(fake.now - 1000.0)
+        if len(pushes) <= failures:
+            raise requests.ConnectionError()
+        return 1
+
+    monkeypatch.setattr(daemon, "push_dirty_tasks", push)
+    monkeypatch.setattr(daemon.random, "uniform", lambda low, high: high)
+    with pytest.raises(Stop):
+        run_daemon(config, poll_interval=0.5, clock=fake.clock, sleep=fake.sleep, **kwargs)
+    return pushes
+
+
+def test_daemon_pushes_a_burst_once_after_the_debounce(config, monkeypatch):
+    pushes = run(config, monkeypatch, edits=[10, 10.5, 11, 12.5], until=30, debounce=2)
+
+    # Once on startup, then once 2 s after the last edit of the burst
+    assert pushes == [0, 14.5]
+
+
+def test_daemon_pushes_continuous_edits_within_max_delay(config, monkeypatch):
+    edits = [10 + 0.5 * i for i in range(40)]
+    pushes = run(config, monkeypatch, edits, until=40, debounce=2, max_delay=5)
+
+    # Edits never stop for 2 s, so each push waits max_delay from the first
+    # edit after the last one (seen at the next poll)
+    assert pushes == [0, 15, 20.5, 26, 31.5]
+    for edit in edits:
+        assert min(push for push in pushes if push >= edit) <= edit + 5 + 0.5
+
+
+def test_daemon_backs_off_after_a_failed_push(config, monkeypatch):
+    pushes = run(config, monkeypatch, edits=[], until=10, failures=2, debounce=2)
+
+    # Retried after 1 s, then 2 s, then succeeds and waits for new edits
+    assert pushes == [0, 1, 3]
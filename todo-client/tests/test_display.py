@@ -0,0 +1,75 @@
+import io
+import json
+
+from todo_client.display import display_width, render_tasks
+from todo_common.task import Task
+
+
+def make_task(task_id, content="Task", **kwargs):
+    fields = {
+        "id": task_id,
+        "username": "alice",
+        "content": content,
+        "is_completed": False,
+        "is_deleted": False,
+        "due_date": None,
+        "created_at": "2025-11-01T09:00:00",
+        "updated_at": "2025-11-01T09:00:00",
+    }
+    fields.update(kwargs)
+    return Task(**fields)
+
+
+def test_render_ndjson_round_trips_tasks():
+    out = io.StringIO()
+    count = render_tasks(
+        [make_task(1), make_task(2, due_date="2025-12-01")], "ndjson", out=out
+    )
+
+    lines = out.getvalue().splitlines()
+    assert count == 2
+    assert json.loads(lines[1])["due_date"] == "2025-12-01"
+
+
+def test_render_tsv_escapes_tabs_and_newlines():
+    out = io.StringIO()
+    render_tasks([make_task(1, "a\tb\nc")], "tsv", out=out)
+
+    header, row = out.getvalue().splitlines()
+    assert header.split("\t")[0] == "ID"
+    assert row.split("\t")[1] == "a\\tb\\nc"
+
+
+def test_render_table_truncates_content_beyond_sample_width():
+    out = io.StringIO()
+    tasks = [make_task(1, "short"), make_task(2, "a much longer task description")]
+    render_tasks(tasks, "table", out=out, sample_size=1)
+
+    lines = out.getvalue().splitlines()
+    assert len({display_width(line) for line in lines}) == 1
+    assert "sho…" not in lines[3]
+    assert "…" in lines[4]
+
+
+def test_render_table_streams_after_sample():
+    consumed = []
+
+    def tasks():
+        for i in range(1, 1001):
+            consumed.append(i)
+            yield make_task(i)
+
+    class ClosedAfterFirstRow(io.StringIO):
+        # Behaves like a pipe whose reader exits after the header and one row
+        def write(self, s):
+            if self.getvalue().count("\n") >= 4:
+                raise BrokenPipeError
+            return super().write(s)
+
+    try:
+        render_tasks(tasks(), "table", out=ClosedAfterFirstRow(), sample_size=10)
+    except BrokenPipeError:
+        pass
+
+    # Only the sample was read from the source before output stopped
+    assert len(consumed) == 10
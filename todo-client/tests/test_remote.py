@@ -0,0 +1,61 @@
+from types import SimpleNamespace
+
+from todo_client import remote
+from todo_client.remote import post_sync, retry_delay
+
+
+def fake_post(statuses, calls):
+    def post(url, **kwargs):
+        calls.append((url, kwargs))
+        status, retry_after = statuses.pop(0)
+        headers = {"Retry-After": retry_after} if retry_after is not None else {}
+        return SimpleNamespace(status_code=status, headers=headers)
+
+    return post
+
+
+def test_retry_delay_honours_retry_after_with_jitter():
+    delays = [retry_delay("4", attempt=0) for _ in range(50)]
+    assert all(4 <= delay <= 6 for delay in delays)
+    assert len(set(delays)) > 1
+
+
+def test_retry_delay_backs_off_without_retry_after():
+    assert 1 <= retry_delay(None, attempt=0) <= 1.5
+    assert 8 <= retry_delay("Wed, 21 Oct 2026 07:28:00 GMT", attempt=3) <= 12
+
+
+def test_post_sync_retries_busy_responses(monkeypatch):
+    calls, sleeps = [], []
+    statuses = [(503, "2"), (429, "1"), (200, None)]
+    monkeypatch.setattr(remote.requests, "post", fake_post(statuses, calls))
+
+    response = post_sync(
+        "http://server",
+        "alice",
+        sleep=sleeps.append,
+        data="{}",
+        headers={"Content-Type": "application/json"},
+    )
+
+    assert response.status_code == 200
+    assert len(calls) == 3
+    url, kwargs = calls[0]
+    assert url == "http://server/sync"
+    assert kwargs["headers"] == {
+        "Content-Type": "application/json",
+        "X-Todo-Username": "alice",
+    }
+    assert 2 <= sleeps[0] <= 3 and 1 <= sleeps[1] <= 1.5
+
+
+def test_post_sync_gives_up_after_retries(monkeypatch):
+    calls, sleeps = [], []
+    statuses = [(503, "1")] * 3 + [(500, None)]
+    monkeypatch.setattr(remote.requests, "post", fake_post(statuses, calls))
+
+    response = post_sync("http://server", "alice", retries=2, sleep=sleeps.append)
+
+    assert response.status_code == 503
+    assert len(calls) == 3
+    assert len(sleeps) == 2
@@ -0,0 +1,122 @@
+import io
+
+import pytest
+import requests
+from todo_client.commands import COMMANDS
+from todo_client.parser import build_parser
+from todo_client.shell import parse_line, run_batch, run_command, run_shell
+from todo_common.db import get_task, get_tasks_for_user
+from todo_common.storage import open_storage
+
+
+@pytest.fixture
+def config(tmp_path):
+    return {"username": "alice", "database_file": str(tmp_path / "client.db")}
+
+
+def test_parse_line_splits_quoted_words():
+    args = parse_line(build_parser(), 'update 3 "Buy oat milk"  # renamed')
+
+    assert args.command == "update"
+    assert args.task_id == "3"
+    assert args.new_content == "Buy oat milk"
+
+
+def test_parse_line_skips_blank_lines_and_rejects_bad_commands():
+    parser = build_parser()
+
+    assert parse_line(parser, "   ") is None
+    assert parse_line(parser, "# just a comment") is None
+    with pytest.raises(ValueError, match="invalid choice"):
+        parse_line(parser, "frobnicate 1")
+
+
+def test_batch_runs_every_line_on_one_connection(config):
+    lines = io.StringIO(
+        "create 'Write report'\n"
+        "create 'Pay rent'\n"
+        "\n"
+        "complete 1\n"
+        "due 2 2025-12-01\n"
+        "update 2 'Pay the rent'\n"
+    )
+
+    failed = run_batch(config, build_parser(), lines)
+
+    tasks = get_tasks_for_user("alice", config["database_file"])
+    assert failed == 0
+    assert [t.content for t in tasks] == ["Write report", "Pay the rent"]
+    assert tasks[0].is_completed
+    assert tasks[1].due_date == "2025-12-01"
+
+
+def test_batch_reports_and_rolls_back_only_the_failed_line(config, capsys):
+    lines = [
+        "create 'First'\n",
+        "due 1 2025-13-45\n",
+        "sync\n",
+        "create 'Second'\n",
+    ]
+
+    failed = run_batch(config, build_parser(), lines)
+
+    err = capsys.readouterr().err
+    assert failed == 2
+    assert "line 2: command failed" in err
+    assert "line 3: 'sync' can't be used in a batch" in err
+    tasks = get_tasks_for_user("alice", config["database_file"])
+    assert [t.content for t in tasks] == ["First", "Second"]
+    assert tasks[0].due_date is None
+
+
+def test_run_command_reports_expected_errors_and_raises_bugs(config, monkeypatch, capsys):
+    def offline(config, args):
+        raise requests.ConnectionError("server unreachable")
+
+    def bug(config, args):
+        raise KeyError("oops")
+
+    args = build_parser().parse_args(["sync"])
+    monkeypatch.setitem(COMMANDS, "sync", offline)
+    assert run_command(config, args) is False
+    assert "Error: server unreachable" in capsys.readouterr().out
+
+    monkeypatch.setitem(COMMANDS, "sync", bug)
+    with pytest.raises(KeyError):
+        run_command(config, args)
+
+
+def test_batch_stop_on_error_rolls_back_the_whole_batch(config):
+    lines = ["create 'Dropped'\n", "complete 1\n", "complete\n", "create 'Never'\n"]
+
+    failed = run_batch(config, build_parser(), lines, stop_on_error=True)
+
+    assert failed == 1
+    assert get_tasks_for_user("alice", config["database_file"]) == []
+    assert get_task(1, config["database_file"]) is None
+
+
+def test_batch_commits_each_batch(config):
+    lines = [f"create 'Task {i}'\n" for i in range(5)] + ["complete\n"]
+
+    run_batch(config, build_parser(), lines, batch_size=2, stop_on_error=True)
+
+    # The failing line rolls back its own batch (task 4), not the committed ones
+    tasks = get_tasks_for_user("alice", config["database_file"])
+    assert [t.content for t in tasks] == ["Task 0", "Task 1", "Task 2", "Task 3"]
+
+
+def test_shell_keeps_memory_storage_for_the_session(tmp_path, monkeypatch, capsys):
+    config = {
+        "username": "alice",
+        "database_file": str(tmp_path / "never-created.db"),
+        "storage_backend": "memory",
+    }
+    lines = iter(["create 'Write report'", "complete 1", "list --format plain", "exit"])
+    monkeypatch.setattr("builtins.input", lambda prompt: next(lines))
+
+    run_shell(config, build_parser())
+
+    assert "Write report" in capsys.readouterr().out
+    assert open_storage(config, "todo_client.db").get_task(1).is_completed
+    assert not (tmp_path / "never-created.db").exists()
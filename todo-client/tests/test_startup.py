@@ -0,0 +1,152 @@
+"""
+Startup regression tests for todo-client.
+
+Every CLI invocation is a fresh process, so import time is paid on every call.
+These tests make sure the entry module and the local commands don't import the
+heavy modules they don't need. benchmarks/client_startup.py reports import times
+in more detail.
+
+Wall-clock timing is too noisy to fail CI on, so the import time budget is only
+checked when TODO_CLIENT_STARTUP_BUDGET_MS (in milliseconds) is set.
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+
+import pytest
+
+STARTUP_BUDGET_MS = float(os.environ.get("TODO_CLIENT_STARTUP_BUDGET_MS", "0"))
+
+# Only sync and the commands that talk to the server need requests
+HEAVY_MODULES = ("requests",)
+
+# Client modules that only some commands import, when they run
+LAZY_MODULES = (
+    "todo_client.daemon",
+    "todo_client.display",
+    "todo_client.remote",
+    "todo_client.shell",
+    "todo_client.watch",
+)
+
+# Local commands, with arguments that work against an empty database. "shell"
+# reads an empty stdin and exits; "watch" and "daemon" run until interrupted and
+# need the server, so only their argument parsing is checked.
+LIGHT_COMMANDS = {
+    "create": ["create", "Startup task"],
+    "complete": ["complete", "1"],
+    "uncomplete": ["uncomplete", "1"],
+    "update": ["update", "1", "Updated startup task"],
+    "due": ["due", "1", "2025-12-01"],
+    "undue": ["undue", "1"],
+    "delete": ["delete", "1"],
+    "list": ["list"],
+    "search": ["search", "startup"],
+    "shell": ["shell"],
+    "watch": ["watch", "--help"],
+    "daemon": ["daemon", "--help"],
+}
+
+
+def import_times(args, config_path):
+    """
+    Run one todo-client command with -X importtime.
+
+    Returns:
+        The cumulative microseconds of todo-client's own imports, and the set of
+        imported top-level module names.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-m", "todo_client.main"]
+        + ["--config", config_path, *args],
+        input="",
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    # Interpreter startup happens before runpy is imported, so every top-level
+    # import after it is todo-client's
+    app_us = 0
+    seen_runpy = False
+    modules = set()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:") :].split("|")
+        modules.add(name.strip().split(".")[0])
+        if seen_runpy and not name[1:].startswith(" "):
+            app_us += int(cumulative_us)
+        if name.strip() == "runpy":
+            seen_runpy = True
+    return app_us, modules
+
+
+@pytest.fixture(scope="module")
+def config_path():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "config.ini")
+        with open(path, "w") as f:
+            f.write("username=startup_user\n")
+            f.write(f"database_file={os.path.join(tmp, 'startup.db')}\n")
+        yield path
+
+
+def test_entry_module_imports_nothing_heavy():
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import sys, todo_client.main; print('\\n'.join(sys.modules))",
+        ],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    modules = set(result.stdout.split())
+
+    for module in HEAVY_MODULES + LAZY_MODULES:
+        assert module not in modules, f"importing todo_client.main imported {module}"
+
+
+def test_shell_does_not_load_the_entry_module_twice(config_path):
+    # Run as __main__, todo_client.main must not be imported again under its own
+    # name, which would duplicate its module-level state
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-m", "todo_client.main"]
+        + ["--config", config_path, "shell"],
+        input="",
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    imported = {line.split("|")[-1].strip() for line in result.stderr.splitlines()}
+
+    assert "todo_client.shell" in imported
+    assert "todo_client.main" not in imported
+
+
+@pytest.mark.parametrize("command", LIGHT_COMMANDS)
+def test_light_commands_skip_heavy_imports(config_path, command):
+    _, modules = import_times(LIGHT_COMMANDS[command], config_path)
+
+    for heavy in HEAVY_MODULES:
+        assert heavy not in modules, f"'{command}' imported {heavy}"
+
+
+@pytest.mark.skipif(
+    STARTUP_BUDGET_MS <= 0, reason="set TODO_CLIENT_STARTUP_BUDGET_MS to check"
+)
+@pytest.mark.parametrize("command", LIGHT_COMMANDS)
+def test_light_commands_import_within_budget(config_path, command):
+    # Take the best of a few runs to keep scheduler noise out of the result
+    import_ms = min(
+        import_times(LIGHT_COMMANDS[command], config_path)[0] / 1000 for _ in range(3)
+    )
+
+    assert import_ms <= STARTUP_BUDGET_MS, (
+        f"'{command}' spent {import_ms:.1f} ms importing modules "
+        f"(budget {STARTUP_BUDGET_MS} ms)"
+    )
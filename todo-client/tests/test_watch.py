@@ -0,0 +1,36 @@
+from todo_client.parser import build_parser
+from todo_client.watch import iter_events
+
+
+def test_iter_events_parses_server_sent_events():
+    lines = [
+        "retry: 15000",
+        "id: abc-0",
+        "event: ready",
+        'data: {"username": "alice"}',
+        "",
+        ": keepalive",
+        "",
+        "id: abc-1",
+        "event: changed",
+        "data: first",
+        "data:second",
+        "",
+    ]
+
+    events = list(iter_events(lines))
+
+    assert events == [
+        {"event": "ready", "data": '{"username": "alice"}', "id": "abc-0"},
+        {"event": "changed", "data": "first\nsecond", "id": "abc-1"},
+    ]
+
+
+def test_iter_events_defaults_to_message_and_drops_unfinished_event():
+    events = list(iter_events(["data: hello", "", "event: changed", "data: cut off"]))
+
+    assert events == [{"event": "message", "data": "hello", "id": None}]
+
+
+def test_watch_command_is_registered():
+    assert build_parser().parse_args(["watch"]).command == "watch"
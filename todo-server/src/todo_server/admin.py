@@ -0,0 +1,265 @@
+"""
+Administration commands for the server database.
+
+These run outside the web server, against the database named in the server
+config (TODO_SERVER_CONFIG_PATH or --config), e.g.:
+
+    todo-server-admin export --output tasks.ndjson
+    todo-server-admin import seed.csv --on-conflict newer
+    todo-server-admin backup
+    todo-server-admin restore backups/todo_server-20250101-090000.db
+    todo-server-admin devices --username alice
+    todo-server-admin gc
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+
+from todo_common.bulk import export_tasks, guess_format, import_tasks, read_records
+from todo_common.config import load_config
+
+from todo_server.backup import list_snapshots, restore_database, snapshot_database
+from todo_server.devices import collect_tombstones, list_devices
+
+
+def get_config(config_path: str | None) -> dict:
+    config_path = config_path or os.environ.get("TODO_SERVER_CONFIG_PATH", None)
+    return load_config("server", config_path=config_path)
+
+
+def handle_export(database_file, output, fmt, username):
+    fmt = fmt or (guess_format(output) if output else "ndjson")
+
+    if output in (None, "-"):
+        try:
+            export_tasks(database_file, sys.stdout, fmt=fmt, username=username)
+            sys.stdout.flush()
+        except BrokenPipeError:
+            # The reader went away (e.g. piped to `head`); exit quietly
+            devnull = os.open(os.devnull, os.O_WRONLY)
+            os.dup2(devnull, sys.stdout.fileno())
+            sys.exit(1)
+        return
+
+    with open(output, "w", encoding="utf-8", newline="") as f:
+        count = export_tasks(database_file, f, fmt=fmt, username=username)
+    print(f"Exported {count} tasks to {output}.")
+
+
+def handle_import(
+    database_file, input_path, fmt, on_conflict, batch_size, defer_index
+):
+    fmt = fmt or guess_format(input_path)
+
+    try:
+        if input_path == "-":
+            result = import_tasks(
+                database_file,
+                read_records(sys.stdin, fmt),
+                on_conflict=on_conflict,
+                batch_size=batch_size,
+                defer_search_index=defer_index,
+            )
+        else:
+            with open(input_path, encoding="utf-8", newline="") as f:
+                result = import_tasks(
+                    database_file,
+                    read_records(f, fmt),
+                    on_conflict=on_conflict,
+                    batch_size=batch_size,
+                    defer_search_index=defer_index,
+                )
+    except (OSError, ValueError, sqlite3.IntegrityError) as e:
+        print(f"Error: import failed: {e}")
+        sys.exit(1)
+
+    skipped = result["read"] - result["written"]
+    print(f"Imported {result['written']} tasks ({skipped} left unchanged).")
+
+
+def handle_backup(database_file, config, backup_dir, keep):
+    backup_dir = backup_dir or config.get("backup_dir", "backups")
+    keep = keep if keep is not None else int(config.get("backup_keep", 7))
+
+    try:
+        path = snapshot_database(
+            database_file,
+            backup_dir,
+            keep=keep,
+            pages=int(config.get("backup_pages_per_step", 256)),
+            step_sleep=float(config.get("backup_step_sleep_seconds", 0.01)),
+        )
+    except (OSError, sqlite3.Error) as e:
+        print(f"Error: backup failed: {e}")
+        sys.exit(1)
+    print(f"Backed up {database_file} to {path}.")
+
+
+def handle_list_backups(database_file, config, backup_dir):
+    backup_dir = backup_dir or config.get("backup_dir", "backups")
+    snapshots = list_snapshots(database_file, backup_dir)
+    if not snapshots:
+        print(f"No snapshots in {backup_dir}.")
+    for path in snapshots:
+        print(f"{path}  ({path.stat().st_size} bytes)")
+
+
+def handle_restore(database_file, snapshot):
+    try:
+        restore_database(snapshot, database_file)
+    except (OSError, ValueError, sqlite3.Error) as e:
+        print(f"Error: restore failed: {e}")
+        sys.exit(1)
+    print(f"Restored {database_file} from {snapshot}.")
+
+
+def handle_devices(database_file, username):
+    devices = list_devices(database_file, username)
+    if not devices:
+        print("No registered devices.")
+    for device in devices:
+        print(
+            f"{device['username']}  {device['device_id']}  acked {device['acked_seq']}  "
+            f"last seen {device['last_seen_at']}"
+        )
+
+
+def handle_gc(database_file, config, expiry_days):
+    if expiry_days is None:
+        expiry_days = float(config.get("device_expiry_days", 30))
+
+    try:
+        # Until nothing is left, unlike the server's bounded passes
+        collected = collect_tombstones(
+            database_file,
+            expiry_days=expiry_days,
+            batch_size=int(config.get("tombstone_gc_batch_size", 500)),
+        )
+    except sqlite3.Error as e:
+        print(f"Error: tombstone GC failed: {e}")
+        sys.exit(1)
+    print(
+        f"Expired {collected['expired']} devices and purged "
+        f"{collected['purged']} tombstones."
+    )
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Todo Server administration")
+    parser.add_argument(
+        "--config", type=str, default=None, help="Path to server config file"
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    # Create subparser for the "export" command
+    export_parser = subparsers.add_parser("export", help="Export tasks")
+    export_parser.add_argument(
+        "--output", "-o", default=None, help="File to write to (default: stdout)"
+    )
+    export_parser.add_argument("--format", choices=("ndjson", "csv"), default=None)
+    export_parser.add_argument(
+        "--username", default=None, help="Only export this user's tasks"
+    )
+
+    # Create subparser for the "import" command
+    import_parser = subparsers.add_parser("import", help="Import tasks")
+    import_parser.add_argument("input", help="File to read from ('-' for stdin)")
+    import_parser.add_argument("--format", choices=("ndjson", "csv"), default=None)
+    import_parser.add_argument(
+        "--on-conflict",
+        choices=("skip", "replace", "newer", "fail", "new-ids"),
+        default="skip",
+        help="What to do with tasks whose ID already exists (default: skip).",
+    )
+    import_parser.add_argument(
+        "--batch-size", type=int, default=10000, help="Tasks per transaction"
+    )
+    import_parser.add_argument(
+        "--defer-search-index",
+        action="store_true",
+        help="Rebuild the search index once at the end (faster for large imports).",
+    )
+
+    # Create subparser for the "backup" command
+    backup_parser = subparsers.add_parser(
+        "backup", help="Take a snapshot of the database (safe while the server runs)"
+    )
+    backup_parser.add_argument(
+        "--backup-dir", default=None, help="Directory for snapshots (default: backup_dir)"
+    )
+    backup_parser.add_argument(
+        "--keep", type=int, default=None, help="Snapshots to keep (default: backup_keep)"
+    )
+
+    # Create subparser for the "backups" command
+    backups_parser = subparsers.add_parser("backups", help="List snapshots")
+    backups_parser.add_argument(
+        "--backup-dir", default=None, help="Directory for snapshots (default: backup_dir)"
+    )
+
+    # Create subparser for the "restore" command
+    restore_parser = subparsers.add_parser(
+        "restore", help="Replace the database with a snapshot"
+    )
+    restore_parser.add_argument("snapshot", help="Snapshot file to restore")
+
+    # Create subparser for the "devices" command
+    devices_parser = subparsers.add_parser(
+        "devices", help="List the devices that sync, and how far each has acknowledged"
+    )
+    devices_parser.add_argument(
+        "--username", default=None, help="Only list this user's devices"
+    )
+
+    # Create subparser for the "gc" command
+    gc_parser = subparsers.add_parser(
+        "gc", help="Expire idle devices and purge tombstones every device has acknowledged"
+    )
+    gc_parser.add_argument(
+        "--expiry-days",
+        type=float,
+        default=None,
+        help="Drop devices idle this long (default: device_expiry_days)",
+    )
+
+    return parser
+
+
+def main():
+    args = build_parser().parse_args()
+    config = get_config(args.config)
+    database_file = config.get("database_file", "todo_server.db")
+
+    if args.command == "export":
+        handle_export(database_file, args.output, args.format, args.username)
+
+    if args.command == "import":
+        handle_import(
+            database_file,
+            args.input,
+            args.format,
+            args.on_conflict,
+            args.batch_size,
+            args.defer_search_index,
+        )
+
+    if args.command == "backup":
+        handle_backup(database_file, config, args.backup_dir, args.keep)
+
+    if args.command == "backups":
+        handle_list_backups(database_file, config, args.backup_dir)
+
+    if args.command == "restore":
+        handle_restore(database_file, args.snapshot)
+
+    if args.command == "devices":
+        handle_devices(database_file, args.username)
+
+    if args.command == "gc":
+        handle_gc(database_file, config, args.expiry_days)
+
+
+if __name__ == "__main__":
+    main()
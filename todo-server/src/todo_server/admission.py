@@ -0,0 +1,227 @@
+"""
+Admission control for sync requests.
+
+Without it, a burst of syncs is accepted all at once, queued in the threadpool
+behind SQLite's single writer, and times out together. AdmissionController lets
+at most `max_concurrent` syncs run and up to `max_queue` more wait, for at most
+`queue_timeout` seconds each. Anything beyond that is turned away straight
+away with 503 and a Retry-After estimated from the queue length and recent
+sync times, which the client honours before retrying.
+
+Clients identify their user in an `X-Todo-Username` header. With it, waiting
+syncs are admitted round-robin between users, so one user's burst can't starve
+everyone else, and `max_per_user` (if set) caps how many syncs a user can have
+running or waiting, with 429 for the rest. Requests without the header share
+one queue.
+
+The state lives on the event loop, so limits are per worker process.
+"""
+
+import asyncio
+import json
+import math
+import time
+from collections import OrderedDict, deque
+
+from todo_server.metrics import (
+    ADMISSION_ACTIVE,
+    ADMISSION_QUEUED,
+    ADMISSION_REJECTED,
+    ADMISSION_WAIT_SECONDS,
+)
+
+# Rejection reasons, as used in the todo_admission_rejected_total metric
+REJECT_REASONS = ("user_limit", "queue_full", "timeout")
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        max_concurrent: int,
+        max_queue: int = 100,
+        queue_timeout: float = 5.0,
+        max_per_user: int = 0,
+    ):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.max_per_user = max_per_user
+
+        self.active = 0
+        self.queued = 0
+        # user -> syncs running or waiting
+        self._in_flight = {}
+        # user -> waiting futures, in round-robin order of users
+        self._queues = OrderedDict()
+        # Moving average of how long an admitted sync takes, for Retry-After
+        self.average_seconds = None
+        self._update_gauges()
+
+    async def acquire(self, user: str | None) -> str | None:
+        """
+        Wait for a slot for one of user's syncs.
+
+        Returns:
+            None once admitted (call release afterwards), or the reason it was
+            rejected, one of REJECT_REASONS.
+        """
+        if (
+            self.max_per_user
+            and user is not None
+            and self._in_flight.get(user, 0) >= self.max_per_user
+        ):
+            return "user_limit"
+
+        if self.active < self.max_concurrent and not self.queued:
+            self._admit(user)
+            return None
+
+        if self.queued >= self.max_queue:
+            return "queue_full"
+
+        future = asyncio.get_running_loop().create_future()
+        self._queues.setdefault(user, deque()).append(future)
+        self.queued += 1
+        self._in_flight[user] = self._in_flight.get(user, 0) + 1
+        self._update_gauges()
+
+        try:
+            await asyncio.wait_for(future, self.queue_timeout)
+            return None
+        except TimeoutError:
+            self._abandon(user, future)
+            return "timeout"
+        except asyncio.CancelledError:
+            self._abandon(user, future)
+            raise
+
+    def release(self, user: str | None, seconds: float | None = None) -> None:
+        """
+        Free the slot of a finished sync and hand it to the next waiting one.
+        """
+        if seconds is not None:
+            if self.average_seconds is None:
+                self.average_seconds = seconds
+            else:
+                self.average_seconds = 0.9 * self.average_seconds + 0.1 * seconds
+
+        self.active -= 1
+        self._done(user)
+
+        while self.active < self.max_concurrent and self._queues:
+            # Take the first user in line, then move them to the back
+            next_user, queue = next(iter(self._queues.items()))
+            future = queue.popleft()
+            if queue:
+                self._queues.move_to_end(next_user)
+            else:
+                del self._queues[next_user]
+            self.queued -= 1
+            if future.done():
+                # Its waiter was cancelled but hasn't run _abandon yet, and
+                # won't find the future in the queue: the slot goes to the next one
+                self._done(next_user)
+                continue
+            self.active += 1
+            future.set_result(None)
+
+        self._update_gauges()
+
+    def retry_after(self) -> int:
+        """
+        Seconds until a rejected client can expect to get in.
+        """
+        backlog = (self.active + self.queued) / max(self.max_concurrent, 1)
+        return max(1, math.ceil(backlog * (self.average_seconds or 0.1)))
+
+    def _admit(self, user: str | None) -> None:
+        self.active += 1
+        self._in_flight[user] = self._in_flight.get(user, 0) + 1
+        self._update_gauges()
+
+    def _done(self, user: str | None) -> None:
+        count = self._in_flight.get(user, 0) - 1
+        if count > 0:
+            self._in_flight[user] = count
+        else:
+            self._in_flight.pop(user, None)
+
+    def _abandon(self, user: str | None, future: asyncio.Future) -> None:
+        # Called when a waiter gives up; it may have been admitted just before
+        if future.done() and not future.cancelled():
+            self.release(user)
+            return
+
+        queue = self._queues.get(user)
+        if queue is not None and future in queue:
+            queue.remove(future)
+            if not queue:
+                del self._queues[user]
+            self.queued -= 1
+            self._done(user)
+        self._update_gauges()
+
+    def _update_gauges(self) -> None:
+        ADMISSION_ACTIVE.set(self.active)
+        ADMISSION_QUEUED.set(self.queued)
+
+
+class AdmissionMiddleware:
+    """
+    Apply an AdmissionController to requests whose path is /sync or below it.
+    """
+
+    def __init__(self, app, controller: AdmissionController, path: str = "/sync"):
+        self.app = app
+        self.controller = controller
+        self.path = path
+
+    async def __call__(self, scope, receive, send):
+        path = scope.get("path", "")
+        if scope["type"] != "http" or not (
+            path == self.path or path.startswith(self.path + "/")
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        user = None
+        for key, value in scope["headers"]:
+            if key == b"x-todo-username":
+                user = value.decode("utf-8", "replace")
+                break
+
+        waited = time.perf_counter()
+        rejected = await self.controller.acquire(user)
+        if rejected is not None:
+            ADMISSION_REJECTED.inc(reason=rejected)
+            await self.reject(send, rejected)
+            return
+        ADMISSION_WAIT_SECONDS.observe(time.perf_counter() - waited)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(user, time.perf_counter() - start)
+
+    async def reject(self, send, reason: str) -> None:
+        if reason == "user_limit":
+            status = 429
+            message = "Too many syncs in progress for this user"
+        else:
+            status = 503
+            message = "Server is busy, try again later"
+
+        body = json.dumps({"error": message}).encode()
+        await send(
+            {
+                "type": "http.response.start",
+                "status": status,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                    (b"retry-after", str(self.controller.retry_after()).encode()),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
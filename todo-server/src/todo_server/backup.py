@@ -0,0 +1,201 @@
+"""
+Online backups of the server database with SQLite's backup API.
+
+A backup copies the database a few pages at a time, sleeping between steps.
+Each step holds a read lock only while it copies its pages, so syncs keep
+writing in between and never wait longer than one step.
+
+If another connection writes to the database between two steps, SQLite starts
+the copy again from the first page (the backup has its own connection, so
+every sync committed through the server's writer connection counts, and under
+load this is the normal case). After max_restarts such
+restarts, the rest is copied in one step, which always finishes.
+
+The copy is written next to the target and moved into place only once it is
+complete, so a snapshot file is never torn.
+"""
+
+import logging
+import os
+import sqlite3
+import time
+from datetime import datetime
+from pathlib import Path
+
+from todo_common.db import get_conn, init_db
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_SUFFIX = ".db"
+
+
+class _Restarted(Exception):
+    """Raised from the progress callback to stop a paced copy that keeps restarting."""
+
+
+def backup_database(
+    DB_PATH: str,
+    target: str,
+    pages: int = 256,
+    step_sleep: float = 0.01,
+    max_restarts: int = 3,
+) -> dict:
+    """
+    Copy the database to target without blocking writers for more than one step.
+
+    Args:
+        DB_PATH: path to the SQLite database file to back up
+        target: path of the copy; an existing file is replaced once the copy is complete
+        pages: pages copied per step (-1 or 0 copies everything in one step)
+        step_sleep: seconds to sleep between steps, letting writers in
+        max_restarts: restarts caused by concurrent writes before copying the rest in one step
+
+    Returns:
+        A dict with the number of "pages" copied, the "steps" taken, the number of
+        "restarts" and the elapsed "seconds".
+    """
+    partial = f"{target}.partial"
+    stats = {"pages": 0, "steps": 0, "restarts": 0, "seconds": 0.0}
+    remaining_before = None
+
+    def progress(status, remaining, total):
+        nonlocal remaining_before
+        stats["steps"] += 1
+        stats["pages"] = total
+        if remaining == 0:
+            return
+        # A step that leaves as much to do as the last one started over
+        if remaining_before is not None and remaining >= remaining_before:
+            stats["restarts"] += 1
+            if stats["restarts"] > max_restarts:
+                raise _Restarted()
+        remaining_before = remaining
+        time.sleep(step_sleep)
+
+    start = time.perf_counter()
+    src = get_conn(DB_PATH)
+    dst = sqlite3.connect(partial)
+    try:
+        try:
+            src.backup(dst, pages=pages if pages > 0 else -1, progress=progress)
+        except _Restarted:
+            logger.info(
+                "Backup of %s restarted %d times; copying the rest in one step.",
+                DB_PATH, stats["restarts"] - 1,
+            )
+            src.backup(dst, pages=-1)
+            stats["steps"] += 1
+    except BaseException:
+        dst.close()
+        os.remove(partial)
+        raise
+    finally:
+        src.close()
+    dst.close()
+
+    os.replace(partial, target)
+    stats["seconds"] = time.perf_counter() - start
+    return stats
+
+
+def snapshot_name(DB_PATH: str, when: datetime | None = None) -> str:
+    """
+    Return the file name of a snapshot of DB_PATH, e.g. todo_server-20250101-090000.db.
+    """
+    when = when or datetime.now()
+    return f"{Path(DB_PATH).stem}-{when.strftime('%Y%m%d-%H%M%S')}{SNAPSHOT_SUFFIX}"
+
+
+def list_snapshots(DB_PATH: str, backup_dir: str) -> list[Path]:
+    """
+    Return the snapshots of DB_PATH in backup_dir, oldest first.
+    """
+    directory = Path(backup_dir)
+    if not directory.is_dir():
+        return []
+    # The timestamp in the name sorts in time order
+    return sorted(directory.glob(f"{Path(DB_PATH).stem}-*{SNAPSHOT_SUFFIX}"))
+
+
+def rotate_snapshots(DB_PATH: str, backup_dir: str, keep: int) -> list[Path]:
+    """
+    Delete all but the newest keep snapshots of DB_PATH in backup_dir.
+
+    Returns:
+        The deleted snapshot paths.
+    """
+    snapshots = list_snapshots(DB_PATH, backup_dir)
+    removed = snapshots[: max(len(snapshots) - keep, 0)]
+    for path in removed:
+        path.unlink()
+    return removed
+
+
+def snapshot_database(
+    DB_PATH: str, backup_dir: str, keep: int = 7, **backup_options
+) -> Path:
+    """
+    Back up the database into a new timestamped file in backup_dir, then rotate.
+
+    Args:
+        DB_PATH: path to the SQLite database file to back up
+        backup_dir: directory for snapshots, created if missing
+        keep: number of snapshots to keep (0 keeps them all)
+        **backup_options: passed on to backup_database (pages, step_sleep, max_restarts)
+
+    Returns:
+        The path of the new snapshot.
+    """
+    os.makedirs(backup_dir, exist_ok=True)
+    target = Path(backup_dir) / snapshot_name(DB_PATH)
+    stats = backup_database(DB_PATH, str(target), **backup_options)
+    logger.info(
+        "Backed up %s to %s (%d pages, %d steps, %d restarts) in %.2fs.",
+        DB_PATH, target, stats["pages"], stats["steps"], stats["restarts"], stats["seconds"],
+    )
+
+    if keep > 0:
+        for path in rotate_snapshots(DB_PATH, backup_dir, keep):
+            logger.info("Removed old snapshot %s.", path)
+    return target
+
+
+def check_database(DB_PATH: str) -> str:
+    """
+    Run SQLite's integrity check on a database file and return its result ("ok" if sound).
+    """
+    conn = sqlite3.connect(f"file:{DB_PATH}?mode=ro", uri=True)
+    try:
+        rows = conn.execute("PRAGMA integrity_check;").fetchall()
+    finally:
+        conn.close()
+    return "\n".join(row[0] for row in rows)
+
+
+def restore_database(snapshot: str, DB_PATH: str) -> None:
+    """
+    Replace the contents of the database with a snapshot.
+
+    The snapshot is checked first, then copied in with the backup API in one
+    step, so connections to DB_PATH see either the old or the restored data,
+    never a mix. Snapshots from an older schema are migrated afterwards.
+
+    Raises:
+        FileNotFoundError if the snapshot doesn't exist, and ValueError if it
+        fails the integrity check.
+    """
+    if not os.path.isfile(snapshot):
+        raise FileNotFoundError(f"No such snapshot: {snapshot}")
+    result = check_database(snapshot)
+    if result != "ok":
+        raise ValueError(f"Snapshot {snapshot} failed the integrity check: {result}")
+
+    src = sqlite3.connect(f"file:{snapshot}?mode=ro", uri=True)
+    dst = get_conn(DB_PATH)
+    try:
+        src.backup(dst)
+    finally:
+        src.close()
+        dst.close()
+
+    init_db(DB_PATH)
@@ -0,0 +1,212 @@
+"""
+Per-device sync registry and tombstone garbage collection.
+
+A deleted task stays in the tasks table as a tombstone (is_deleted = 1) so
+that every device learns about the deletion. Without knowing which devices have
+synced since, the server had to keep tombstones forever, and send them in every
+/sync response.
+
+Clients now send a device_id and an `ack`: the cursor of the last /sync response
+they applied, which is the server's change_seq when it answered (see
+todo_common.db.get_tasks_changed_since). record_device keeps the latest ack of
+each of a user's devices. Once every registered device of a user has
+acknowledged a tombstone (it was stored at or before every device's ack), no
+device can still hold the task undeleted, and purge_tombstones deletes it, in
+batches. Acks count arrival, not updated_hlc, so a deletion made offline long
+ago is only purged once every device has received it.
+
+Each purge raises the user's purge horizon (purge_horizons): purged_seq to the
+newest change_seq purged, and purged_hlc to the newest updated_hlc. Syncing
+never brings back a task the server doesn't have if that version is at or below
+purged_hlc (see todo_common.db.sync_decision), so a device that sends a purged
+tombstone, or an old copy of its task, doesn't undo the purge.
+
+Devices that haven't synced for device_expiry_days are dropped from the
+registry, so that one lost phone can't hold up collection forever. When such a
+device comes back, its ack is below purged_seq: the server then sends it every
+task (ignoring `since`) with `"resync": true`, and the client replaces its
+tasks with the server's. Edits it made before the horizon and never synced are
+lost, which is the price of expiry.
+"""
+
+from datetime import datetime, timedelta
+
+from todo_common.db import connect, get_conn, init_db
+from todo_common.retention import incremental_vacuum
+
+
+def now_timestamp() -> str:
+    return datetime.now().isoformat(timespec="seconds")
+
+
+def record_device(DB_PATH: str, username: str, device_id: str, acked_seq: int | None) -> None:
+    """
+    Register a device's sync, with the cursor of the last response it applied.
+
+    The ack is stored as sent, even if it is lower than before (e.g. a device
+    restored from an old backup), since that is what the device now holds.
+
+    Args:
+        DB_PATH: path to the server database
+        username: the user syncing
+        device_id: the device's ID, as sent in the /sync payload
+        acked_seq: the device's ack (None or 0 if it has applied nothing yet)
+    """
+    now = now_timestamp()
+    with connect(DB_PATH) as conn:
+        conn.execute(
+            """
+            INSERT INTO devices (username, device_id, acked_seq, first_seen_at, last_seen_at)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (username, device_id) DO UPDATE
+            SET acked_seq = excluded.acked_seq, last_seen_at = excluded.last_seen_at
+            """,
+            (username, device_id, acked_seq or 0, now, now),
+        )
+
+
+def needs_resync(DB_PATH: str, username: str, acked_seq: int | None) -> tuple[bool, int]:
+    """
+    Tell whether a device must replace its tasks with the server's, because
+    tombstones were purged after the last response it applied. A device that
+    has applied none (acked_seq None) gets every task anyway.
+
+    Returns:
+        Whether it must, and the user's purged_seq.
+    """
+    with connect(DB_PATH) as conn:
+        row = conn.execute(
+            "SELECT purged_seq FROM purge_horizons WHERE username = ?", (username,)
+        ).fetchone()
+    purged_seq = row[0] if row else 0
+    return acked_seq is not None and acked_seq < purged_seq, purged_seq
+
+
+def list_devices(DB_PATH: str, username: str | None = None) -> list[dict]:
+    """
+    Return the registered devices, of one user or of all, most recently seen first.
+    """
+    with connect(DB_PATH) as conn:
+        cur = conn.cursor()
+        query = """
+            SELECT username, device_id, acked_seq, first_seen_at, last_seen_at
+            FROM devices
+        """
+        params = ()
+        if username is not None:
+            query += " WHERE username = ?"
+            params = (username,)
+        cur.execute(query + " ORDER BY last_seen_at DESC, username, device_id", params)
+        columns = [column[0] for column in cur.description]
+        return [dict(zip(columns, row)) for row in cur.fetchall()]
+
+
+def expire_devices(DB_PATH: str, expiry_days: float) -> int:
+    """
+    Drop devices that haven't synced for expiry_days, and return how many.
+    """
+    cutoff = (datetime.now() - timedelta(days=expiry_days)).isoformat(timespec="seconds")
+    with connect(DB_PATH) as conn:
+        cur = conn.execute("DELETE FROM devices WHERE last_seen_at < ?", (cutoff,))
+        return cur.rowcount
+
+
+def purge_tombstones(
+    DB_PATH: str,
+    batch_size: int = 500,
+    max_batches: int | None = None,
+    vacuum: bool = True,
+) -> int:
+    """
+    Delete tombstones that every registered device of their user has
+    acknowledged, in batches. Users without registered devices keep theirs.
+
+    Each batch is its own short write transaction, which also raises the purge
+    horizon of the batch's users, so concurrent syncs interleave with the purge
+    and never see a tombstone gone without the horizon that guards it.
+
+    Args:
+        DB_PATH: path to the server database
+        batch_size: tombstones deleted per transaction
+        max_batches: stop after this many batches (None means until none are left)
+        vacuum: if True, return the freed pages to the filesystem afterwards
+
+    Returns:
+        The number of tombstones purged.
+    """
+    init_db(DB_PATH)
+    conn = get_conn(DB_PATH)
+    cur = conn.cursor()
+
+    purged = 0
+    batches = 0
+    try:
+        while max_batches is None or batches < max_batches:
+            # Select and delete in one transaction, so a sync can't undelete a task in between
+            cur.execute("BEGIN IMMEDIATE;")
+            cur.execute(
+                """
+                SELECT t.id, t.username, t.change_seq, t.updated_hlc
+                FROM (
+                    SELECT username, MIN(acked_seq) AS safe_seq
+                    FROM devices
+                    GROUP BY username
+                ) AS d
+                JOIN tasks AS t
+                    ON t.username = d.username AND t.change_seq <= d.safe_seq
+                WHERE t.is_deleted = 1
+                LIMIT ?
+                """,
+                (batch_size,),
+            )
+            rows = cur.fetchall()
+            if not rows:
+                conn.rollback()
+                break
+
+            horizons = {}
+            for _, username, change_seq, updated_hlc in rows:
+                purged_seq, purged_hlc = horizons.get(username, (0, 0))
+                horizons[username] = (max(purged_seq, change_seq), max(purged_hlc, updated_hlc))
+            cur.executemany(
+                """
+                INSERT INTO purge_horizons (username, purged_seq, purged_hlc) VALUES (?, ?, ?)
+                ON CONFLICT (username) DO UPDATE
+                SET purged_seq = MAX(purged_seq, excluded.purged_seq),
+                    purged_hlc = MAX(purged_hlc, excluded.purged_hlc)
+                """,
+                [(username, *horizon) for username, horizon in horizons.items()],
+            )
+            placeholders = ", ".join("?" for _ in rows)
+            cur.execute(
+                f"DELETE FROM tasks WHERE id IN ({placeholders})", [row[0] for row in rows]
+            )
+            conn.commit()
+
+            purged += len(rows)
+            batches += 1
+
+        if vacuum and purged:
+            incremental_vacuum(conn)
+    finally:
+        conn.close()
+
+    return purged
+
+
+def collect_tombstones(
+    DB_PATH: str,
+    expiry_days: float = 30,
+    batch_size: int = 500,
+    max_batches: int | None = None,
+) -> dict[str, int]:
+    """
+    Expire inactive devices, then purge the tombstones the remaining devices
+    have all acknowledged.
+
+    Returns:
+        How many devices were expired and how many tombstones purged.
+    """
+    expired = expire_devices(DB_PATH, expiry_days)
+    purged = purge_tombstones(DB_PATH, batch_size=batch_size, max_batches=max_batches)
+    return {"expired": expired, "purged": purged}
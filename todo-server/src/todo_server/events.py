@@ -0,0 +1,150 @@
+"""
+Change notifications for connected devices, served as Server-Sent Events.
+
+A device subscribes with GET /users/{username}/events and keeps the stream open.
+Whenever a /sync commits a change to that user's tasks, every other device of
+the user gets a `changed` event and can sync then, instead of polling.
+
+Each user has a version that /sync bumps when it changes something. It is sent as
+the SSE event id, and a device reconnecting with Last-Event-ID is told about any
+change it missed while it was away. Versions start over (with a new boot id) when
+the server restarts, which just looks like a change to reconnecting devices.
+
+Notifications are in-process: with several workers, a device only hears about
+syncs handled by the worker its stream is connected to.
+
+Streams end after `max_seconds` and the client reconnects, which keeps dead
+connections from piling up and lets the server shut down gracefully.
+"""
+
+import asyncio
+import json
+import os
+import threading
+from collections.abc import AsyncIterator
+
+
+class Subscription:
+    def __init__(self, loop: asyncio.AbstractEventLoop, device_id: str | None):
+        self.loop = loop
+        self.device_id = device_id
+        # Holds at most the newest event id; a device only needs to know it's behind
+        self.queue = asyncio.Queue(maxsize=1)
+
+    def notify(self, event_id: str) -> None:
+        # Runs on the subscriber's event loop
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(event_id)
+
+
+class ChangeBroker:
+    def __init__(self):
+        self.boot_id = os.urandom(4).hex()
+        self._versions = {}
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    def event_id(self, username: str) -> str:
+        return f"{self.boot_id}-{self._versions.get(username, 0)}"
+
+    def subscribe(self, username: str, device_id: str | None = None) -> Subscription:
+        """
+        Register a subscriber on the running event loop.
+        """
+        subscription = Subscription(asyncio.get_running_loop(), device_id)
+        with self._lock:
+            self._subscribers.setdefault(username, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, username: str, subscription: Subscription) -> None:
+        with self._lock:
+            subscribers = self._subscribers.get(username, set())
+            subscribers.discard(subscription)
+            if not subscribers:
+                self._subscribers.pop(username, None)
+
+    def subscriber_count(self, username: str | None = None) -> int:
+        with self._lock:
+            if username is not None:
+                return len(self._subscribers.get(username, ()))
+            return sum(len(s) for s in self._subscribers.values())
+
+    def publish(self, username: str, device_id: str | None = None) -> str:
+        """
+        Record a change to username's tasks and notify their devices, except the
+        one that made it. Safe to call from any thread.
+
+        Args:
+            username: The user whose tasks changed.
+            device_id: The device whose sync made the change, if it sent one.
+
+        Returns:
+            The new event id.
+        """
+        with self._lock:
+            self._versions[username] = self._versions.get(username, 0) + 1
+            event_id = self.event_id(username)
+            subscribers = list(self._subscribers.get(username, ()))
+
+        for subscription in subscribers:
+            if device_id is not None and subscription.device_id == device_id:
+                continue
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.notify, event_id)
+            except RuntimeError:
+                pass  # the loop has closed; the stream is going away anyway
+        return event_id
+
+
+def format_event(event: str, data: dict, event_id: str | None = None) -> str:
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data)}")
+    return "\n".join(lines) + "\n\n"
+
+
+async def event_stream(
+    broker: ChangeBroker,
+    username: str,
+    device_id: str | None = None,
+    last_event_id: str | None = None,
+    keepalive_seconds: float = 15,
+    max_seconds: float = 60,
+) -> AsyncIterator[str]:
+    """
+    Yield the SSE stream for one device: a `ready` event, a `changed` event
+    straight away if last_event_id is out of date, then a `changed` event for
+    every later change, with comments in between to keep the connection alive.
+
+    Args:
+        broker: Where changes are published.
+        username: Whose changes to follow.
+        device_id: The subscribing device, so it isn't told about its own syncs.
+        last_event_id: The Last-Event-ID header of a reconnecting device.
+        keepalive_seconds: Longest time between two writes to the stream.
+        max_seconds: When to end the stream, so the client reconnects.
+    """
+    subscription = broker.subscribe(username, device_id)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + max_seconds
+    try:
+        current = broker.event_id(username)
+        yield f"retry: {int(keepalive_seconds * 1000)}\n"
+        yield format_event("ready", {"username": username}, current)
+        if last_event_id is not None and last_event_id != current:
+            yield format_event("changed", {"username": username}, current)
+
+        while (remaining := deadline - loop.time()) > 0:
+            try:
+                event_id = await asyncio.wait_for(
+                    subscription.queue.get(), min(keepalive_seconds, remaining)
+                )
+            except TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            yield format_event("changed", {"username": username}, event_id)
+    finally:
+        broker.unsubscribe(username, subscription)
@@ -0,0 +1,38 @@
+"""
+Background jobs for the server.
+
+Each job runs a plain function every `interval` seconds on its own daemon
+thread, so it never occupies the request threadpool. Jobs are started and
+stopped by the app's lifespan in todo_server.main.
+"""
+
+import logging
+import threading
+from collections.abc import Callable
+
+logger = logging.getLogger(__name__)
+
+
+class PeriodicJob:
+    def __init__(self, name: str, interval: float, fn: Callable[[], None]):
+        self.name = name
+        self.interval = interval
+        self.fn = fn
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self, timeout: float | None = 10) -> None:
+        self._stop.set()
+        self._thread.join(timeout)
+
+    def _run(self) -> None:
+        # Wait first, so starting the server never kicks off a burst of work
+        while not self._stop.wait(self.interval):
+            try:
+                self.fn()
+            except Exception:
+                # A failed run shouldn't kill the job; try again next interval
+                logger.exception("Background job '%s' failed", self.name)
@@ -0,0 +1,529 @@
+"""
+An append-only, log-structured storage engine for the server.
+
+Nearly everything the server stores comes from /sync: whole versions of tasks
+that replace the previous version, and nearly everything it reads is a user's
+whole task list. LogBackend never updates in place. Each new version of a task
+is a record appended to the current segment file of a directory, and an
+in-memory index (task ID -> segment, offset, length, plus MemoryBackend's
+per-user sorted keys) finds it again. Records are read back through a memory map
+of their segment, so a read is a slice of the page cache, and /sync responses
+are built by joining the stored JSON without decoding it.
+
+Files in the directory:
+
+* segment-N.log: records in the order they were written. The current segment is
+  preallocated to segment_bytes; when it fills up, it is truncated to its last
+  record and the next one is started.
+* LOCK: held by the process that has the log open; there can only be one.
+* snapshot-N.log: the live version of every task in segments up to N, written by
+  snapshot(). Once it is in place those segments are deleted, which is also how
+  replaced versions are compacted away.
+
+Each record is a header (payload length, CRC-32 of the payload, kind) and a
+payload: the task as JSON, or nothing for a `clear`. Opening the directory
+replays the latest snapshot and the segments after it, in order. Replay stops at
+the first record that is torn or fails its CRC (e.g. the last write before a
+crash) and truncates the segment there.
+
+A task record's position in the log (segment number and offset) is the
+change_seq of its version, which /sync cursors count (see
+todo_common.db.get_tasks_changed_since): segments are numbered in the order
+they are written, so positions only grow. Snapshot records keep the position
+their version was first written at, as an 8-byte prefix of the payload.
+
+Writes are fsynced once per `with storage.writing():` group (one /sync), or per
+call outside one, unless fsync is off. A crash can lose a group's tail but never
+reorders it; every record is a whole task version, so replaying part of a sync
+leaves each task at a version a client sent.
+"""
+
+import fcntl
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from bisect import bisect_right
+from collections.abc import Iterator, Mapping
+from contextlib import contextmanager
+from dataclasses import asdict
+from pathlib import Path
+
+from todo_common import db
+from todo_common.storage import MemoryBackend
+from todo_common.task import Task
+
+logger = logging.getLogger(__name__)
+
+# Payload length, CRC-32 of the payload, record kind
+HEADER = struct.Struct("<IIB")
+# A task, a clear, and (in snapshots) a task prefixed with its change_seq
+TASK, CLEAR, TASK_AT = 1, 2, 3
+CHANGE_SEQ = struct.Struct("<Q")
+# A record's change_seq is its segment number, shifted by this, plus its offset
+SEGMENT_SEQ_BITS = 40
+
+
+def encode_task(task: Task) -> bytes:
+    # Serialized exactly as /sync returns tasks, so responses reuse the bytes
+    return json.dumps(asdict(task), ensure_ascii=False).encode()
+
+
+def decode_task(payload: bytes) -> Task:
+    return Task(**json.loads(payload))
+
+
+class Segment:
+    """
+    One file of the log, written with pwrite at `end` and read through a
+    read-only memory map.
+    """
+
+    def __init__(self, path: Path, capacity: int | None = None):
+        """
+        Args:
+            path: segment-N.log or snapshot-N.log
+            capacity: preallocate a new, empty file to this many bytes; None
+                opens an existing file, with `end` at its size
+        """
+        self.path = path
+        self.number = self.number_of(path)
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        if capacity is not None:
+            os.ftruncate(self._fd, capacity)
+            self.end = 0
+        else:
+            self.end = os.fstat(self._fd).st_size
+        self._map = None
+        self._map_file()
+
+    @staticmethod
+    def number_of(path: Path) -> int:
+        # segment-00000012.log -> 12
+        return int(path.stem.split("-")[1])
+
+    def _map_file(self) -> None:
+        if self._map is not None:
+            self._map.close()
+        size = os.fstat(self._fd).st_size
+        # An empty file can't be mapped
+        self._map = mmap.mmap(self._fd, size, access=mmap.ACCESS_READ) if size else None
+
+    @property
+    def capacity(self) -> int:
+        return len(self._map) if self._map is not None else 0
+
+    def append(self, record: bytes) -> int:
+        """
+        Write a record after the last one and return its offset.
+        """
+        offset = self.end
+        os.pwrite(self._fd, record, offset)
+        self.end += len(record)
+        return offset
+
+    def read(self, offset: int, length: int) -> bytes:
+        return self._map[offset : offset + length]
+
+    def scan(self) -> Iterator[tuple[int, int, int]]:
+        """
+        Yield (kind, payload offset, payload length) for each intact record
+        from the start of the file, and leave `end` after the last one.
+        """
+        offset = 0
+        size = self.capacity
+        while offset + HEADER.size <= size:
+            length, crc, kind = HEADER.unpack_from(self._map, offset)
+            start = offset + HEADER.size
+            # Preallocated space reads as kind 0
+            if kind not in (TASK, CLEAR, TASK_AT) or start + length > size:
+                break
+            if zlib.crc32(self._map[start : start + length]) != crc:
+                break
+            yield kind, start, length
+            offset = start + length
+
+        # A record was started there, rather than the file ending or its
+        # preallocated (zero) space beginning
+        if offset < size and any(self._map[offset : offset + HEADER.size]):
+            logger.warning(
+                "Dropping %d bytes after the last intact record of %s (offset %d).",
+                size - offset,
+                self.path,
+                offset,
+            )
+        self.end = offset
+
+    def seal(self, fsync: bool = True) -> None:
+        """
+        Cut the file down to its records, once nothing more will be appended.
+        """
+        if self.end < self.capacity:
+            os.ftruncate(self._fd, self.end)
+            self._map_file()
+        if fsync:
+            os.fsync(self._fd)
+
+    def sync(self) -> None:
+        os.fdatasync(self._fd)
+
+    def close(self) -> None:
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        os.close(self._fd)
+
+
+class TaskLog(Mapping):
+    """
+    Tasks by ID, stored in a directory of segments. Reading an ID decodes its
+    latest record; assigning one appends a record. This is the task dict that
+    LogBackend gives MemoryBackend, so the engine's logic is MemoryBackend's.
+    """
+
+    def __init__(self, directory: str, segment_bytes: int = 64 * 2**20, fsync: bool = True):
+        """
+        Args:
+            directory: where the segment and snapshot files are (created if missing)
+            segment_bytes: size of each segment file
+            fsync: whether writes are fsynced before they count as done
+        """
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # Two processes appending to the same segments would corrupt them
+        self._lock_fd = os.open(self.directory / "LOCK", os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(self._lock_fd)
+            raise BlockingIOError(
+                f"{self.directory} is in use by another process (run the server with one worker)"
+            ) from None
+        self.segment_bytes = segment_bytes
+        self.fsync = fsync
+        # Task ID -> (segment, offset, length) of its latest record's JSON, and its change_seq
+        self._locations: dict[int, tuple[Segment, int, int, int]] = {}
+        # Oldest first; the last one is appended to
+        self._segments: list[Segment] = []
+        self._batch_depth = 0
+        # Only one snapshot runs at a time
+        self._snapshotting = threading.Lock()
+
+    def __getitem__(self, task_id: int) -> Task:
+        return decode_task(self.raw(task_id))
+
+    def __setitem__(self, task_id: int, task: Task) -> None:
+        segment, offset, length = self._append(TASK, encode_task(task))
+        self._locations[task_id] = (
+            segment,
+            offset,
+            length,
+            segment.number << SEGMENT_SEQ_BITS | offset,
+        )
+
+    def __contains__(self, task_id) -> bool:
+        return task_id in self._locations
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self._locations)
+
+    def __len__(self) -> int:
+        return len(self._locations)
+
+    def raw(self, task_id: int) -> bytes:
+        """
+        Return the JSON of a task's latest record, without decoding it.
+        """
+        segment, offset, length, _ = self._locations[task_id]
+        return segment.read(offset, length)
+
+    def change_seq(self, task_id: int) -> int:
+        """
+        Return the change_seq of a task's latest record.
+        """
+        return self._locations[task_id][3]
+
+    def clear(self) -> None:
+        # Logged rather than done by deleting files, so replay sees it in order
+        # (a running snapshot may be reading them); the next snapshot drops the tasks
+        self._append(CLEAR, b"")
+        self._locations.clear()
+
+    def _path(self, kind: str, number: int) -> Path:
+        return self.directory / f"{kind}-{number:08d}.log"
+
+    def _sync_directory(self) -> None:
+        # Make new, renamed and deleted files themselves durable
+        if not self.fsync:
+            return
+        fd = os.open(self.directory, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def _start_segment(self, size: int = 0) -> None:
+        if self._segments:
+            self._segments[-1].seal(self.fsync)
+        number = max((segment.number for segment in self._segments), default=0) + 1
+        self._segments.append(
+            Segment(self._path("segment", number), max(self.segment_bytes, size))
+        )
+        self._sync_directory()
+
+    def _append(self, kind: int, payload: bytes) -> tuple[Segment, int, int]:
+        record = HEADER.pack(len(payload), zlib.crc32(payload), kind) + payload
+        segment = self._segments[-1]
+        if segment.end + len(record) > segment.capacity:
+            self._start_segment(len(record))
+            segment = self._segments[-1]
+
+        offset = segment.append(record)
+        if self._batch_depth == 0:
+            self.sync()
+        return segment, offset + HEADER.size, len(payload)
+
+    def sync(self) -> None:
+        if self.fsync and self._segments:
+            self._segments[-1].sync()
+
+    @contextmanager
+    def batch(self):
+        """
+        Fsync once, when the outermost batch ends, instead of after every record.
+        """
+        self._batch_depth += 1
+        try:
+            yield
+        finally:
+            self._batch_depth -= 1
+            if self._batch_depth == 0:
+                self.sync()
+
+    def replay(self) -> Iterator[tuple[Task | None, Task | None, int]]:
+        """
+        Open the directory and replay it: yield (task, the version it replaces,
+        change_seq) for each task record, and (None, None, 0) for each clear, in
+        the order they were written. Appending starts in a new segment afterwards.
+        """
+        for partial in self.directory.glob("*.partial"):
+            partial.unlink()
+        snapshots = sorted(self.directory.glob("snapshot-*.log"))
+        covered = Segment.number_of(snapshots[-1]) if snapshots else 0
+        segments = []
+        for path in sorted(self.directory.glob("segment-*.log")):
+            if Segment.number_of(path) > covered:
+                segments.append(path)
+            else:
+                # Left by a snapshot that stopped before it removed what it replaced
+                path.unlink()
+        for path in snapshots[:-1]:
+            path.unlink()
+
+        for path in snapshots[-1:] + segments:
+            segment = Segment(path)
+            self._segments.append(segment)
+            for kind, offset, length in segment.scan():
+                if kind == CLEAR:
+                    self._locations.clear()
+                    yield None, None, 0
+                    continue
+                if kind == TASK_AT:
+                    (seq,) = CHANGE_SEQ.unpack(segment.read(offset, CHANGE_SEQ.size))
+                    offset += CHANGE_SEQ.size
+                    length -= CHANGE_SEQ.size
+                else:
+                    seq = segment.number << SEGMENT_SEQ_BITS | offset
+                task = decode_task(segment.read(offset, length))
+                old = self.get(task.id)
+                self._locations[task.id] = (segment, offset, length, seq)
+                yield task, old, seq
+            segment.seal(self.fsync)
+            if segment.end == 0 and path.name.startswith("segment-"):
+                # Started but never written to, e.g. by a server that did no writes
+                self._segments.remove(segment)
+                segment.close()
+                path.unlink()
+
+        self._start_segment()
+
+    def _dirty(self) -> bool:
+        # Anything written since the last snapshot
+        return any(
+            segment.end for segment in self._segments if segment.path.name.startswith("segment-")
+        )
+
+    def snapshot(self, lock: threading.RLock) -> Path | None:
+        """
+        Write the live version of every task to a snapshot file and delete the
+        segments it covers. Writers only wait while the current segment is
+        sealed and while the index is repointed at the snapshot, not while it
+        is copied.
+
+        Args:
+            lock: the lock that guards the index (LogBackend's)
+
+        Returns:
+            The snapshot's path, or None if nothing changed since the last one.
+        """
+        with self._snapshotting:
+            with lock:
+                if not self._dirty():
+                    return None
+                covered = self._segments[-1].number
+                self._start_segment()
+                locations = dict(self._locations)
+
+            # Copied record by record from the memory maps, each JSON prefixed
+            # with its change_seq; segments up to `covered` no longer change
+            start = time.perf_counter()
+            path = self._path("snapshot", covered)
+            partial = path.with_name(path.name + ".partial")
+            moved = {}
+            with open(partial, "wb") as f:
+                offset = 0
+                for task_id, (segment, json_offset, length, seq) in locations.items():
+                    prefix = CHANGE_SEQ.pack(seq)
+                    payload = segment.read(json_offset, length)
+                    crc = zlib.crc32(payload, zlib.crc32(prefix))
+                    f.write(HEADER.pack(len(prefix) + length, crc, TASK_AT))
+                    f.write(prefix)
+                    f.write(payload)
+                    json_start = offset + HEADER.size + len(prefix)
+                    moved[task_id] = (json_start, length, seq)
+                    offset = json_start + length
+                f.flush()
+                if self.fsync:
+                    os.fsync(f.fileno())
+            os.replace(partial, path)
+            self._sync_directory()
+
+            with lock:
+                snapshot = Segment(path)
+                for task_id, location in locations.items():
+                    # Unless a newer version was written meanwhile
+                    if self._locations.get(task_id) == location:
+                        self._locations[task_id] = (snapshot, *moved[task_id])
+                replaced = [s for s in self._segments if s.number <= covered]
+                self._segments = [snapshot] + [
+                    s for s in self._segments if s.number > covered
+                ]
+                for segment in replaced:
+                    segment.close()
+                    segment.path.unlink()
+            self._sync_directory()
+
+        logger.info(
+            "Wrote %s: %d tasks, %d bytes, %d files replaced in %.2fs.",
+            path,
+            len(moved),
+            offset,
+            len(replaced),
+            time.perf_counter() - start,
+        )
+        return path
+
+    def close(self) -> None:
+        for segment in self._segments:
+            segment.close()
+        self._segments = []
+        os.close(self._lock_fd)
+
+
+class LogBackend(MemoryBackend):
+    """
+    MemoryBackend's indexes over tasks kept in a TaskLog, so the log engine
+    lists, filters, searches and merges syncs exactly as the memory engine does,
+    but keeps only keys in memory and its tasks survive restarts.
+    """
+
+    def __init__(self, directory: str, segment_bytes: int = 64 * 2**20, fsync: bool = True):
+        """
+        Args:
+            directory: the log's directory; existing segments are replayed
+            segment_bytes: size of each segment file
+            fsync: fsync each write (or `with writing():` group) before returning
+        """
+        super().__init__(str(directory))
+        self._tasks = TaskLog(directory, segment_bytes, fsync)
+        # ID -> updated_hlc, to skip stale syncs without reading the task back
+        self._versions: dict[int, int] = {}
+
+        start = time.perf_counter()
+        records = 0
+        for task, old, seq in self._tasks.replay():
+            records += 1
+            if task is None:
+                self._clear_indexes()
+            else:
+                self._index(task, old, seq)
+        logger.info(
+            "Replayed %d records from %s in %.2fs: %d tasks.",
+            records,
+            directory,
+            time.perf_counter() - start,
+            len(self._tasks),
+        )
+
+    def __repr__(self) -> str:
+        return f"log:{self.name}"
+
+    def _stored_seq(self, task_id):
+        # Its position in the log
+        return self._tasks.change_seq(task_id)
+
+    def _index(self, task, old, seq):
+        super()._index(task, old, seq)
+        self._versions[task.id] = task.updated_hlc
+
+    def _clear_indexes(self):
+        super()._clear_indexes()
+        self._versions.clear()
+
+    def get_task(self, task_id):
+        # A snapshot may be swapping the file the task is read from
+        with self._lock:
+            return self._tasks.get(task_id)
+
+    def get_tasks_json_for_user(self, username, since=None):
+        # Join the stored JSON instead of decoding and re-encoding every task
+        with self._lock:
+            cursor = self._seq
+            if since is None or since > cursor:
+                keys = self._by_created.get(username, [])
+            else:
+                # As MemoryBackend.get_tasks_changed_since
+                keys = self._by_change.get(username, [])
+                keys = keys[bisect_right(keys, (since, float("inf"))) :]
+            payloads = [self._tasks.raw(task_id) for _, task_id in keys]
+        return b"[" + b", ".join(payloads) + b"]", cursor
+
+    def sync_task(self, task):
+        task = db.with_hlc(task)
+        with self._lock:
+            # Most of a /sync is tasks the server already has. This is the
+            # first check of db.sync_decision, made without decoding the task.
+            if self._versions.get(task.id, -1) >= task.updated_hlc:
+                return "skipped"
+            return super().sync_task(task)
+
+    @contextmanager
+    def writing(self):
+        # One fsync for the whole group
+        with self._lock, self._tasks.batch():
+            yield
+
+    def snapshot(self) -> Path | None:
+        """
+        Snapshot and compact the log (see TaskLog.snapshot). Run periodically,
+        so that restarts replay little and replaced versions don't pile up.
+        """
+        return self._tasks.snapshot(self._lock)
+
+    def close(self):
+        with self._lock:
+            self._tasks.close()
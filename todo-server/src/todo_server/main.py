@@ -1,31 +1,297 @@
 
+import base64
+import binascii
+import json
+import logging
 import os
+import sqlite3
 import sys
+import time
+from contextlib import asynccontextmanager
 from dataclasses import asdict
 from todo_common.config import load_config
-from todo_common.db import get_tasks_for_user, get_users, sync_task
+from todo_common.db import (
+    DUE_RANGES,
+    SYNC_OUTCOMES,
+    add_operation_hook,
+    get_purge_horizon,
+    log_sync_summary,
+)
+from todo_common.log import configure_logging, parse_bool
+from todo_common.retention import archive_tasks
+from todo_common.storage import StorageBackend, open_storage
 from todo_common.task import Task
-from fastapi import FastAPI
+from todo_common.tracing import Tracer
+from todo_server.admission import AdmissionController, AdmissionMiddleware
+from todo_server.backup import snapshot_database
+from todo_server.devices import collect_tombstones, needs_resync, record_device
+from todo_server.events import ChangeBroker, event_stream
+from todo_server.jobs import PeriodicJob
+from todo_server.logstore import LogBackend
+from todo_server.metrics import (
+    DEVICES_EXPIRED,
+    SYNC_PAYLOAD_BYTES,
+    SYNC_PAYLOAD_TASKS,
+    SYNC_RESYNCS,
+    SYNC_TASKS,
+    TOMBSTONES_PURGED,
+    MetricsMiddleware,
+    observe_db_operation,
+    render,
+)
+from todo_server.pool import ConnectionPool, PooledSQLiteBackend, PoolTimeout
+from todo_server.profiling import (
+    ProfilingMiddleware,
+    find_profile,
+    is_authorized,
+    list_profiles,
+)
+from fastapi import FastAPI, Header, Request
+from fastapi.responses import (
+    FileResponse,
+    JSONResponse,
+    PlainTextResponse,
+    Response,
+    StreamingResponse,
+)
 
+logger = logging.getLogger(__name__)
 
-app = FastAPI()
-
-
-def get_database() -> str:
-    # From config or environment, return the path to the server database
-    database_file = "todo_server.db"
+def get_config() -> dict:
+    # From config or environment, load the server configuration
     config_path = os.environ.get("TODO_SERVER_CONFIG_PATH", None)
     try:
-        config = load_config("server", config_path=config_path)
-        database_file = config.get("database_file", database_file)
+        return load_config("server", config_path=config_path)
     except Exception:
-        print("Error: Could not load server config file.")
+        logger.exception("Could not load server config file.")
         sys.exit(1)
-    return database_file
 
 
+def get_database() -> str:
+    # Return the path to the server database
+    return config.get("database_file", "todo_server.db")
+
+
+def get_storage() -> StorageBackend:
+    # The SQLite engine reads from a pool of query_only connections and writes
+    # through a single writer; the log engine is the server's own; other
+    # engines are used as they are
+    backend = config.get("storage_backend", "sqlite")
+    if backend == "log":
+        return LogBackend(
+            config.get("log_store_dir", "todo_server_log"),
+            segment_bytes=int(config.get("log_store_segment_mib", 64)) * 2**20,
+            fsync=parse_bool(config.get("log_store_fsync"), default=True),
+        )
+    if backend != "sqlite":
+        return open_storage(config, "todo_server.db")
+    return PooledSQLiteBackend(
+        ConnectionPool(
+            db,
+            readers=int(config.get("read_pool_size", 4)),
+            timeout=float(config.get("db_pool_timeout_seconds", 5)),
+            read_cache_mib=int(config.get("read_cache_mib", 16)),
+            read_mmap_mib=int(config.get("read_mmap_mib", 256)),
+        )
+    )
+
+
+def encode_cursor(key: tuple[str, int]) -> str:
+    """
+    Encode a (created_at, id) keyset position as an opaque URL-safe cursor.
+    """
+    created_at, task_id = key
+    raw = f"{created_at}|{task_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[str, int]:
+    """
+    Decode a cursor produced by encode_cursor. Raises ValueError if it is malformed.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, task_id = (
+            base64.urlsafe_b64decode(padded).decode().rsplit("|", 1)
+        )
+        return created_at, int(task_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def optional_int(value: str | None) -> int | None:
+    return int(value) if value not in (None, "") else None
+
+
+def run_retention() -> None:
+    # One bounded pass; whatever is left over is picked up on the next interval
+    archived = archive_tasks(
+        db,
+        older_than_days=optional_int(config.get("retention_days")),
+        keep_completed=optional_int(config.get("retention_keep_completed")),
+        batch_size=int(config.get("retention_batch_size", 500)),
+        max_batches=int(config.get("retention_max_batches", 20)),
+    )
+    if archived:
+        logger.info("Retention archived %d tasks.", archived)
+
+
+def run_tombstone_gc() -> None:
+    # Expire idle devices, then purge what every remaining device has acknowledged
+    collected = collect_tombstones(
+        db,
+        expiry_days=float(config.get("device_expiry_days", 30)),
+        batch_size=int(config.get("tombstone_gc_batch_size", 500)),
+        max_batches=int(config.get("tombstone_gc_max_batches", 20)),
+    )
+    DEVICES_EXPIRED.inc(collected["expired"])
+    TOMBSTONES_PURGED.inc(collected["purged"])
+    if collected["expired"] or collected["purged"]:
+        logger.info(
+            "Tombstone GC expired %d devices and purged %d tombstones.",
+            collected["expired"],
+            collected["purged"],
+        )
+
+
+def run_backup() -> None:
+    # Paced so that syncs keep writing while the snapshot is taken
+    snapshot_database(
+        db,
+        config.get("backup_dir", "backups"),
+        keep=int(config.get("backup_keep", 7)),
+        pages=int(config.get("backup_pages_per_step", 256)),
+        step_sleep=float(config.get("backup_step_sleep_seconds", 0.01)),
+    )
+
+
+def get_background_jobs() -> list[PeriodicJob]:
+    jobs = []
+
+    if isinstance(storage, LogBackend):
+        snapshot_interval = float(config.get("log_store_snapshot_interval_seconds", 300))
+        if snapshot_interval > 0:
+            jobs.append(PeriodicJob("log-snapshot", snapshot_interval, storage.snapshot))
+
+    # Retention, tombstone GC and backups work on the database file
+    if not isinstance(storage, PooledSQLiteBackend):
+        if (
+            config.get("retention_interval_seconds")
+            or config.get("tombstone_gc_interval_seconds")
+            or config.get("backup_interval_seconds")
+        ):
+            logger.warning(
+                "Retention, tombstone GC and backups need storage_backend=sqlite; not scheduled."
+            )
+        return jobs
+
+    retention_interval = float(config.get("retention_interval_seconds", 0))
+    if retention_interval > 0:
+        jobs.append(PeriodicJob("retention", retention_interval, run_retention))
+
+    tombstone_gc_interval = float(config.get("tombstone_gc_interval_seconds", 0))
+    if tombstone_gc_interval > 0:
+        jobs.append(PeriodicJob("tombstone-gc", tombstone_gc_interval, run_tombstone_gc))
+
+    backup_interval = float(config.get("backup_interval_seconds", 0))
+    if backup_interval > 0:
+        jobs.append(PeriodicJob("backup", backup_interval, run_backup))
+
+    return jobs
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    jobs = get_background_jobs()
+    for job in jobs:
+        job.start()
+    yield
+    for job in jobs:
+        job.stop()
+    storage.close()
+
+
+config = get_config()
 db = get_database()
 
+# Per-task sync detail is logged at DEBUG; with log_queue, a background thread writes the logs
+configure_logging(
+    config.get("log_level", "INFO"),
+    use_queue=parse_bool(config.get("log_queue")),
+    logger_names=("todo_common", "todo_server"),
+)
+
+page_size = int(config.get("page_size", 100))
+# Users' syncs accepted in one POST /sync/batch
+sync_batch_max_users = int(config.get("sync_batch_max_users", 100))
+max_page_size = int(config.get("max_page_size", 1000))
+
+# Where tasks are kept: the database file (default), a log directory or memory, per storage_backend
+try:
+    storage = get_storage()
+except (ValueError, OSError):
+    logger.exception("Could not open the server's storage.")
+    sys.exit(1)
+
+# The device registry and purge horizons live in the database file
+track_devices = isinstance(storage, PooledSQLiteBackend)
+
+app = FastAPI(lifespan=lifespan)
+
+
+@app.exception_handler(PoolTimeout)
+def handle_pool_timeout(request: Request, exc: PoolTimeout):
+    # Every database connection is busy; the client backs off and retries
+    logger.warning("%s", exc)
+    return JSONResponse(
+        status_code=503,
+        content={"error": "Database busy"},
+        headers={"Retry-After": "1"},
+    )
+
+# Bounded concurrency and queueing for syncs, if configured. Added first so it
+# runs inside the metrics middleware, which then counts its rejections.
+sync_max_concurrent = int(config.get("sync_max_concurrent", 0))
+if sync_max_concurrent > 0:
+    app.add_middleware(
+        AdmissionMiddleware,
+        controller=AdmissionController(
+            sync_max_concurrent,
+            max_queue=int(config.get("sync_max_queue", 100)),
+            queue_timeout=float(config.get("sync_queue_timeout_seconds", 5)),
+            max_per_user=int(config.get("sync_max_per_user", 0)),
+        ),
+    )
+
+# Request counts and latencies, plus timing of every todo_common.db operation
+app.add_middleware(MetricsMiddleware)
+add_operation_hook(observe_db_operation)
+
+# Per-request profiling is only installed when a profile directory is configured
+profile_dir = config.get("profile_dir")
+profile_token = config.get("profile_token") or None
+if profile_dir:
+    if not profile_token:
+        logger.warning(
+            "profile_dir is set without profile_token: only sampled requests are "
+            "profiled, and the profile endpoints are closed."
+        )
+    app.add_middleware(
+        ProfilingMiddleware,
+        profile_dir=profile_dir,
+        max_files=int(config.get("profile_max_files", 50)),
+        sample_rate=float(config.get("profile_sample_rate", 0)),
+        token=profile_token,
+    )
+
+# Sync spans are appended here as JSON lines, if set
+trace_file = config.get("trace_file") or None
+
+# Devices following their user's changes through /users/{username}/events
+broker = ChangeBroker()
+events_keepalive_seconds = float(config.get("events_keepalive_seconds", 15))
+events_max_seconds = float(config.get("events_max_seconds", 60))
+
 
 @app.get("/")
 def read_root():
@@ -34,33 +300,389 @@ def read_root():
 
 @app.get("/users")
 def read_users():
-    users = get_users(db)
+    with storage.reading():
+        users = storage.get_users()
     return {"users": users}
 
 
-@app.post("/sync")
-def sync_tasks(payload: dict):
-    # Validate and process the incoming request from the client
-    try:
-        assert "tasks" in payload
-    except AssertionError:
-        print("Invalid payload: 'tasks' key missing")
-        return {"error": "Invalid payload: 'tasks' key missing"}, 400
+@app.get("/users/{username}/events")
+async def read_user_events(
+    username: str,
+    device_id: str | None = None,
+    last_event_id: str | None = Header(default=None),
+):
+    # Server-Sent Events: a "changed" event whenever another device's sync changes this user's tasks
+    return StreamingResponse(
+        event_stream(
+            broker,
+            username,
+            device_id=device_id,
+            last_event_id=last_event_id,
+            keepalive_seconds=events_keepalive_seconds,
+            max_seconds=events_max_seconds,
+        ),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 
+@app.get("/users/{username}/tasks")
+def read_user_tasks(
+    username: str,
+    completed: bool = False,
+    today: bool = False,
+    include_deleted: bool = False,
+    due: str | None = None,
+    limit: int | None = None,
+    cursor: str | None = None,
+):
+    # Read-only, keyset-paginated listing. Follow next_cursor until it is null.
+    limit = min(max(limit or page_size, 1), max_page_size)
+
+    if due is not None and due not in DUE_RANGES:
+        return JSONResponse(
+            status_code=400,
+            content={
+                "error": f"Invalid due: {due} (expected one of {', '.join(DUE_RANGES)})"
+            },
+        )
+
+    after = None
+    if cursor:
+        try:
+            after = decode_cursor(cursor)
+        except ValueError:
+            return JSONResponse(
+                status_code=400, content={"error": f"Invalid cursor: {cursor}"}
+            )
+
+    with storage.reading():
+        tasks, next_key = storage.get_tasks_page_for_user(
+            username,
+            after=after,
+            limit=limit,
+            only_completed=completed,
+            only_today=today,
+            include_deleted=include_deleted,
+            due=due,
+        )
+
+    return {
+        "tasks": [asdict(task) for task in tasks],
+        "next_cursor": encode_cursor(next_key) if next_key else None,
+    }
+
+
+@app.get("/users/{username}/search")
+def search_user_tasks(username: str, q: str, limit: int | None = None):
+    # Full-text search over a user's task content, best matches first
+    limit = min(max(limit or page_size, 1), max_page_size)
+    with storage.reading():
+        tasks = storage.search_tasks(username, q, limit=limit)
+    return {"tasks": [asdict(task) for task in tasks]}
+
+
+def check_profile_access(x_todo_profile: str | None) -> JSONResponse | None:
+    # The profile endpoints exist only when profiling is on, and share its token
+    if not profile_dir:
+        return JSONResponse(
+            status_code=404, content={"error": "Profiling is disabled"}
+        )
+    if not is_authorized(x_todo_profile, profile_token):
+        return JSONResponse(
+            status_code=403, content={"error": "Invalid X-Todo-Profile token"}
+        )
+    return None
+
+
+@app.get("/admin/profiles")
+def read_profiles(
+    limit: int = 50, x_todo_profile: str | None = Header(default=None)
+):
+    # Most recent request profiles, newest first
+    error = check_profile_access(x_todo_profile)
+    if error:
+        return error
+    return {"profiles": list_profiles(profile_dir, limit=max(limit, 1))}
+
+
+@app.get("/admin/profiles/{profile_id}")
+def read_profile(
+    profile_id: str, x_todo_profile: str | None = Header(default=None)
+):
+    # Download one profile as a pstats file
+    error = check_profile_access(x_todo_profile)
+    if error:
+        return error
+    path = find_profile(profile_dir, profile_id)
+    if path is None:
+        return JSONResponse(
+            status_code=404, content={"error": f"No profile {profile_id}"}
+        )
+    return FileResponse(
+        path,
+        media_type="application/octet-stream",
+        filename=os.path.basename(path),
+    )
+
+
+@app.get("/metrics")
+def read_metrics():
+    # Prometheus text exposition format
+    return PlainTextResponse(render(), media_type="text/plain; version=0.0.4")
+
+
+def parse_sync_entry(
+    entry,
+) -> tuple[str, list[Task], int | None, int | None, str | None]:
+    """
+    Validate one user's sync from a /sync/batch payload.
+
+    Returns:
+        The username, the tasks, and the since, ack and device_id (each None if not sent).
+
+    Raises:
+        ValueError: saying what is wrong with the entry.
+    """
+    if not isinstance(entry, dict):
+        entry = {}
+    username = entry.get("username")
+    if not username or not isinstance(username, str):
+        raise ValueError("Invalid sync: 'username' missing")
     try:
-        assert "username" in payload
-    except AssertionError:
-        print("Invalid payload: 'username' key missing")
-        return {"error": "Invalid payload: 'username' key missing"}, 400
+        tasks = [Task(**task) for task in entry["tasks"]]
+    except KeyError:
+        raise ValueError("Invalid sync: 'tasks' missing") from None
+    except TypeError as e:
+        raise ValueError(f"Invalid task: {e}") from e
 
-    tasks = payload.get("tasks", [])
-    username = payload.get("username")
+    since = entry.get("since")
+    if since is not None and not isinstance(since, int):
+        raise ValueError(f"Invalid since: {since}")
+    ack = entry.get("ack", since)
+    if ack is not None and not isinstance(ack, int):
+        raise ValueError(f"Invalid ack: {ack}")
+    device_id = entry.get("device_id")
+    if device_id is not None and not isinstance(device_id, str):
+        raise ValueError(f"Invalid device_id: {device_id}")
+    return username, tasks, since, ack, device_id
 
-    print(f"Syncing tasks for user {username}, {len(tasks)} tasks received.")
 
+def merge_user_sync(
+    username: str, tasks: list[Task], ack: int | None, device_id: str | None
+) -> tuple[dict[str, int], bool, int]:
+    """
+    Merge one user's tasks and record the device that sent them. Runs inside
+    storage.writing().
+
+    Returns:
+        How many tasks had each of SYNC_OUTCOMES, whether the device must
+        resync, and the user's purged_seq.
+    """
+    outcomes = dict.fromkeys(SYNC_OUTCOMES, 0)
     for task in tasks:
-        sync_task(Task(**task), db)
+        outcomes[storage.sync_task(task)] += 1
+
+    resync, horizon = False, 0
+    if track_devices:
+        # An ack above every change_seq wasn't handed out by this server (e.g.
+        # an HLC, which cursors were before), so it acknowledges nothing
+        if ack is not None and ack > storage.get_last_change_seq():
+            ack = 0
+        resync, horizon = needs_resync(db, username, ack)
+        if device_id:
+            record_device(db, username, device_id, ack)
+    return outcomes, resync, horizon
+
+
+def finish_user_sync(
+    username: str,
+    device_id: str | None,
+    ack: int | None,
+    outcomes: dict[str, int],
+    resync: bool,
+    horizon: int,
+) -> None:
+    # Once the merge has committed: count it, and let the user's other devices sync now
+    for outcome, count in outcomes.items():
+        if count:
+            SYNC_TASKS.inc(count, outcome=outcome)
+    if outcomes["inserted"] or outcomes["updated"] or outcomes["divergent"]:
+        broker.publish(username, device_id)
+
+    if resync:
+        SYNC_RESYNCS.inc()
+        logger.info(
+            "Device %s of user %s is behind the purge horizon (ack %d, purged up to %d); "
+            "sending every task.",
+            device_id,
+            username,
+            ack,
+            horizon,
+        )
+
+
+def load_user_sync(username: str, since: int | None, resync: bool) -> bytes:
+    """
+    Return the "tasks", "cursor" and "horizon" members (and "resync", if set)
+    of one user's sync response. Runs inside storage.reading().
+    """
+    # A device behind the purge horizon may still hold tasks whose tombstones
+    # are gone, so it gets every task to replace its own with
+    if resync:
+        since = None
+
+    # With the SQLite engine, SQLite writes the tasks' JSON, which is sent on
+    # without decoding it. The cursor is the last change_seq, which is past
+    # every purge, so the next ack doesn't fall behind the horizon again.
+    tasks_json, cursor = storage.get_tasks_json_for_user(username, since)
+    # The newest purged version: the client's next edits tick past it, or a slow
+    # clock could give a new task an HLC that merges skip as purged
+    horizon = get_purge_horizon(username, db) if track_devices else 0
+    return b'"tasks":%s,"cursor":%d,"horizon":%d%s' % (
+        tasks_json,
+        cursor,
+        horizon,
+        b',"resync":true' if resync else b"",
+    )
+
+
+@app.post("/sync")
+def sync_tasks(payload: dict, request: Request):
+    # Each step is timed as a span, continuing the client's trace if it sent one
+    tracer = Tracer("todo-server", request.headers.get("traceparent"))
+
+    with tracer.span("server") as root:
+        # Validate and process the incoming request from the client
+        with tracer.span("validate"):
+            try:
+                assert "tasks" in payload
+            except AssertionError:
+                logger.warning("Invalid payload: 'tasks' key missing")
+                return {"error": "Invalid payload: 'tasks' key missing"}, 400
+
+            try:
+                assert "username" in payload
+            except AssertionError:
+                logger.warning("Invalid payload: 'username' key missing")
+                return {"error": "Invalid payload: 'username' key missing"}, 400
+
+            username = payload.get("username")
+            tasks = [Task(**task) for task in payload.get("tasks", [])]
+
+            # With a cursor from an earlier response, only send back what changed since
+            since = payload.get("since")
+            if since is not None and not isinstance(since, int):
+                return JSONResponse(
+                    status_code=400, content={"error": f"Invalid since: {since}"}
+                )
+            # The cursor of the last response the device applied (defaults to since)
+            ack = payload.get("ack", since)
+            if ack is not None and not isinstance(ack, int):
+                return JSONResponse(
+                    status_code=400, content={"error": f"Invalid ack: {ack}"}
+                )
+            device_id = payload.get("device_id")
+            root["attributes"].update(username=username, tasks=len(tasks))
+
+        SYNC_PAYLOAD_TASKS.observe(len(tasks))
+        if request.headers.get("content-length"):
+            SYNC_PAYLOAD_BYTES.observe(int(request.headers["content-length"]))
+
+        # The whole payload is merged in one transaction on the writer connection
+        with tracer.span("merge") as merge:
+            start = time.perf_counter()
+            with storage.writing():
+                outcomes, resync, horizon = merge_user_sync(username, tasks, ack, device_id)
+            merge["attributes"].update(outcomes)
+            log_sync_summary(
+                len(tasks), outcomes, time.perf_counter() - start, f"user {username}"
+            )
+
+        finish_user_sync(username, device_id, ack, outcomes, resync, horizon)
+
+        with tracer.span("load"), storage.reading():
+            members = load_user_sync(username, since, resync)
+
+        with tracer.span("serialize"):
+            body = b'{"status":"success",%s}' % members
+            response = Response(body, media_type="application/json")
+
+    response.headers["Server-Timing"] = tracer.server_timing()
+    if trace_file:
+        tracer.export(trace_file)
+    return response
+
+
+@app.post("/sync/batch")
+def sync_batch(payload: dict):
+    # Many users' syncs in one request, e.g. from a gateway. They are merged in
+    # one transaction, each user in its own savepoint, so that one user's bad
+    # entry is reported in its result without failing the others.
+    entries = payload.get("syncs")
+    if not isinstance(entries, list):
+        logger.warning("Invalid batch: 'syncs' list missing")
+        return JSONResponse(
+            status_code=400, content={"error": "Invalid payload: 'syncs' list missing"}
+        )
+    if len(entries) > sync_batch_max_users:
+        return JSONResponse(
+            status_code=413,
+            content={"error": f"At most {sync_batch_max_users} syncs per batch"},
+        )
+
+    # Per entry, in the payload's order: the response members, or an error
+    results: list[bytes | None] = [None] * len(entries)
+
+    def fail(index: int, entry, message: str) -> None:
+        username = entry.get("username") if isinstance(entry, dict) else None
+        logger.warning("Batch sync %d (user %s) failed: %s", index, username, message)
+        results[index] = json.dumps(
+            {"username": username, "status": "error", "error": message}
+        ).encode()
+
+    syncs = []
+    for index, entry in enumerate(entries):
+        try:
+            syncs.append((index, *parse_sync_entry(entry)))
+        except ValueError as e:
+            fail(index, entry, str(e))
+
+    start = time.perf_counter()
+    totals = dict.fromkeys(SYNC_OUTCOMES, 0)
+    merged = []
+    with storage.writing():
+        for index, username, tasks, since, ack, device_id in syncs:
+            SYNC_PAYLOAD_TASKS.observe(len(tasks))
+            try:
+                with storage.savepoint():
+                    outcomes, resync, horizon = merge_user_sync(
+                        username, tasks, ack, device_id
+                    )
+            except (sqlite3.Error, ValueError, TypeError) as e:
+                fail(index, entries[index], f"Could not sync: {e}")
+                continue
+            merged.append((index, username, since, ack, device_id, outcomes, resync, horizon))
+            for outcome, count in outcomes.items():
+                totals[outcome] += count
+    log_sync_summary(
+        sum(len(sync[2]) for sync in syncs),
+        totals,
+        time.perf_counter() - start,
+        f"batch of {len(merged)} users",
+    )
+
+    for _, username, _, ack, device_id, outcomes, resync, horizon in merged:
+        finish_user_sync(username, device_id, ack, outcomes, resync, horizon)
 
-    synced_tasks = get_tasks_for_user(username, db)
+    # Every user's tasks are read on one connection
+    with storage.reading():
+        for index, username, since, _, _, outcomes, resync, _ in merged:
+            results[index] = b'{"username":%s,"status":"success","outcomes":%s,%s}' % (
+                json.dumps(username).encode(),
+                json.dumps(outcomes).encode(),
+                load_user_sync(username, since, resync),
+            )
 
-    return {"status": "success", "tasks": [asdict(task) for task in synced_tasks]}
+    body = b'{"status":"success","results":[%s]}' % b",".join(results)
+    return Response(body, media_type="application/json")
@@ -0,0 +1,269 @@
+"""
+Prometheus metrics for the server, served as text by GET /metrics.
+
+This is a deliberately small subset of the Prometheus client (counters, gauges
+and histograms with labels) so the server doesn't need another dependency. Metrics
+live in the process, so with several workers each one reports its own numbers,
+and Prometheus should scrape them individually or sum them.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+
+# Request latencies and database operations, in seconds
+DEFAULT_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+# Every metric created, in the order they are rendered
+REGISTRY = []
+
+
+def format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    def escape(value) -> str:
+        return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+    pairs = [f'{name}="{escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = tuple(labels[name] for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(tuple(labels[name] for name in self.labels), 0)
+
+    def samples(self) -> list[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [
+            f"{self.name}{format_labels(self.labels, key)} {value}"
+            for key, value in values
+        ]
+
+
+class Gauge(Counter):
+    # A value that goes up and down, e.g. a queue length
+    kind = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        key = tuple(labels[name] for name in self.labels)
+        with self._lock:
+            self._values[key] = value
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: tuple = (),
+        buckets: tuple = DEFAULT_BUCKETS,
+    ):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = tuple(sorted(buckets))
+        # key -> [count per bucket (not cumulative), +Inf count, sum]
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(labels[name] for name in self.labels)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [[0] * len(self.buckets), 0, 0.0]
+            i = bisect_left(self.buckets, value)
+            if i < len(self.buckets):
+                series[0][i] += 1
+            series[1] += 1
+            series[2] += value
+
+    def count(self, **labels) -> int:
+        series = self._values.get(tuple(labels[name] for name in self.labels))
+        return series[1] if series else 0
+
+    def samples(self) -> list[str]:
+        with self._lock:
+            values = sorted(
+                (key, (list(counts), total, sum_))
+                for key, (counts, total, sum_) in self._values.items()
+            )
+
+        lines = []
+        for key, (counts, total, sum_) in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                le = format_labels(self.labels, key, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            le = format_labels(self.labels, key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{le} {total}")
+            lines.append(f"{self.name}_sum{format_labels(self.labels, key)} {sum_}")
+            lines.append(f"{self.name}_count{format_labels(self.labels, key)} {total}")
+        return lines
+
+
+def render() -> str:
+    """
+    Return every registered metric in the Prometheus text exposition format.
+    """
+    lines = []
+    for metric in REGISTRY:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.samples())
+    return "\n".join(lines) + "\n"
+
+
+HTTP_REQUESTS = Counter(
+    "todo_http_requests_total",
+    "HTTP requests handled, by route template and status code.",
+    labels=("method", "route", "status"),
+)
+HTTP_REQUEST_SECONDS = Histogram(
+    "todo_http_request_duration_seconds",
+    "Time to handle an HTTP request, by route template.",
+    labels=("method", "route"),
+)
+SYNC_PAYLOAD_TASKS = Histogram(
+    "todo_sync_payload_tasks",
+    "Number of tasks sent by a client in one /sync request.",
+    buckets=(0, 1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000),
+)
+SYNC_PAYLOAD_BYTES = Histogram(
+    "todo_sync_payload_bytes",
+    "Size of the /sync request body.",
+    buckets=tuple(2**n for n in range(8, 25, 2)),
+)
+SYNC_TASKS = Counter(
+    "todo_sync_tasks_total",
+    "Tasks received by /sync, by what sync_task did with them.",
+    labels=("outcome",),
+)
+SYNC_RESYNCS = Counter(
+    "todo_sync_resyncs_total",
+    "Syncs answered with every task because the device was behind its user's purge horizon.",
+)
+TOMBSTONES_PURGED = Counter(
+    "todo_tombstones_purged_total",
+    "Tombstones deleted once every registered device had acknowledged them.",
+)
+DEVICES_EXPIRED = Counter(
+    "todo_devices_expired_total",
+    "Devices dropped from the sync registry for not syncing within device_expiry_days.",
+)
+DB_OPERATION_SECONDS = Histogram(
+    "todo_db_operation_duration_seconds",
+    "Time spent in each todo_common.db operation.",
+    labels=("operation",),
+)
+
+ADMISSION_ACTIVE = Gauge(
+    "todo_admission_active",
+    "Syncs currently running under admission control.",
+)
+ADMISSION_QUEUED = Gauge(
+    "todo_admission_queued",
+    "Syncs waiting for admission.",
+)
+ADMISSION_REJECTED = Counter(
+    "todo_admission_rejected_total",
+    "Syncs turned away by admission control, by reason.",
+    labels=("reason",),
+)
+ADMISSION_WAIT_SECONDS = Histogram(
+    "todo_admission_wait_seconds",
+    "Time an admitted sync waited for a slot.",
+)
+
+DB_POOL_CONNECTIONS = Gauge(
+    "todo_db_pool_connections",
+    "Connections in each database pool (read or write), by state (idle or in_use).",
+    labels=("pool", "state"),
+)
+DB_POOL_WAIT_SECONDS = Histogram(
+    "todo_db_pool_wait_seconds",
+    "Time spent waiting for a connection from a database pool.",
+    labels=("pool",),
+)
+DB_POOL_TIMEOUTS = Counter(
+    "todo_db_pool_timeouts_total",
+    "Requests that gave up waiting for a connection from a database pool.",
+    labels=("pool",),
+)
+
+
+def observe_db_operation(operation: str, seconds: float) -> None:
+    # Registered with todo_common.db.add_operation_hook by the server
+    DB_OPERATION_SECONDS.observe(seconds, operation=operation)
+
+
+class MetricsMiddleware:
+    """
+    Count requests and time them, labelled by route template (e.g.
+    /users/{username}/tasks) rather than the raw path, so usernames don't
+    become separate series.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or "unmatched"
+            method = scope["method"]
+            HTTP_REQUESTS.inc(method=method, route=route_path, status=str(status))
+            HTTP_REQUEST_SECONDS.observe(elapsed, method=method, route=route_path)
@@ -0,0 +1,204 @@
+"""
+Separate read and write connections to the server database.
+
+Opening a connection per operation means every read pays for a connect, a
+schema check and a cold page cache, and under the rollback journal a read holds
+a lock that makes writers wait (and vice versa). ConnectionPool switches the
+database to WAL, where readers and the writer don't block each other, and keeps:
+
+* one writer connection, used by one request at a time. SQLite only allows one
+  writer anyway; queueing for it here is cheaper than retrying on SQLITE_BUSY.
+* `readers` read connections set to query_only, with a larger page cache and
+  memory-mapped I/O, so repeated reads of the same pages skip both the disk and
+  the copy into SQLite's cache.
+
+Inside `with pool.reader():` or `with pool.writer():`, the todo_common.db
+functions given the pool's database path use the pooled connection (see
+todo_common.db.use_connection). A request that waits longer than `timeout` for
+a connection gets PoolTimeout, which the server turns into a 503.
+"""
+
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+from todo_common.db import init_db, use_connection
+from todo_common.storage import SQLiteBackend
+
+from todo_server.metrics import (
+    DB_POOL_CONNECTIONS,
+    DB_POOL_TIMEOUTS,
+    DB_POOL_WAIT_SECONDS,
+)
+
+logger = logging.getLogger(__name__)
+
+class PoolTimeout(Exception):
+    """No connection became free within the pool's timeout."""
+
+
+class ConnectionPool:
+    def __init__(
+        self,
+        DB_PATH: str,
+        readers: int = 4,
+        timeout: float = 5.0,
+        read_cache_mib: int = 16,
+        read_mmap_mib: int = 256,
+    ):
+        """
+        Args:
+            DB_PATH: path to the SQLite database file (migrated and switched to WAL here)
+            readers: number of read connections
+            timeout: seconds to wait for a free connection before PoolTimeout
+            read_cache_mib: page cache size of each read connection
+            read_mmap_mib: how much of the database file read connections memory-map
+        """
+        self.DB_PATH = DB_PATH
+        self.timeout = timeout
+
+        init_db(DB_PATH)
+        self._writer = self._connect()
+        mode = self._writer.execute("PRAGMA journal_mode = WAL;").fetchone()[0]
+        if mode != "wal":
+            logger.warning("Could not switch %s to WAL (journal mode %s).", DB_PATH, mode)
+        self._writer_lock = threading.Lock()
+        # The thread inside writer(), whose transaction savepoint() may join
+        self._writer_owner = None
+
+        # Last in, first out, so a quiet server keeps reusing the warmest connection
+        self._readers = queue.LifoQueue()
+        self._all_readers = []
+        for _ in range(max(readers, 1)):
+            conn = self._connect()
+            conn.execute(f"PRAGMA cache_size = {-read_cache_mib * 1024};")
+            conn.execute(f"PRAGMA mmap_size = {read_mmap_mib * 2**20};")
+            conn.execute("PRAGMA query_only = ON;")
+            self._readers.put(conn)
+            self._all_readers.append(conn)
+
+        DB_POOL_CONNECTIONS.set(len(self._all_readers), pool="read", state="idle")
+        DB_POOL_CONNECTIONS.set(0, pool="read", state="in_use")
+        DB_POOL_CONNECTIONS.set(1, pool="write", state="idle")
+        DB_POOL_CONNECTIONS.set(0, pool="write", state="in_use")
+
+    def _connect(self) -> sqlite3.Connection:
+        # Pooled connections move between the server's worker threads
+        conn = sqlite3.connect(self.DB_PATH, check_same_thread=False)
+        conn.execute("PRAGMA foreign_keys = ON;")
+        return conn
+
+    def _waited(self, pool: str, start: float) -> None:
+        DB_POOL_WAIT_SECONDS.observe(time.perf_counter() - start, pool=pool)
+        DB_POOL_CONNECTIONS.dec(pool=pool, state="idle")
+        DB_POOL_CONNECTIONS.inc(pool=pool, state="in_use")
+
+    def _returned(self, pool: str) -> None:
+        DB_POOL_CONNECTIONS.dec(pool=pool, state="in_use")
+        DB_POOL_CONNECTIONS.inc(pool=pool, state="idle")
+
+    def _timed_out(self, pool: str) -> PoolTimeout:
+        DB_POOL_TIMEOUTS.inc(pool=pool)
+        return PoolTimeout(
+            f"No {pool} connection to {self.DB_PATH} free after {self.timeout}s"
+        )
+
+    @contextmanager
+    def reader(self) -> Iterator[sqlite3.Connection]:
+        """
+        Borrow a read connection for the with block. Writes through it fail.
+        """
+        start = time.perf_counter()
+        try:
+            conn = self._readers.get(timeout=self.timeout)
+        except queue.Empty:
+            raise self._timed_out("read") from None
+        self._waited("read", start)
+        try:
+            with use_connection(conn, self.DB_PATH):
+                yield conn
+        finally:
+            # End any read transaction, so the connection doesn't pin an old snapshot
+            conn.rollback()
+            self._readers.put(conn)
+            self._returned("read")
+
+    @contextmanager
+    def writer(self) -> Iterator[sqlite3.Connection]:
+        """
+        Borrow the writer connection for the with block, as one transaction:
+        committed if the block succeeds and rolled back if it raises.
+        """
+        start = time.perf_counter()
+        if not self._writer_lock.acquire(timeout=self.timeout):
+            raise self._timed_out("write")
+        self._waited("write", start)
+        self._writer_owner = threading.get_ident()
+        try:
+            with use_connection(self._writer, self.DB_PATH):
+                yield self._writer
+            self._writer.commit()
+        except BaseException:
+            self._writer.rollback()
+            raise
+        finally:
+            self._writer_owner = None
+            self._writer_lock.release()
+            self._returned("write")
+
+    @contextmanager
+    def savepoint(self) -> Iterator[sqlite3.Connection]:
+        """
+        Inside writer(): make the with block a savepoint of the writer's
+        transaction. If the block raises, only its own writes are rolled back,
+        and the rest of the transaction goes on to commit.
+        """
+        # Checking the lock alone would let another thread into the writer's transaction
+        if self._writer_owner != threading.get_ident():
+            raise RuntimeError("savepoint() is only valid inside writer()")
+        conn = self._writer
+        # Without an open transaction, releasing the savepoint would commit
+        if not conn.in_transaction:
+            conn.execute("BEGIN;")
+        conn.execute("SAVEPOINT block;")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK TO block;")
+            conn.execute("RELEASE block;")
+            raise
+        conn.execute("RELEASE block;")
+
+    def close(self) -> None:
+        with self._writer_lock:
+            self._writer.close()
+        for conn in self._all_readers:
+            conn.close()
+
+
+class PooledSQLiteBackend(SQLiteBackend):
+    """
+    The SQLite storage engine on a ConnectionPool: `with storage.reading():`
+    borrows a read connection and `with storage.writing():` the writer, in
+    which `with storage.savepoint():` marks a part that can fail alone.
+    """
+
+    def __init__(self, pool: ConnectionPool):
+        super().__init__(pool.DB_PATH)
+        self.pool = pool
+
+    def reading(self):
+        return self.pool.reader()
+
+    def writing(self):
+        return self.pool.writer()
+
+    def savepoint(self):
+        return self.pool.savepoint()
+
+    def close(self) -> None:
+        self.pool.close()
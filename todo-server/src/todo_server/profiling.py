@@ -0,0 +1,194 @@
+"""
+Opt-in per-request profiling for the server.
+
+When `profile_dir` is set in the server config, ProfilingMiddleware captures a
+cProfile profile of a request if it carries an `X-Todo-Profile` header whose
+value equals `profile_token`, or is picked by the `profile_sample_rate` (0.0 to
+1.0, default 0). Without a token, no header is accepted, so clients can't make
+the server profile their requests. Each profile is written to
+profile_dir as a pstats file, and only the newest `profile_max_files` (default 50)
+are kept. The response carries the profile's id in an `X-Todo-Profile-Id` header.
+
+Without profile_dir the middleware is never installed, so it costs nothing.
+
+Since Python 3.12, cProfile is built on sys.monitoring, which sees every thread.
+That is what lets the middleware (on the event loop) profile endpoints that run
+in the threadpool, but it also means a profile includes whatever other requests
+ran at the same time, and only one profile can be captured at once. Requests that
+arrive while a profile is being captured are simply not profiled.
+
+Open a profile with e.g. `python -m pstats <file>` or snakeviz.
+"""
+
+import cProfile
+import logging
+import os
+import random
+import re
+import threading
+import time
+from datetime import datetime
+
+from starlette.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = b"x-todo-profile"
+
+# Profile file names are "<id>_<method>_<path>_<duration>ms.prof"
+PROFILE_NAME = re.compile(
+    r"^(?P<id>\d{8}T\d{12}-\d+)_(?P<method>[A-Z]+)_(?P<path>[^_]*)_(?P<ms>\d+)ms\.prof$"
+)
+
+# Only one profiler can be active in the interpreter at a time
+_profile_lock = threading.Lock()
+
+
+class ProfilingMiddleware:
+    def __init__(
+        self,
+        app,
+        profile_dir: str,
+        max_files: int = 50,
+        sample_rate: float = 0.0,
+        token: str | None = None,
+    ):
+        self.app = app
+        self.profile_dir = profile_dir
+        self.max_files = max_files
+        self.sample_rate = sample_rate
+        self.token = token
+        os.makedirs(profile_dir, exist_ok=True)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.should_profile(scope):
+            await self.app(scope, receive, send)
+            return
+
+        if not _profile_lock.acquire(blocking=False):
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                # Some other profiler (e.g. one wrapping the whole server) is active
+                await self.app(scope, receive, send)
+                return
+
+            profile_id = f"{datetime.now():%Y%m%dT%H%M%S%f}-{os.getpid()}"
+
+            async def send_with_profile_id(message):
+                if message["type"] == "http.response.start":
+                    headers = list(message.get("headers", []))
+                    headers.append((b"x-todo-profile-id", profile_id.encode()))
+                    message = {**message, "headers": headers}
+                await send(message)
+
+            start = time.perf_counter()
+            try:
+                await self.app(scope, receive, send_with_profile_id)
+            finally:
+                profiler.disable()
+                duration_ms = int((time.perf_counter() - start) * 1000)
+                name = profile_file_name(
+                    profile_id, scope["method"], scope["path"], duration_ms
+                )
+                try:
+                    await run_in_threadpool(self.write_profile, profiler, name)
+                except OSError as e:
+                    logger.warning("Could not write profile %s: %s", name, e)
+        finally:
+            _profile_lock.release()
+
+    def should_profile(self, scope) -> bool:
+        if scope["path"].startswith("/admin/"):
+            return False
+
+        for key, value in scope["headers"]:
+            if key == PROFILE_HEADER:
+                return is_authorized(value.decode("latin-1"), self.token)
+
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def write_profile(self, profiler: cProfile.Profile, name: str) -> None:
+        # Write under a temporary name so listings never see a partial file
+        path = os.path.join(self.profile_dir, name)
+        profiler.dump_stats(path + ".tmp")
+        os.replace(path + ".tmp", path)
+        rotate_profiles(self.profile_dir, self.max_files)
+
+
+def is_authorized(value: str | None, token: str | None) -> bool:
+    """
+    Check an X-Todo-Profile header value against the configured token. Without
+    a token nothing is authorized.
+    """
+    if not value or token is None:
+        return False
+    return value == token
+
+
+def profile_file_name(
+    profile_id: str, method: str, path: str, duration_ms: int
+) -> str:
+    safe_path = re.sub(r"[^A-Za-z0-9.-]+", "-", path).strip("-")
+    return f"{profile_id}_{method}_{safe_path}_{duration_ms}ms.prof"
+
+
+def rotate_profiles(profile_dir: str, max_files: int) -> None:
+    """
+    Delete the oldest profiles so at most max_files remain.
+    """
+    names = sorted(n for n in os.listdir(profile_dir) if PROFILE_NAME.match(n))
+    for name in names[: max(len(names) - max_files, 0)]:
+        try:
+            os.remove(os.path.join(profile_dir, name))
+        except FileNotFoundError:
+            pass  # another worker got there first
+
+
+def list_profiles(profile_dir: str, limit: int = 50) -> list[dict]:
+    """
+    Return the most recent profiles in profile_dir, newest first.
+    """
+    try:
+        names = os.listdir(profile_dir)
+    except FileNotFoundError:
+        return []
+
+    profiles = []
+    for name in sorted(names, reverse=True):
+        match = PROFILE_NAME.match(name)
+        if not match:
+            continue
+        try:
+            size = os.path.getsize(os.path.join(profile_dir, name))
+        except FileNotFoundError:
+            continue  # rotated away meanwhile
+        profiles.append(
+            {
+                "id": match["id"],
+                "method": match["method"],
+                "path": match["path"],
+                "duration_ms": int(match["ms"]),
+                "size": size,
+                "file": name,
+            }
+        )
+        if len(profiles) >= limit:
+            break
+
+    return profiles
+
+
+def find_profile(profile_dir: str, profile_id: str) -> str | None:
+    """
+    Return the path of the profile with the given id, or None if there isn't one.
+    """
+    for profile in list_profiles(profile_dir, limit=10**9):
+        if profile["id"] == profile_id:
+            return os.path.join(profile_dir, profile["file"])
+    return None
@@ -0,0 +1,33 @@
+import importlib
+
+import pytest
+from fastapi.testclient import TestClient
+
+
+@pytest.fixture
+def make_client(tmp_path, monkeypatch):
+    """
+    Start todo_server.main against a fresh database, with extra config settings,
+    and return a TestClient for it.
+    """
+    started = []
+
+    def make(**settings):
+        settings.setdefault("database_file", str(tmp_path / "todo_server.db"))
+        config_path = tmp_path / "config.ini"
+        config_path.write_text(
+            "".join(f"{key}={value}\n" for key, value in settings.items())
+        )
+        monkeypatch.setenv("TODO_SERVER_CONFIG_PATH", str(config_path))
+        main = importlib.reload(importlib.import_module("todo_server.main"))
+        started.append(main)
+        return TestClient(main.app)
+
+    yield make
+    for main in started:
+        main.storage.close()
+
+
+@pytest.fixture
+def client(make_client):
+    return make_client()
@@ -0,0 +1,117 @@
+import asyncio
+import json
+
+import pytest
+from todo_server.admission import AdmissionController, AdmissionMiddleware
+
+
+async def settle():
+    # Let waiting tasks run up to their next await
+    for _ in range(3):
+        await asyncio.sleep(0)
+
+
+def test_waiters_are_admitted_in_turn_between_users():
+    async def scenario():
+        controller = AdmissionController(max_concurrent=1, max_queue=10)
+        assert await controller.acquire("alice") is None
+
+        admitted = []
+
+        async def wait(user):
+            assert await controller.acquire(user) is None
+            admitted.append(user)
+
+        tasks = [
+            asyncio.create_task(wait(user)) for user in ("alice", "alice", "bob")
+        ]
+        await settle()
+        assert (controller.active, controller.queued) == (1, 3)
+
+        for expected in (["alice"], ["alice", "bob"], ["alice", "bob", "alice"]):
+            controller.release(admitted[-1] if admitted else "alice")
+            await settle()
+            assert admitted == expected
+        await asyncio.gather(*tasks)
+
+        controller.release("alice")
+        assert (controller.active, controller.queued) == (0, 0)
+
+    asyncio.run(scenario())
+
+
+def test_rejects_when_the_queue_is_full_or_the_wait_times_out():
+    async def scenario():
+        controller = AdmissionController(
+            max_concurrent=1, max_queue=1, queue_timeout=0.05, max_per_user=2
+        )
+        assert await controller.acquire("alice") is None
+
+        waiter = asyncio.create_task(controller.acquire("bob"))
+        await settle()
+        assert await controller.acquire("carol") == "queue_full"
+        assert await waiter == "timeout"
+        assert (controller.active, controller.queued) == (1, 0)
+
+        # Alice has one running and one waiting, which is her limit
+        second = asyncio.create_task(controller.acquire("alice"))
+        await settle()
+        assert await controller.acquire("alice") == "user_limit"
+        assert await second == "timeout"
+
+    asyncio.run(scenario())
+
+
+def test_release_skips_a_cancelled_waiter():
+    async def scenario():
+        controller = AdmissionController(max_concurrent=1, max_queue=10)
+        assert await controller.acquire("alice") is None
+        cancelled = asyncio.create_task(controller.acquire("bob"))
+        next_in_line = asyncio.create_task(controller.acquire("carol"))
+        await settle()
+
+        # Released before the cancelled waiter gets to clean up after itself
+        cancelled.cancel()
+        controller.release("alice")
+
+        assert await next_in_line is None
+        with pytest.raises(asyncio.CancelledError):
+            await cancelled
+        assert (controller.active, controller.queued) == (1, 0)
+
+        controller.release("carol")
+        assert (controller.active, controller.queued) == (0, 0)
+        assert await controller.acquire("dave") is None
+
+    asyncio.run(scenario())
+
+
+def test_middleware_answers_503_with_retry_after():
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"{}"})
+
+    async def scenario():
+        controller = AdmissionController(max_concurrent=1, max_queue=0)
+        middleware = AdmissionMiddleware(app, controller)
+        assert await controller.acquire(None) is None
+
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {"type": "http", "path": "/sync", "headers": []}
+        await middleware(scope, None, send)
+
+        start, body = sent
+        assert start["status"] == 503
+        assert (b"retry-after", b"1") in start["headers"]
+        assert json.loads(body["body"]) == {"error": "Server is busy, try again later"}
+
+        # Other paths are not admission-controlled
+        sent.clear()
+        await middleware(dict(scope, path="/health"), None, send)
+        assert sent[0]["status"] == 200
+
+    asyncio.run(scenario())
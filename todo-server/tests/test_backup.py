@@ -0,0 +1,133 @@
+import sqlite3
+import threading
+from datetime import datetime
+
+import pytest
+from todo_common import db
+from todo_common.bulk import import_tasks
+from todo_common.task import Task
+from todo_server.backup import (
+    backup_database,
+    check_database,
+    list_snapshots,
+    restore_database,
+    snapshot_database,
+)
+
+
+@pytest.fixture
+def server_db(tmp_path):
+    path = str(tmp_path / "todo_server.db")
+    records = (
+        {"id": i, "username": f"user{i % 5}", "content": f"Task {i} " + "x" * 200}
+        for i in range(1, 3001)
+    )
+    import_tasks(path, records)
+    return path
+
+
+def task_ids(path):
+    conn = sqlite3.connect(path)
+    try:
+        return {row[0] for row in conn.execute("SELECT id FROM tasks")}
+    finally:
+        conn.close()
+
+
+def new_task(task_id):
+    now = datetime.now().isoformat(timespec="seconds")
+    return Task(task_id, "writer", f"Synced {task_id}", False, False, None, now, now)
+
+
+def test_paced_backup_copies_everything(server_db, tmp_path):
+    target = str(tmp_path / "copy.db")
+
+    stats = backup_database(server_db, target, pages=16, step_sleep=0)
+
+    assert stats["steps"] > 1
+    assert stats["restarts"] == 0
+    assert check_database(target) == "ok"
+    assert task_ids(target) == task_ids(server_db)
+    assert not (tmp_path / "copy.db.partial").exists()
+
+
+def test_backup_while_syncing(server_db, tmp_path):
+    target = str(tmp_path / "copy.db")
+    before = task_ids(server_db)
+    stop = threading.Event()
+    synced = []
+
+    def sync_loop(first_id):
+        task_id = first_id
+        while not stop.is_set():
+            assert db.sync_task(new_task(task_id), server_db) == "inserted"
+            synced.append(task_id)
+            task_id += 1
+
+    writers = [
+        threading.Thread(target=sync_loop, args=(first_id,))
+        for first_id in (100_000, 200_000)
+    ]
+    for writer in writers:
+        writer.start()
+    try:
+        synced_before_backup = len(synced)
+        stats = backup_database(
+            server_db, target, pages=8, step_sleep=0.002, max_restarts=2
+        )
+        synced_during_backup = len(synced) - synced_before_backup
+    finally:
+        stop.set()
+        for writer in writers:
+            writer.join()
+
+    # Syncs kept going during the backup...
+    assert synced_during_backup > 0
+    # ...and the copy is a consistent snapshot from some point while they ran
+    assert check_database(target) == "ok"
+    assert before <= task_ids(target) <= task_ids(server_db)
+    assert stats["restarts"] <= 3
+
+
+def test_snapshot_rotation(server_db, tmp_path):
+    backup_dir = tmp_path / "backups"
+    backup_dir.mkdir()
+    for stamp in ("20240101-000000", "20240102-000000", "20240103-000000"):
+        (backup_dir / f"todo_server-{stamp}.db").write_bytes(b"")
+    (backup_dir / "unrelated.db").write_bytes(b"")
+
+    path = snapshot_database(server_db, str(backup_dir), keep=2, step_sleep=0)
+
+    assert list_snapshots(server_db, str(backup_dir)) == [
+        backup_dir / "todo_server-20240103-000000.db",
+        path,
+    ]
+    assert (backup_dir / "unrelated.db").exists()
+    assert task_ids(str(path)) == task_ids(server_db)
+
+
+def test_restore(server_db, tmp_path):
+    snapshot = str(tmp_path / "snapshot.db")
+    backup_database(server_db, snapshot)
+    before = task_ids(server_db)
+    db.sync_task(new_task(99_999), server_db)
+
+    restore_database(snapshot, server_db)
+
+    assert task_ids(server_db) == before
+
+
+def test_restore_rejects_a_damaged_snapshot(server_db, tmp_path):
+    snapshot = tmp_path / "snapshot.db"
+    backup_database(server_db, str(snapshot))
+    data = bytearray(snapshot.read_bytes())
+    data[4096 * 3 : 4096 * 6] = b"\xff" * (4096 * 3)
+    snapshot.write_bytes(bytes(data))
+    before = task_ids(server_db)
+
+    with pytest.raises((ValueError, sqlite3.DatabaseError)):
+        restore_database(str(snapshot), server_db)
+
+    assert task_ids(server_db) == before
+    with pytest.raises(FileNotFoundError):
+        restore_database(str(tmp_path / "missing.db"), server_db)
@@ -0,0 +1,155 @@
+import sqlite3
+from dataclasses import replace
+from datetime import datetime, timedelta
+
+import pytest
+from todo_common import db
+from todo_server.devices import (
+    collect_tombstones,
+    expire_devices,
+    list_devices,
+    needs_resync,
+    purge_tombstones,
+    record_device,
+)
+
+
+@pytest.fixture
+def server_db(tmp_path):
+    return str(tmp_path / "todo_server.db")
+
+
+def task_ids(path):
+    conn = sqlite3.connect(path)
+    try:
+        return {row[0] for row in conn.execute("SELECT id FROM tasks")}
+    finally:
+        conn.close()
+
+
+def deleted_tasks(path, username, count):
+    tasks = []
+    for i in range(count):
+        task = db.create_task(f"Task {i}", username, path)
+        db.delete_task(task.id, path)
+        tasks.append(db.get_task(task.id, path))
+    return tasks
+
+
+def change_seq(path, task_id):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute(
+            "SELECT change_seq FROM tasks WHERE id = ?", (task_id,)
+        ).fetchone()[0]
+    finally:
+        conn.close()
+
+
+def set_last_seen(path, device_id, when):
+    conn = sqlite3.connect(path)
+    with conn:
+        conn.execute(
+            "UPDATE devices SET last_seen_at = ? WHERE device_id = ?",
+            (when.isoformat(timespec="seconds"), device_id),
+        )
+    conn.close()
+
+
+def test_purges_what_every_device_acknowledged(server_db):
+    first, second = deleted_tasks(server_db, "alice", 2)
+    kept = db.create_task("Not deleted", "alice", server_db)
+    bobs = deleted_tasks(server_db, "bob", 1)
+    first_seq, second_seq, kept_seq = (
+        change_seq(server_db, task.id) for task in (first, second, kept)
+    )
+
+    # The phone has only seen the first deletion
+    record_device(server_db, "alice", "laptop", second_seq)
+    record_device(server_db, "alice", "phone", first_seq)
+
+    assert purge_tombstones(server_db) == 1
+    # Bob has no registered devices, so his tombstones stay
+    assert task_ids(server_db) == {second.id, kept.id, bobs[0].id}
+    assert db.get_purge_horizon("alice", server_db) == first.updated_hlc
+    assert needs_resync(server_db, "alice", first_seq) == (False, first_seq)
+    assert db.get_purge_horizon("bob", server_db) == 0
+
+    record_device(server_db, "alice", "phone", kept_seq)
+    assert purge_tombstones(server_db) == 1
+    assert task_ids(server_db) == {kept.id, bobs[0].id}
+    assert db.get_purge_horizon("alice", server_db) == second.updated_hlc
+    assert needs_resync(server_db, "alice", first_seq) == (True, second_seq)
+
+
+def test_late_deletion_waits_for_every_device(server_db):
+    first = db.create_task("First", "alice", server_db)
+    db.create_task("Second", "alice", server_db)
+    for device_id in ("laptop", "phone"):
+        record_device(server_db, "alice", device_id, db.get_last_change_seq(server_db))
+
+    # The phone deleted the first task offline, with an HLC below the second's,
+    # and syncs it now; the laptop hasn't received the deletion yet
+    deleted = replace(first, is_deleted=True, updated_hlc=first.updated_hlc + 1)
+    assert db.sync_task(deleted, server_db) == "updated"
+    record_device(server_db, "alice", "phone", db.get_last_change_seq(server_db))
+    assert purge_tombstones(server_db) == 0
+
+    record_device(server_db, "alice", "laptop", db.get_last_change_seq(server_db))
+    assert purge_tombstones(server_db) == 1
+
+
+def test_purge_runs_in_bounded_batches(server_db):
+    deleted_tasks(server_db, "alice", 5)
+    record_device(server_db, "alice", "laptop", db.get_last_change_seq(server_db))
+
+    assert purge_tombstones(server_db, batch_size=2, max_batches=1) == 2
+    assert purge_tombstones(server_db, batch_size=2) == 3
+    assert task_ids(server_db) == set()
+
+
+def test_purged_tasks_are_not_resurrected(server_db):
+    (task,) = deleted_tasks(server_db, "alice", 1)
+    record_device(server_db, "alice", "laptop", db.get_last_change_seq(server_db))
+    purge_tombstones(server_db)
+
+    # A device that never saw the deletion sends its older, undeleted copy
+    stale = replace(task, is_deleted=False, updated_hlc=task.updated_hlc - 1)
+    assert db.sync_task(stale, server_db) == "skipped"
+    assert db.sync_task(task, server_db) == "skipped"
+    assert db.get_task(task.id, server_db) is None
+
+    # An edit made after the deletion still wins, as it would have over the tombstone
+    edited = replace(stale, content="Edited later", updated_hlc=task.updated_hlc + 1)
+    assert db.sync_task(edited, server_db) == "inserted"
+
+
+def test_expired_device_stops_holding_back_the_purge(server_db):
+    (task,) = deleted_tasks(server_db, "alice", 1)
+    seq = change_seq(server_db, task.id)
+    record_device(server_db, "alice", "laptop", seq)
+    record_device(server_db, "alice", "lost-phone", 0)
+    set_last_seen(server_db, "lost-phone", datetime.now() - timedelta(days=45))
+
+    assert purge_tombstones(server_db) == 0
+    assert collect_tombstones(server_db, expiry_days=30) == {"expired": 1, "purged": 1}
+    assert [d["device_id"] for d in list_devices(server_db)] == ["laptop"]
+
+    # When the phone comes back, it must take the server's tasks wholesale
+    assert needs_resync(server_db, "alice", 0) == (True, seq)
+    assert needs_resync(server_db, "alice", seq) == (False, seq)
+    # A device that has applied nothing yet gets every task anyway
+    assert needs_resync(server_db, "alice", None) == (False, seq)
+
+
+def test_record_device_keeps_the_latest_ack(server_db):
+    db.init_db(server_db)
+    record_device(server_db, "alice", "laptop", 10)
+    record_device(server_db, "alice", "laptop", None)
+    record_device(server_db, "bob", "desktop", 30)
+
+    (laptop,) = list_devices(server_db, "alice")
+    assert laptop["acked_seq"] == 0
+    assert laptop["first_seen_at"] <= laptop["last_seen_at"]
+    assert {d["username"] for d in list_devices(server_db)} == {"alice", "bob"}
+    assert expire_devices(server_db, expiry_days=30) == 0
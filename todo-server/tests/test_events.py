@@ -0,0 +1,110 @@
+import asyncio
+import threading
+
+import pytest
+from todo_server.events import ChangeBroker, event_stream
+
+
+async def settle():
+    # Let callbacks scheduled with call_soon_threadsafe run
+    for _ in range(3):
+        await asyncio.sleep(0)
+
+
+def queued(subscription):
+    return [] if subscription.queue.empty() else [subscription.queue.get_nowait()]
+
+
+def test_publish_fans_out_to_other_devices():
+    async def scenario():
+        broker = ChangeBroker()
+        laptop = broker.subscribe("alice", "laptop")
+        phone = broker.subscribe("alice", "phone")
+        anonymous = broker.subscribe("alice")
+        bobs = broker.subscribe("bob", "phone")
+        assert broker.subscriber_count() == 4
+
+        # Syncs publish from the threadpool
+        thread = threading.Thread(target=broker.publish, args=("alice", "laptop"))
+        thread.start()
+        thread.join()
+        await settle()
+
+        event_id = f"{broker.boot_id}-1"
+        # The laptop made the change, so it isn't told about it
+        assert queued(laptop) == []
+        assert queued(phone) == [event_id]
+        assert queued(anonymous) == [event_id]
+        assert queued(bobs) == []
+
+        # A device that falls behind only holds the newest event
+        broker.publish("alice")
+        broker.publish("alice")
+        await settle()
+        assert queued(laptop) == [f"{broker.boot_id}-3"]
+
+        broker.unsubscribe("alice", phone)
+        assert broker.subscriber_count("alice") == 2
+
+    asyncio.run(scenario())
+
+
+def test_stream_reports_missed_and_new_changes():
+    async def scenario():
+        broker = ChangeBroker()
+        broker.publish("alice")
+        stream = event_stream(
+            broker, "alice", device_id="phone", last_event_id=f"{broker.boot_id}-0"
+        )
+
+        assert await anext(stream) == "retry: 15000\n"
+        assert "event: ready" in await anext(stream)
+        # It missed a change while it was away
+        assert await anext(stream) == (
+            f"id: {broker.boot_id}-1\nevent: changed\n"
+            'data: {"username": "alice"}\n\n'
+        )
+
+        waiting = asyncio.create_task(anext(stream))
+        await settle()
+        broker.publish("alice", "phone")  # its own sync
+        broker.publish("alice", "laptop")
+        assert (await waiting).startswith(f"id: {broker.boot_id}-3\nevent: changed\n")
+
+        await stream.aclose()
+        assert broker.subscriber_count("alice") == 0
+
+    asyncio.run(scenario())
+
+
+def test_stream_unsubscribes_on_disconnect():
+    async def scenario():
+        broker = ChangeBroker()
+        stream = event_stream(broker, "alice", device_id="phone")
+        await anext(stream)
+        await anext(stream)
+        assert broker.subscriber_count("alice") == 1
+
+        # The server cancels the response when the client goes away
+        waiting = asyncio.create_task(anext(stream))
+        await settle()
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        assert broker.subscriber_count("alice") == 0
+
+    asyncio.run(scenario())
+
+
+def test_stream_keeps_alive_and_ends_after_max_seconds():
+    async def scenario():
+        broker = ChangeBroker()
+        stream = event_stream(broker, "alice", keepalive_seconds=0.01, max_seconds=0.05)
+        events = [event async for event in stream]
+
+        assert events[0] == "retry: 10\n"
+        assert "event: ready" in events[1]
+        assert set(events[2:]) == {": keepalive\n\n"}
+        assert broker.subscriber_count() == 0
+
+    asyncio.run(scenario())
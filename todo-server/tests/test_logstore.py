@@ -0,0 +1,220 @@
+import json
+import random
+from dataclasses import asdict
+from pathlib import Path
+
+import pytest
+from todo_common import hlc
+from todo_common.storage import SQLiteBackend
+from todo_common.task import Task
+from todo_server.logstore import CHANGE_SEQ, HEADER, LogBackend, Segment
+
+
+@pytest.fixture
+def log_dir(tmp_path):
+    return str(tmp_path / "log")
+
+
+def open_log(log_dir, **kwargs):
+    # Small segments, so the tests cross segment boundaries
+    kwargs.setdefault("segment_bytes", 4096)
+    return LogBackend(log_dir, **kwargs)
+
+
+def files(log_dir):
+    return sorted(path.name for path in Path(log_dir).glob("*.log"))
+
+
+def remote_task(task_id, content, stamp, created_at="2025-06-01T00:00:00"):
+    return Task(
+        id=task_id,
+        username=f"user{task_id % 3}",
+        content=content,
+        is_completed=False,
+        is_deleted=False,
+        due_date=None,
+        created_at=created_at,
+        updated_at=hlc.to_timestamp(stamp),
+        created_hlc=stamp,
+        updated_hlc=stamp,
+    )
+
+
+def test_syncs_match_sqlite(log_dir, tmp_path):
+    sqlite = SQLiteBackend(str(tmp_path / "todo_server.db"))
+    storage = open_log(log_dir)
+    rng = random.Random(7)
+    base = hlc.encode(1_750_000_000_000, 0)
+
+    # Inserts, newer and stale versions, and divergent copies of the same IDs
+    for _ in range(300):
+        task_id = rng.randint(1, 40)
+        task = remote_task(
+            task_id,
+            f"Task {task_id} v{rng.randint(1, 5)}",
+            base + rng.randint(0, 1000),
+            created_at=rng.choice(["2025-06-01T00:00:00", "2025-06-02T00:00:00"]),
+        )
+        assert storage.sync_task(task) == sqlite.sync_task(task)
+
+    for username in ("user0", "user1", "user2"):
+        assert storage.get_tasks_for_user(username) == sqlite.get_tasks_for_user(username)
+
+
+def test_reopen_replays_the_log(log_dir):
+    storage = open_log(log_dir)
+    tasks = [storage.create_task(f"Task {i}", "alice") for i in range(40)]
+    storage.complete_task(tasks[3].id)
+    storage.update_task_content(tasks[5].id, "Edited")
+    with storage.writing():
+        for task in tasks[10:20]:
+            storage.delete_task(task.id)
+    before = storage.get_tasks_for_user("alice")
+    assert len(files(log_dir)) > 1
+    storage.close()
+
+    storage = open_log(log_dir)
+
+    assert storage.get_tasks_for_user("alice") == before
+    assert storage.get_task(tasks[5].id).content == "Edited"
+    # New IDs and HLCs carry on from the replayed tasks
+    task = storage.create_task("After restart", "alice")
+    assert task.id == tasks[-1].id + 1
+    assert task.updated_hlc > max(t.updated_hlc for t in before)
+
+
+def test_torn_last_record_is_dropped(log_dir, caplog):
+    storage = open_log(log_dir, segment_bytes=2**20)
+    kept = storage.create_task("Kept", "alice")
+    torn = storage.create_task("Torn", "alice")
+    segment = storage._tasks._locations[torn.id][0]
+    path, end = segment.path, segment.end
+    storage.close()
+
+    # A crash partway through the last write: its header landed, not all its payload
+    with open(path, "r+b") as f:
+        f.truncate(end - 10)
+
+    storage = open_log(log_dir)
+
+    assert storage.get_tasks_for_user("alice") == [kept]
+    assert "Dropping" in caplog.text
+    # The next task takes the torn task's place in the log
+    assert storage.create_task("Next", "alice").id == torn.id
+
+
+def test_corrupt_record_ends_replay(log_dir):
+    storage = open_log(log_dir, segment_bytes=2**20)
+    kept = storage.create_task("Kept", "alice")
+    corrupt = storage.create_task("Corrupt", "alice")
+    segment, offset, _, _ = storage._tasks._locations[corrupt.id]
+    storage.close()
+
+    with open(segment.path, "r+b") as f:
+        f.seek(offset + 5)
+        f.write(b"X")
+
+    assert open_log(log_dir).get_tasks_for_user("alice") == [kept]
+
+
+def test_snapshot_compacts_the_log(log_dir):
+    storage = open_log(log_dir)
+    tasks = [storage.create_task(f"Task {i}", "alice") for i in range(20)]
+    for round_ in range(10):
+        for task in tasks:
+            storage.update_task_content(task.id, f"Task {task.id} round {round_}")
+    before = storage.get_tasks_for_user("alice")
+    _, cursor = storage.get_tasks_json_for_user("alice")
+
+    path = storage.snapshot()
+
+    # Only the snapshot and the segment after it are left
+    assert files(log_dir) == [f"segment-{Segment.number_of(path) + 1:08d}.log", path.name]
+    assert path.stat().st_size == sum(
+        HEADER.size + CHANGE_SEQ.size + len(storage._tasks.raw(task.id)) for task in tasks
+    )
+    assert storage.get_tasks_for_user("alice") == before
+    # Nothing new to snapshot
+    assert storage.snapshot() is None
+
+    storage.update_task_content(tasks[0].id, "After the snapshot")
+    storage.close()
+    storage = open_log(log_dir)
+    assert storage.get_task(tasks[0].id).content == "After the snapshot"
+    assert storage.get_tasks_for_user("alice")[1:] == before[1:]
+    # Versions keep their change_seq through the snapshot and the restart
+    delta_json, _ = storage.get_tasks_json_for_user("alice", since=cursor)
+    assert [t["content"] for t in json.loads(delta_json)] == ["After the snapshot"]
+
+
+def test_writes_during_a_snapshot_win(log_dir, monkeypatch):
+    storage = open_log(log_dir)
+    first = storage.create_task("First", "alice")
+    second = storage.create_task("Second", "alice")
+
+    # Edit a task while the snapshot copies records, as another request would
+    copy = storage._tasks._path
+
+    def edit_then_copy(kind, number):
+        if kind == "snapshot":
+            storage.update_task_content(first.id, "Edited during the snapshot")
+        return copy(kind, number)
+
+    monkeypatch.setattr(storage._tasks, "_path", edit_then_copy)
+    storage.snapshot()
+    monkeypatch.undo()
+
+    assert storage.get_task(first.id).content == "Edited during the snapshot"
+    assert storage.get_task(second.id).content == "Second"
+    storage.close()
+    assert open_log(log_dir).get_task(first.id).content == "Edited during the snapshot"
+
+
+def test_clear_survives_restart(log_dir):
+    storage = open_log(log_dir)
+    storage.create_task("Gone", "alice")
+    storage.clear()
+    kept = storage.create_task("Kept", "bob")
+    storage.close()
+
+    storage = open_log(log_dir)
+
+    assert storage.get_users() == ["bob"]
+    assert storage.get_tasks_for_user("bob") == [kept]
+
+
+def test_json_is_the_stored_records(log_dir):
+    storage = open_log(log_dir)
+    first = storage.create_task("Première", "alice")
+    storage.create_task("Second", "alice")
+    storage.update_task_content(first.id, "Première, edited")
+
+    tasks_json, cursor = storage.get_tasks_json_for_user("alice")
+    delta_json, delta_cursor = storage.get_tasks_json_for_user("alice", since=cursor - 1)
+
+    tasks = storage.get_tasks_for_user("alice")
+    assert json.loads(tasks_json) == [asdict(t) for t in tasks]
+    assert cursor == storage.get_last_change_seq()
+    assert [t["content"] for t in json.loads(delta_json)] == ["Première, edited"]
+    assert delta_cursor == cursor
+    assert storage.get_tasks_json_for_user("nobody", since=5) == (b"[]", cursor)
+
+
+def test_large_task_gets_its_own_segment(log_dir):
+    storage = open_log(log_dir, segment_bytes=1024)
+    task = storage.create_task("x" * 5000, "alice")
+    storage.create_task("Small", "alice")
+    storage.close()
+
+    storage = open_log(log_dir)
+    assert storage.get_task(task.id) == task
+
+
+def test_one_process_at_a_time(log_dir):
+    storage = open_log(log_dir)
+
+    with pytest.raises(BlockingIOError, match="in use"):
+        open_log(log_dir)
+
+    storage.close()
+    open_log(log_dir).close()
@@ -0,0 +1,11 @@
+from todo_server.metrics import DB_OPERATION_SECONDS
+
+
+def test_db_operations_are_timed_once_per_call(make_client):
+    # Each client reloads the server module, which registers the timing hook
+    make_client()
+    client = make_client()
+
+    before = DB_OPERATION_SECONDS.count(operation="get_users")
+    assert client.get("/users").status_code == 200
+    assert DB_OPERATION_SECONDS.count(operation="get_users") == before + 1
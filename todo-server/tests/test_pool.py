@@ -0,0 +1,129 @@
+import sqlite3
+import threading
+
+import pytest
+from todo_common import db
+from todo_server.metrics import (
+    DB_POOL_CONNECTIONS,
+    DB_POOL_TIMEOUTS,
+    DB_POOL_WAIT_SECONDS,
+)
+from todo_server.pool import ConnectionPool, PoolTimeout
+
+
+@pytest.fixture
+def pool(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "todo_server.db"), readers=2, timeout=0.2)
+    yield pool
+    pool.close()
+
+
+def test_database_is_switched_to_wal(pool):
+    conn = sqlite3.connect(pool.DB_PATH)
+    try:
+        assert conn.execute("PRAGMA journal_mode;").fetchone()[0] == "wal"
+    finally:
+        conn.close()
+
+
+def test_readers_are_read_only(pool):
+    with pool.reader() as conn:
+        assert conn.execute("PRAGMA query_only;").fetchone()[0] == 1
+        with pytest.raises(sqlite3.OperationalError):
+            db.create_task("Not allowed", "alice", pool.DB_PATH)
+
+
+def test_writer_commits_and_readers_see_it(pool):
+    with pool.writer():
+        task = db.create_task("Written", "alice", pool.DB_PATH)
+
+    with pool.reader():
+        assert db.get_task(task.id, pool.DB_PATH).content == "Written"
+
+
+def test_writer_rolls_back_on_error(pool):
+    with pytest.raises(RuntimeError), pool.writer():
+        db.create_task("Never committed", "alice", pool.DB_PATH)
+        raise RuntimeError()
+
+    with pool.reader():
+        assert db.get_tasks_for_user("alice", pool.DB_PATH) == []
+
+
+def test_savepoint_rolls_back_only_its_block(pool):
+    with pool.writer():
+        with pool.savepoint():
+            kept = db.create_task("Kept", "alice", pool.DB_PATH)
+        with pytest.raises(RuntimeError), pool.savepoint():
+            db.create_task("Rolled back", "bob", pool.DB_PATH)
+            raise RuntimeError()
+        # Nothing is committed before the writer's block ends
+        with pool.reader():
+            assert db.get_tasks_for_user("alice", pool.DB_PATH) == []
+
+    with pool.reader():
+        assert db.get_tasks_for_user("alice", pool.DB_PATH) == [kept]
+        assert db.get_tasks_for_user("bob", pool.DB_PATH) == []
+
+    with pytest.raises(RuntimeError, match="inside writer"), pool.savepoint():
+        pass
+
+
+def test_savepoint_needs_the_writer_on_this_thread(pool):
+    errors = []
+
+    def other_request():
+        try:
+            with pool.savepoint():
+                db.create_task("Other thread", "bob", pool.DB_PATH)
+        except RuntimeError as e:
+            errors.append(e)
+
+    with pool.writer():
+        db.create_task("Mine", "alice", pool.DB_PATH)
+        thread = threading.Thread(target=other_request)
+        thread.start()
+        thread.join()
+
+    assert len(errors) == 1
+    with pool.reader():
+        assert db.get_tasks_for_user("bob", pool.DB_PATH) == []
+        assert len(db.get_tasks_for_user("alice", pool.DB_PATH)) == 1
+
+
+def test_reads_are_not_blocked_by_an_open_write(pool):
+    with pool.writer():
+        task = db.create_task("First", "alice", pool.DB_PATH)
+
+    with pool.writer():
+        db.update_task_content(task.id, "Second", pool.DB_PATH)
+        # Another request reads the last committed version while the write is open
+        seen = []
+        thread = threading.Thread(
+            target=lambda: seen.append(read_content(pool, task.id))
+        )
+        thread.start()
+        thread.join()
+
+    assert seen == ["First"]
+    assert read_content(pool, task.id) == "Second"
+
+
+def read_content(pool, task_id):
+    with pool.reader():
+        return db.get_task(task_id, pool.DB_PATH).content
+
+
+def test_waits_are_timed_and_exhaustion_times_out(pool):
+    waits = DB_POOL_WAIT_SECONDS.count(pool="read")
+    timeouts = DB_POOL_TIMEOUTS.value(pool="read")
+
+    with pool.reader(), pool.reader():
+        assert DB_POOL_CONNECTIONS.value(pool="read", state="in_use") == 2
+        assert DB_POOL_CONNECTIONS.value(pool="read", state="idle") == 0
+        with pytest.raises(PoolTimeout), pool.reader():
+            pass
+
+    assert DB_POOL_WAIT_SECONDS.count(pool="read") == waits + 2
+    assert DB_POOL_TIMEOUTS.value(pool="read") == timeouts + 1
+    assert DB_POOL_CONNECTIONS.value(pool="read", state="idle") == 2
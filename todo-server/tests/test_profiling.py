@@ -0,0 +1,61 @@
+import os
+import pstats
+
+
+def test_profiled_request_is_written_and_listed(make_client, tmp_path):
+    profile_dir = tmp_path / "profiles"
+    client = make_client(profile_dir=profile_dir, profile_token="secret")
+
+    response = client.get("/users", headers={"X-Todo-Profile": "secret"})
+    assert response.status_code == 200
+    profile_id = response.headers["X-Todo-Profile-Id"]
+
+    listing = client.get("/admin/profiles", headers={"X-Todo-Profile": "secret"})
+    (profile,) = listing.json()["profiles"]
+    assert (profile["id"], profile["method"], profile["path"]) == (
+        profile_id,
+        "GET",
+        "users",
+    )
+
+    download = client.get(
+        f"/admin/profiles/{profile_id}", headers={"X-Todo-Profile": "secret"}
+    )
+    assert download.status_code == 200
+    path = tmp_path / "downloaded.prof"
+    path.write_bytes(download.content)
+    assert pstats.Stats(str(path)).total_calls > 0
+
+
+def test_unprofiled_requests_leave_no_profile(make_client, tmp_path):
+    profile_dir = tmp_path / "profiles"
+    client = make_client(profile_dir=profile_dir, profile_token="secret")
+
+    for headers in ({}, {"X-Todo-Profile": "wrong"}):
+        response = client.get("/users", headers=headers)
+        assert response.status_code == 200
+        assert "X-Todo-Profile-Id" not in response.headers
+    assert os.listdir(profile_dir) == []
+
+    # The profile endpoints need the token too
+    assert client.get("/admin/profiles").status_code == 403
+
+
+def test_profiling_is_off_without_a_profile_dir(client):
+    response = client.get("/users", headers={"X-Todo-Profile": "1"})
+    assert response.status_code == 200
+    assert "X-Todo-Profile-Id" not in response.headers
+    assert client.get("/admin/profiles").status_code == 404
+
+
+def test_profiling_needs_a_token(make_client, tmp_path):
+    profile_dir = tmp_path / "profiles"
+    client = make_client(profile_dir=profile_dir)
+
+    response = client.get("/users", headers={"X-Todo-Profile": "1"})
+    assert response.status_code == 200
+    assert "X-Todo-Profile-Id" not in response.headers
+    assert os.listdir(profile_dir) == []
+
+    for headers in ({}, {"X-Todo-Profile": "1"}):
+        assert client.get("/admin/profiles", headers=headers).status_code == 403
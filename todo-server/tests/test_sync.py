@@ -0,0 +1,142 @@
+from dataclasses import asdict
+
+from todo_common.task import Task
+from todo_server.devices import purge_tombstones
+
+
+def task(task_id, content, hlc, is_deleted=False, username="alice"):
+    return asdict(
+        Task(
+            id=task_id,
+            username=username,
+            content=content,
+            is_completed=False,
+            is_deleted=is_deleted,
+            due_date=None,
+            created_at="2025-01-01T00:00:00",
+            updated_at="2025-01-01T00:00:00",
+            created_hlc=hlc,
+            updated_hlc=hlc,
+        )
+    )
+
+
+def sync(client, device_id, tasks, since=None):
+    payload = {"username": "alice", "tasks": tasks, "device_id": device_id}
+    if since is not None:
+        payload["since"] = since
+    response = client.post("/sync", json=payload)
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_late_offline_edit_reaches_delta_clients(client):
+    first = sync(client, "laptop", [task(1, "Laptop task", 2000)])
+    assert [t["id"] for t in first["tasks"]] == [1]
+
+    # The phone edited task 2 offline, at an HLC below the laptop's cursor
+    sync(client, "phone", [task(2, "Phone task", 1000)])
+
+    second = sync(client, "laptop", [], since=first["cursor"])
+    assert [t["content"] for t in second["tasks"]] == ["Phone task"]
+    assert second["cursor"] > first["cursor"]
+
+    # Nothing has changed since
+    assert sync(client, "laptop", [], since=second["cursor"])["tasks"] == []
+
+
+def test_unknown_cursor_gets_every_task(client):
+    first = sync(client, "laptop", [task(1, "Laptop task", 2000)])
+
+    # A cursor this server never handed out, e.g. an HLC from before change_seq
+    stale = sync(client, "laptop", [], since=first["cursor"] + 10**12)
+    assert [t["id"] for t in stale["tasks"]] == [1]
+
+
+def test_response_carries_the_purge_horizon(client, tmp_path):
+    laptop = sync(client, "laptop", [task(1, "Laptop task", 2000)])
+    assert laptop["horizon"] == 0
+    laptop = sync(
+        client, "laptop", [task(1, "Laptop task", 3000, True)], since=laptop["cursor"]
+    )
+    phone = sync(client, "phone", [])
+
+    # Both devices ack the deletion, so its tombstone is purged
+    sync(client, "laptop", [], since=laptop["cursor"])
+    sync(client, "phone", [], since=phone["cursor"])
+    assert purge_tombstones(str(tmp_path / "todo_server.db")) == 1
+
+    assert sync(client, "phone", [])["horizon"] == 3000
+    # A task stamped at or below it is skipped as a purged copy, which is why
+    # clients stamp new tasks past the horizon (see db.next_timestamp)
+    assert sync(client, "phone", [task(2, "Slow clock", 2500)])["tasks"] == []
+
+
+def batch(client, *syncs):
+    return client.post("/sync/batch", json={"syncs": list(syncs)})
+
+
+def test_batch_results_follow_the_payload_order(client):
+    response = batch(
+        client,
+        {"username": "bob", "tasks": [task(1, "Bob's", 1000, username="bob")]},
+        {"username": "alice", "tasks": [task(2, "Alice's", 1000)]},
+        {"username": "carol", "tasks": []},
+    )
+    assert response.status_code == 200
+
+    results = response.json()["results"]
+    assert [result["username"] for result in results] == ["bob", "alice", "carol"]
+    assert [result["status"] for result in results] == ["success"] * 3
+    assert [result["outcomes"]["inserted"] for result in results] == [1, 1, 0]
+    assert [[t["content"] for t in result["tasks"]] for result in results] == [
+        ["Bob's"],
+        ["Alice's"],
+        [],
+    ]
+    assert results[0]["cursor"] == results[2]["cursor"] > 0
+
+
+def test_bad_batch_entry_is_rolled_back_alone(client):
+    # Bob's second task breaks the NOT NULL constraint on content, after his
+    # first one was merged
+    bad = task(3, None, 1000, username="bob")
+    response = batch(
+        client,
+        {"username": "alice", "tasks": [task(1, "Alice's", 1000)]},
+        {"username": "bob", "tasks": [task(2, "Bob's", 1000, username="bob"), bad]},
+        {"username": "carol"},
+        {"username": "dave", "tasks": [task(4, "Dave's", 1000, username="dave")]},
+    )
+    assert response.status_code == 200
+
+    alice, bob, carol, dave = response.json()["results"]
+    assert alice["status"] == dave["status"] == "success"
+    assert bob["status"] == "error"
+    assert bob["error"].startswith("Could not sync:")
+    assert carol == {
+        "username": "carol",
+        "status": "error",
+        "error": "Invalid sync: 'tasks' missing",
+    }
+
+    # Only Bob's savepoint was undone; the others committed
+    bob_now = client.post("/sync", json={"username": "bob", "tasks": []}).json()
+    assert bob_now["tasks"] == []
+    assert [t["content"] for t in sync(client, "laptop", [])["tasks"]] == ["Alice's"]
+
+
+def test_batch_without_syncs_is_rejected(client):
+    response = client.post("/sync/batch", json={"username": "alice", "tasks": []})
+    assert response.status_code == 400
+    assert response.json() == {"error": "Invalid payload: 'syncs' list missing"}
+
+
+def test_batch_above_the_user_limit_is_rejected(make_client):
+    client = make_client(sync_batch_max_users=2)
+    syncs = [{"username": f"user{i}", "tasks": []} for i in range(3)]
+
+    response = batch(client, *syncs)
+    assert response.status_code == 413
+    assert response.json() == {"error": "At most 2 syncs per batch"}
+    assert batch(client, *syncs[:2]).status_code == 200